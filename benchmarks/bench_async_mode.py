@@ -0,0 +1,133 @@
+"""
+Serving mode benchmark: sync Flask under gunicorn vs the ASGI mode under uvicorn.
+
+Starts each server as a single process on the same SQLite file (aiosqlite for
+the ASGI mode), seeds one user's meals through the API, then keeps a fixed
+number of requests in flight against GET /meals and GET /meals/<id>:
+
+    python -m benchmarks.bench_async_mode --concurrency 200 --duration 10
+    python -m benchmarks.bench_async_mode --sync-threads 8
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+
+# Talisman redirects plain HTTP; the servers sit behind a TLS proxy in production
+HEADERS = {'X-Forwarded-Proto': 'https'}
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_server(mode, port, env, sync_threads):
+    if mode == 'sync':
+        command = [
+            sys.executable, '-m', 'gunicorn', '--workers', '1', '--threads', str(sync_threads),
+            '--max-requests', '0', '--bind', f'127.0.0.1:{port}', 'src.app.main:create_app()',
+        ]
+    else:
+        command = [
+            sys.executable, '-m', 'uvicorn', '--factory', 'src.app.asgi:create_asgi_app',
+            '--host', '127.0.0.1', '--port', str(port), '--workers', '1', '--log-level', 'warning',
+        ]
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f'http://127.0.0.1:{port}/apispec_1.json', headers=HEADERS, timeout=1)
+            return process
+        except httpx.TransportError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+def seed(base_url, meals):
+    with httpx.Client(base_url=base_url, headers=HEADERS, timeout=30) as client:
+        credentials = {'username': 'benchuser', 'password': 'benchpassword'}
+        client.post('/auth/register', json={**credentials, 'email': 'bench@example.com'})
+        token = client.post('/auth/login', json=credentials).json()['access_token']
+        client.headers['Authorization'] = f'Bearer {token}'
+        
+        existing = client.get('/meals', params={'limit': 200}).json()['items']
+        meal_ids = [meal['id'] for meal in existing]
+        if len(meal_ids) < meals:
+            response = client.post('/meals/bulk', json=[
+                {'name': f'Meal {i}', 'ingredients': 'rice, peanuts, soy sauce'}
+                for i in range(meals - len(meal_ids))
+            ])
+            meal_ids += [result['id'] for result in response.json()['results']]
+        return dict(client.headers), meal_ids
+
+async def load(base_url, headers, meal_ids, concurrency, duration, seed_value):
+    rng = random.Random(seed_value)
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=60) as client:
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                path = f'/meals/{rng.choice(meal_ids)}' if rng.random() < 0.8 else '/meals?limit=20'
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+        
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--meals', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--sync-threads', type=int, default=1, help='gunicorn threads for the sync worker')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    
+    database_path = os.path.join(tempfile.mkdtemp(), 'bench_async.db')
+    env = {
+        **os.environ,
+        'DATABASE_URI': f'sqlite:///{database_path}',
+        'JWT_SECRET_KEY': os.getenv('JWT_SECRET_KEY', 'bench-secret'),
+        'BCRYPT_LOG_ROUNDS': '4',
+    }
+    subprocess.run([sys.executable, '-m', 'src.app.migrate'], env=env, check=True)
+    
+    print(f"{'mode':<6} {'requests/s':>11} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for mode in ('sync', 'async'):
+        port = free_port()
+        process = start_server(mode, port, env, args.sync_threads)
+        try:
+            base_url = f'http://127.0.0.1:{port}'
+            headers, meal_ids = seed(base_url, args.meals)
+            latencies, errors = asyncio.run(
+                load(base_url, headers, meal_ids, args.concurrency, args.duration, args.seed)
+            )
+        finally:
+            process.terminate()
+            process.wait()
+        
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"{mode:<6} {len(latencies) / args.duration:>11.1f} "
+              f"{statistics.median(latencies) * 1000:>8.1f} {p99 * 1000:>8.1f} {errors:>7}")
+
+if __name__ == '__main__':
+    main()
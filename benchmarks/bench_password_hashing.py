@@ -0,0 +1,56 @@
+"""
+Login throughput benchmark for the bounded bcrypt executor.
+
+Simulates concurrent logins (one bcrypt verification each) from many request
+threads and reports throughput and latency for each combination of cost
+factor and hashing concurrency cap:
+
+    python -m benchmarks.bench_password_hashing --rounds 10 12 --workers 1 2 4 --clients 16
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from src.utils.password_hasher import PasswordHasher
+
+def run_scenario(log_rounds, workers, clients, logins):
+    hasher = PasswordHasher(log_rounds=log_rounds, max_workers=workers)
+    stored_hash = hasher.hash('benchmark-password')
+    
+    def login(_):
+        start = time.perf_counter()
+        assert hasher.verify(stored_hash, 'benchmark-password')
+        return time.perf_counter() - start
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as request_threads:
+        latencies = sorted(request_threads.map(login, range(logins)))
+    elapsed = time.perf_counter() - start
+    
+    return {
+        "rounds": log_rounds,
+        "workers": workers,
+        "logins_per_second": logins / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, nargs='+', default=[10, 12])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--clients', type=int, default=16, help='concurrent request threads')
+    parser.add_argument('--logins', type=int, default=64, help='logins per scenario')
+    args = parser.parse_args()
+    
+    print(f"{'rounds':>6} {'workers':>7} {'logins/s':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for log_rounds in args.rounds:
+        for workers in args.workers:
+            result = run_scenario(log_rounds, workers, args.clients, args.logins)
+            print(
+                f"{result['rounds']:>6} {result['workers']:>7} "
+                f"{result['logins_per_second']:>9.1f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f}"
+            )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Allergy risk engine benchmark: NumPy kernels vs a per-meal Python loop.
+
+Generates synthetic meals, ingredient rows and allergies in memory and scores
+every meal both ways, checking that the two agree:
+
+    python -m benchmarks.bench_risk_engine --meals 1000000 --users 1000
+"""
+import argparse
+import time
+import numpy as np
+from src.utils.risk_model import (
+    AllergenTable, INGREDIENT_MATCH_FACTOR, MAX_RISK, SEVERITY_WEIGHTS,
+    allergen_terms, combine_risk, ingredient_scores, severity_scores, severity_weight, severity_weights
+)
+
+ALLERGENS = (
+    'peanut', 'almond', 'cashew', 'milk', 'egg', 'wheat', 'soy', 'sesame', 'shrimp', 'salmon',
+    'mustard', 'celery', 'lupin', 'sulphite', 'mollusc', 'walnut', 'hazelnut', 'pecan', 'oat', 'corn',
+)
+VOCABULARY = np.array(ALLERGENS + tuple(f'spice{n:04d}' for n in range(2000)))
+SEVERITIES = np.array(sorted(SEVERITY_WEIGHTS))
+
+def generate(meals, users, allergies_per_user, terms_per_meal, seed):
+    rng = np.random.default_rng(seed)
+    meal_users = rng.integers(1, users + 1, size=meals)
+    
+    term_meal_index = np.repeat(np.arange(meals), terms_per_meal)
+    ranks = np.minimum(rng.zipf(1.3, size=len(term_meal_index)) - 1, len(VOCABULARY) - 1)
+    terms = VOCABULARY[ranks]
+    
+    allergy_count = users * allergies_per_user
+    allergy_users = np.repeat(np.arange(1, users + 1), allergies_per_user)
+    allergy_meal_index = rng.integers(0, meals, size=allergy_count)
+    allergy_names = np.char.add(rng.choice(ALLERGENS, size=allergy_count), ' allergy')
+    allergy_severities = rng.choice(SEVERITIES, size=allergy_count)
+    return meal_users, term_meal_index, terms, allergy_users, allergy_meal_index, allergy_names, allergy_severities
+
+def score_numpy(meals, meal_users, term_meal_index, terms, allergy_users, allergy_meal_index, names, severities):
+    severity = severity_scores(meals, allergy_meal_index, severity_weights(severities))
+    allergens = AllergenTable.from_allergies(allergy_users, names, severities)
+    matched, weights = allergens.match(meal_users[term_meal_index], terms)
+    ingredient = ingredient_scores(meals, term_meal_index[matched], weights)
+    return combine_risk(severity, ingredient)
+
+def score_python(meals, meal_users, term_meal_index, terms, allergy_users, allergy_meal_index, names, severities):
+    known = {}
+    severity = [0.0] * meals
+    for user_id, meal_index, name, label in zip(
+        allergy_users.tolist(), allergy_meal_index.tolist(), names.tolist(), severities.tolist()
+    ):
+        weight = severity_weight(label)
+        severity[meal_index] += weight
+        for term in allergen_terms(name):
+            known[(user_id, term)] = max(known.get((user_id, term), 0.0), weight)
+    
+    ingredient = [0.0] * meals
+    users = meal_users.tolist()
+    for meal_index, term in zip(term_meal_index.tolist(), terms.tolist()):
+        weight = known.get((users[meal_index], term))
+        if weight:
+            ingredient[meal_index] += weight * INGREDIENT_MATCH_FACTOR
+    return [min(s + i, MAX_RISK) for s, i in zip(severity, ingredient)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--meals', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--allergies-per-user', type=int, default=5)
+    parser.add_argument('--terms-per-meal', type=int, default=6)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    
+    data = generate(args.meals, args.users, args.allergies_per_user, args.terms_per_meal, args.seed)
+    print(f"{args.meals} meals, {len(data[2])} ingredient terms, {len(data[3])} allergies")
+    
+    timings = {}
+    results = {}
+    for label, scorer in (('numpy', score_numpy), ('python loop', score_python)):
+        start = time.perf_counter()
+        results[label] = np.asarray(scorer(args.meals, *data))
+        timings[label] = time.perf_counter() - start
+        print(f"{label:<12} {timings[label]:>8.2f}s")
+    
+    assert np.allclose(results['numpy'], results['python loop']), "scorers disagree"
+    print(f"speedup      {timings['python loop'] / timings['numpy']:>8.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+List serialization benchmark: ORM objects + MealSchema + jsonify vs plain rows + meal_dicts + orjson.
+
+Seeds one user's meals and allergies in a fresh SQLite file, then times each
+path for several page sizes, both end to end (query, serialize, encode) and
+serialization alone on already loaded data:
+
+    python -m benchmarks.bench_serializers --meals 2000 --allergies 1000 --pages 50 200 1000
+"""
+import argparse
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from flask import jsonify
+from src.app.main import create_app
+from src.app.database import session
+from src.models.meal import Meal
+from src.models.schemas import MealSchema
+from src.services.meal_service import MealService, MEAL_SCHEMA_LOADS
+from src.utils.serializers import meal_dicts, json_response
+from benchmarks.bench_suite import seed
+
+def median_ms(operation, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operation()
+        session.remove()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--meals', type=int, default=2000)
+    parser.add_argument('--allergies', type=int, default=1000)
+    parser.add_argument('--pages', type=int, nargs='+', default=[50, 200, 1000])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    
+    os.environ['DATABASE_URI'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_serializers.db')}"
+    os.environ['BCRYPT_LOG_ROUNDS'] = '4'
+    os.environ.setdefault('JWT_SECRET_KEY', 'bench-secret')
+    subprocess.run([sys.executable, '-m', 'src.app.migrate'], check=True)
+    app = create_app()
+    user_id, = seed(app, 1, args.meals, args.allergies, random.Random(args.seed))
+    
+    print(f"{'page':>5} {'path':<12} {'schema ms':>10} {'rows ms':>9} {'speedup':>8}")
+    with app.test_request_context():
+        for page in args.pages:
+            def load_objects():
+                return (
+                    session.query(Meal).options(*MEAL_SCHEMA_LOADS)
+                    .filter(Meal.user_id == user_id).order_by(Meal.id).limit(page).all()
+                )
+            
+            end_to_end = (
+                median_ms(lambda: jsonify(MealSchema(many=True).dump(load_objects())), args.repeat),
+                median_ms(lambda: json_response(meal_dicts(MealService.get_all_user_meals(user_id, page)[0])), args.repeat),
+            )
+            objects = load_objects()
+            rows, _ = MealService.get_all_user_meals(user_id, page)
+            serialize_only = (
+                median_ms(lambda: jsonify(MealSchema(many=True).dump(objects)), args.repeat),
+                median_ms(lambda: json_response(meal_dicts(rows)), args.repeat),
+            )
+            for label, (schema_ms, rows_ms) in (('end to end', end_to_end), ('serialize', serialize_only)):
+                print(f"{page:>5} {label:<12} {schema_ms:>10.2f} {rows_ms:>9.2f} {schema_ms / rows_ms:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Worker startup benchmark: importing the app, create_app() and the first spec request.
+
+Each sample runs in a fresh interpreter, as a new gunicorn worker would, and
+times importing src.app.main, calling create_app(), then the first and a
+repeated GET /apispec_1.json. Compares compiling the spec on first use, a
+prebuilt spec artifact and API docs turned off:
+
+    python -m benchmarks.bench_startup --samples 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+from src.app.main import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+timings = {'import_ms': (imported - start) * 1000, 'create_app_ms': (created - imported) * 1000}
+if app.config['API_DOCS_ENABLED']:
+    client = app.test_client()
+    for key in ('first_spec_ms', 'cached_spec_ms'):
+        started = time.perf_counter()
+        assert client.get('/apispec_1.json', headers={'X-Forwarded-Proto': 'https'}).status_code == 200
+        timings[key] = (time.perf_counter() - started) * 1000
+print(json.dumps(timings))
+"""
+
+def sample(env):
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE], env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--samples', type=int, default=10)
+    args = parser.parse_args()
+    
+    workdir = tempfile.mkdtemp()
+    spec_file = os.path.join(workdir, 'openapi.json')
+    base_env = {
+        **os.environ,
+        'DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'bench_startup.db')}",
+        'JWT_SECRET_KEY': os.getenv('JWT_SECRET_KEY', 'bench-secret'),
+    }
+    base_env.pop('OPENAPI_SPEC_FILE', None)
+    subprocess.run(
+        [sys.executable, '-m', 'src.app.api_docs', '--output', spec_file],
+        env=base_env, check=True, stdout=subprocess.DEVNULL
+    )
+    
+    scenarios = {
+        'compile on first use': base_env,
+        'prebuilt spec': {**base_env, 'OPENAPI_SPEC_FILE': spec_file},
+        'docs disabled': {**base_env, 'API_DOCS_ENABLED': 'false'},
+    }
+    columns = ('import_ms', 'create_app_ms', 'first_spec_ms', 'cached_spec_ms')
+    print(f"{'scenario':<22}" + ''.join(f"{column:>16}" for column in columns))
+    for label, env in scenarios.items():
+        samples = [sample(env) for _ in range(args.samples)]
+        medians = [
+            statistics.median(s[column] for s in samples) if column in samples[0] else None
+            for column in columns
+        ]
+        print(f"{label:<22}" + ''.join(
+            f"{value:>16.1f}" if value is not None else f"{'-':>16}" for value in medians
+        ))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,301 @@
+"""
+Benchmark suite: micro-benchmarks and an end-to-end load scenario, saved as JSON.
+
+Runs in-process against a fresh SQLite file, or against DATABASE_URI (for
+example a local PostgreSQL) with --database-uri:
+
+    python -m benchmarks.bench_suite --output results/base.json
+    python -m benchmarks.bench_suite --database-uri postgresql://localhost/bench --output results/pg.json
+    python -m benchmarks.bench_suite --compare results/base.json --tolerance 0.2
+
+Micro-benchmarks time MealSchema/UserSchema dumps, bcrypt hashing and
+verification, and each service query on seeded data. The load scenario runs
+virtual users concurrently through register, login, meal and allergy
+creation, listing and the analytics endpoints, and reports throughput and
+p50/p95/p99 latency per step. With --compare, any p50 or p95 latency that
+grew by more than --tolerance against the baseline file is reported and the
+exit status is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from src.app.main import create_app
+from src.app.database import session
+from src.models.meal import Meal
+from src.models.schemas import MealSchema, UserSchema
+from src.services.auth_service import AuthService, user_cache
+from src.services.meal_service import MealService, MEAL_SCHEMA_LOADS
+from src.services.allergy_service import AllergyService
+from src.utils.password_hasher import password_hasher
+from src.utils.serializers import meal_dicts, json_response
+
+# Talisman redirects plain HTTP; the app sits behind a TLS proxy in production
+HEADERS = {'X-Forwarded-Proto': 'https'}
+INGREDIENTS = ('rice', 'peanuts', 'soy sauce', 'egg', 'milk', 'wheat flour', 'sesame oil', 'shrimp', 'garlic', 'lime')
+ALLERGENS = ('peanut', 'soy', 'egg', 'milk', 'wheat', 'sesame', 'shrimp')
+SEVERITIES = ('mild', 'moderate', 'severe')
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+def summarize(latencies, elapsed=None):
+    latencies = sorted(latencies)
+    summary = {
+        'count': len(latencies),
+        'mean_ms': sum(latencies) / len(latencies) * 1000,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+    if elapsed:
+        summary['per_second'] = len(latencies) / elapsed
+    return summary
+
+def random_meal(rng, n):
+    return {
+        'name': f'Meal {n}',
+        'description': 'benchmark meal',
+        'ingredients': ', '.join(rng.sample(INGREDIENTS, 4)),
+    }
+
+def seed(app, users, meals_per_user, allergies_per_user, rng):
+    """Create users with meals and allergies through the services; returns the user ids"""
+    user_ids = []
+    with app.app_context():
+        for u in range(users):
+            user = AuthService.register_user(f'seed{u}', f'seed{u}@example.com', 'seedpassword')
+            user_ids.append(user.id)
+            meal_ids = MealService.create_meals_bulk(
+                user.id, [random_meal(rng, n) for n in range(meals_per_user)]
+            )
+            AllergyService.create_allergies_bulk(user.id, [
+                {
+                    'meal_id': rng.choice(meal_ids),
+                    'name': f'{rng.choice(ALLERGENS)} allergy',
+                    'severity': rng.choice(SEVERITIES),
+                }
+                for _ in range(allergies_per_user)
+            ])
+            session.remove()
+    return user_ids
+
+def micro_benchmarks(app, user_ids, iterations, hash_iterations):
+    """Time each operation on its own, one fresh session per call as in a request"""
+    user_id = user_ids[0]
+    results = {}
+    with app.app_context():
+        meals = (
+            session.query(Meal).options(*MEAL_SCHEMA_LOADS)
+            .filter(Meal.user_id == user_id).order_by(Meal.id).limit(50).all()
+        )
+        meal_rows, _ = MealService.get_all_user_meals(user_id, limit=50)
+        meal_id = meals[0].id
+        user = AuthService.get_user_by_id(user_id)
+        stored_hash = password_hasher.hash('benchmark-password')
+        
+        def get_user_uncached():
+            user_cache.invalidate(user_id)
+            AuthService.get_user_by_id(user_id)
+        
+        cases = {
+            'schema.meal_dump_page_50': (lambda: MealSchema(many=True).dump(meals), iterations),
+            'serializer.meal_rows_page_50': (lambda: json_response(meal_dicts(meal_rows)), iterations),
+            'schema.user_dump': (lambda: UserSchema().dump(user), iterations),
+            'bcrypt.hash': (lambda: password_hasher.hash('benchmark-password'), hash_iterations),
+            'bcrypt.verify': (lambda: password_hasher.verify(stored_hash, 'benchmark-password'), hash_iterations),
+            'service.auth.get_user_by_id': (get_user_uncached, iterations),
+            'service.auth.get_data_version': (lambda: AuthService.get_data_version(user_id), iterations),
+            'service.meal.get_meal_by_id': (lambda: MealService.get_meal_by_id(meal_id, user_id), iterations),
+            'service.meal.get_all_user_meals': (lambda: MealService.get_all_user_meals(user_id, 50), iterations),
+            'service.meal.search_user_meals': (lambda: MealService.search_user_meals(user_id, ['peanuts']), iterations),
+            'service.meal.high_allergy_risk': (lambda: MealService.get_meals_with_high_allergy_risk(), iterations),
+            'service.meal.most_allergies': (lambda: MealService.get_meals_with_most_allergies(), iterations),
+            'service.allergy.get_user_allergies': (lambda: AllergyService.get_user_allergies(user_id, 50), iterations),
+            'service.allergy.users_with_allergies': (lambda: AllergyService.get_users_with_allergies(), iterations),
+            'service.allergy.meals_causing_allergies': (lambda: AllergyService.get_meals_causing_allergies(), iterations),
+        }
+        for name, (operation, count) in cases.items():
+            operation()
+            session.remove()
+            latencies = []
+            for _ in range(count):
+                start = time.perf_counter()
+                operation()
+                session.remove()
+                latencies.append(time.perf_counter() - start)
+            results[name] = summarize(latencies, sum(latencies))
+            print(f"{name:<42} {results[name]['p50_ms']:>9.3f} {results[name]['p95_ms']:>9.3f} "
+                  f"{results[name]['p99_ms']:>9.3f}")
+    return results
+
+def run_scenario(client, n, rng, meals, allergies, step_latencies):
+    """One virtual user's session; returns the number of failed requests"""
+    errors = 0
+    
+    def call(step, method, path, expected, **kwargs):
+        nonlocal errors
+        start = time.perf_counter()
+        response = client.open(path, method=method, **kwargs)
+        step_latencies[step].append(time.perf_counter() - start)
+        if response.status_code != expected:
+            errors += 1
+        return response
+    
+    credentials = {'username': f'load{n}', 'password': 'loadpassword'}
+    call('register', 'POST', '/auth/register', 201, headers=HEADERS,
+         json={**credentials, 'email': f'load{n}@example.com'})
+    token = (call('login', 'POST', '/auth/login', 200, headers=HEADERS, json=credentials).get_json() or {}).get('access_token')
+    headers = {**HEADERS, 'Authorization': f'Bearer {token}'}
+    
+    meal_ids = []
+    for m in range(meals):
+        response = call('create_meal', 'POST', '/meals', 201, headers=headers, json=random_meal(rng, m))
+        meal_ids += [response.get_json()['id']] if response.status_code == 201 else []
+    for _ in range(allergies if meal_ids else 0):
+        call('create_allergy', 'POST', '/allergies', 201, headers=headers, json={
+            'meal_id': rng.choice(meal_ids),
+            'name': f'{rng.choice(ALLERGENS)} allergy',
+            'severity': rng.choice(SEVERITIES),
+        })
+    
+    call('list_meals', 'GET', '/meals?limit=50', 200, headers=headers)
+    call('list_allergies', 'GET', '/allergies?limit=50', 200, headers=headers)
+    call('analytics.high_risk', 'GET', '/meals/high-risk', 200, headers=headers)
+    call('analytics.most_allergies', 'GET', '/meals/most-allergies', 200, headers=headers)
+    call('analytics.users_with_allergies', 'GET', '/allergies/users-with-allergies', 200, headers=headers)
+    call('analytics.meals_causing_allergies', 'GET', '/allergies/meals-causing-allergies', 200, headers=headers)
+    return errors
+
+def load_scenario(app, virtual_users, concurrency, meals, allergies, seed_value):
+    """Run every virtual user's session, `concurrency` at a time"""
+    step_latencies = defaultdict(list)
+    scenario_latencies = []
+    
+    def virtual_user(n):
+        rng = random.Random(seed_value + n)
+        start = time.perf_counter()
+        errors = run_scenario(app.test_client(), n, rng, meals, allergies, step_latencies)
+        scenario_latencies.append(time.perf_counter() - start)
+        return errors
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        errors = sum(pool.map(virtual_user, range(virtual_users)))
+    elapsed = time.perf_counter() - start
+    
+    all_requests = [latency for latencies in step_latencies.values() for latency in latencies]
+    results = {
+        'elapsed_seconds': elapsed,
+        'errors': errors,
+        'scenarios': summarize(scenario_latencies, elapsed),
+        'requests': summarize(all_requests, elapsed),
+        'steps': {step: summarize(latencies) for step, latencies in sorted(step_latencies.items())},
+    }
+    for step, summary in [('all requests', results['requests'])] + list(results['steps'].items()):
+        print(f"{step:<42} {summary['p50_ms']:>9.3f} {summary['p95_ms']:>9.3f} {summary['p99_ms']:>9.3f}")
+    print(f"{results['scenarios']['per_second']:.2f} scenarios/s, "
+          f"{results['requests']['per_second']:.1f} requests/s, {errors} errors")
+    return results
+
+def regressions(baseline, current, tolerance):
+    """(name, metric, before, after) for latencies that grew by more than `tolerance`"""
+    def flatten(results):
+        flat = dict(results.get('micro', {}))
+        load = results.get('load', {})
+        if 'requests' in load:
+            flat['load.requests'] = load['requests']
+        flat.update({f'load.{step}': summary for step, summary in load.get('steps', {}).items()})
+        return flat
+    
+    before, after = flatten(baseline), flatten(current)
+    found = []
+    for name in sorted(before.keys() & after.keys()):
+        for metric in ('p50_ms', 'p95_ms'):
+            if after[name][metric] > before[name][metric] * (1 + tolerance):
+                found.append((name, metric, before[name][metric], after[name][metric]))
+    return found
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-uri', help='database to run against (default: a new SQLite file)')
+    parser.add_argument('--output', help='JSON results file (default: benchmarks/results/<time>.json)')
+    parser.add_argument('--compare', help='baseline JSON results file to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed latency growth over the baseline')
+    parser.add_argument('--bcrypt-rounds', type=int, default=12)
+    parser.add_argument('--seed-users', type=int, default=20)
+    parser.add_argument('--seed-meals', type=int, default=200, help='meals per seeded user')
+    parser.add_argument('--seed-allergies', type=int, default=20, help='allergies per seeded user')
+    parser.add_argument('--iterations', type=int, default=200, help='calls per micro-benchmark')
+    parser.add_argument('--hash-iterations', type=int, default=10, help='calls per bcrypt micro-benchmark')
+    parser.add_argument('--virtual-users', type=int, default=40, help='load scenario sessions')
+    parser.add_argument('--concurrency', type=int, default=4, help='sessions running at once')
+    parser.add_argument('--scenario-meals', type=int, default=5, help='meals created per session')
+    parser.add_argument('--scenario-allergies', type=int, default=3, help='allergies created per session')
+    parser.add_argument('--skip-load', action='store_true')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    
+    database_uri = args.database_uri or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_suite.db')}"
+    os.environ['DATABASE_URI'] = database_uri
+    os.environ['BCRYPT_LOG_ROUNDS'] = str(args.bcrypt_rounds)
+    os.environ.setdefault('JWT_SECRET_KEY', 'bench-secret')
+    subprocess.run([sys.executable, '-m', 'src.app.migrate'], check=True)
+    
+    app = create_app()
+    rng = random.Random(args.seed)
+    user_ids = seed(app, args.seed_users, args.seed_meals, args.seed_allergies, rng)
+    
+    results = {
+        'meta': {
+            'started_at': datetime.now(timezone.utc).isoformat(),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'database': database_uri.split(':', 1)[0],
+            'arguments': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        },
+    }
+    print(f"{'benchmark':<42} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    results['micro'] = micro_benchmarks(app, user_ids, args.iterations, args.hash_iterations)
+    if not args.skip_load:
+        results['load'] = load_scenario(
+            app, args.virtual_users, args.concurrency, args.scenario_meals, args.scenario_allergies, args.seed
+        )
+    
+    output = args.output or os.path.join(
+        'benchmarks', 'results', f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            found = regressions(json.load(f), results, args.tolerance)
+        for name, metric, before, after in found:
+            print(f"REGRESSION {name} {metric}: {before:.3f} -> {after:.3f} ms")
+        if found:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.compare}")
+
+if __name__ == '__main__':
+    main()
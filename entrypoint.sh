@@ -4,5 +4,13 @@ set -e
 # Run database migrations
 flask db upgrade
 
-# Start the application
-exec gunicorn --bind 0.0.0.0:5000 src.app.main:create_app()
+# Workers share Prometheus metrics through files in this directory; start it empty
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
+# Start the application: threaded WSGI workers (default) or the ASGI event loop mode
+if [ "${SERVER_MODE:-wsgi}" = "asgi" ]; then
+    exec uvicorn --factory src.app.asgi:create_asgi_app --host 0.0.0.0 --port 5000 --workers "${WEB_CONCURRENCY:-1}"
+fi
+exec gunicorn --config gunicorn.conf.py 'src.app.main:create_app()'
@@ -0,0 +1,39 @@
+"""
+Gunicorn settings for the WSGI serving mode, read from the environment.
+
+The default is threaded (gthread) workers: each worker process serves
+GUNICORN_THREADS requests at once, each request on its own thread with its
+own database session. Keep GUNICORN_THREADS at or below
+DB_POOL_SIZE + DB_MAX_OVERFLOW so threads do not queue for connections.
+GUNICORN_WORKER_CLASS=gevent is also supported when gevent (and psycogreen
+for PostgreSQL) is installed.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 100))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+# Recycle workers now and then so slow leaks in dependencies cannot build up
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 1000))
+
+def post_fork(server, worker):
+    if worker_class == 'gevent':
+        # psycopg2 blocks the whole worker unless it yields to the gevent hub
+        try:
+            from psycogreen.gevent import patch_psycopg
+        except ImportError:
+            server.log.warning("psycogreen is not installed; PostgreSQL calls will block gevent workers")
+        else:
+            patch_psycopg()
+
+def child_exit(server, worker):
+    # Drop an exited worker's live gauges from the shared Prometheus metrics
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
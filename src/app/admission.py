@@ -0,0 +1,252 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+from flask import jsonify, request
+from .metrics import ADMISSION_QUEUE_TIME, ADMISSION_SHED
+
+logger = logging.getLogger(__name__)
+
+# Endpoint class -> (concurrent requests, queued requests, seconds a request may queue), per worker
+DEFAULT_LIMITS = {
+    'auth': (2, 8, 2.0),
+    'write': (4, 16, 2.0),
+    'read': (8, 32, 1.0),
+    'analytics': (1, 4, 5.0),
+}
+# Endpoints whose class does not follow from their method
+ENDPOINT_CLASSES = {
+    'auth.register': 'auth',
+    'auth.login': 'auth',
+    'meals.export_meals': 'analytics',
+    'meals.get_high_risk_meals': 'analytics',
+    'meals.get_meals_with_most_allergies': 'analytics',
+    'allergies.get_users_with_allergies': 'analytics',
+    'allergies.get_meals_causing_allergies': 'analytics',
+}
+# Blueprints under admission control; docs, metrics and internal endpoints are always served
+ADMITTED_BLUEPRINTS = frozenset({'auth', 'meals', 'allergies'})
+READ_METHODS = frozenset({'GET', 'HEAD'})
+# Settings a limits file may override per class, with their types
+LIMIT_SETTINGS = {'concurrency': int, 'queue': int, 'timeout': (int, float)}
+
+
+class Shed(Exception):
+    """A request turned away; `reason` is 'queue_full' or 'timeout'"""
+    
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+class ConcurrencyLimit:
+    """A per-process concurrency limit with a bounded wait queue and a queueing deadline"""
+    
+    def __init__(self, concurrency, queue, timeout):
+        self._condition = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.shed = 0
+        self.configure(concurrency, queue, timeout)
+    
+    def configure(self, concurrency=None, queue=None, timeout=None):
+        """Change any of the limits; queued requests see the change at once"""
+        with self._condition:
+            if concurrency is not None:
+                self.concurrency = concurrency
+            if queue is not None:
+                self.queue = queue
+            if timeout is not None:
+                self.timeout = timeout
+            self._condition.notify_all()
+    
+    def acquire(self):
+        """Take a slot, queueing up to `timeout` seconds; returns the seconds queued or raises Shed"""
+        with self._condition:
+            if self.active < self.concurrency:
+                self.active += 1
+                return 0.0
+            if self.waiting >= self.queue:
+                self.shed += 1
+                raise Shed('queue_full')
+            
+            started = time.monotonic()
+            deadline = started + self.timeout
+            self.waiting += 1
+            try:
+                while self.active >= self.concurrency:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.shed += 1
+                        raise Shed('timeout')
+                    self._condition.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.active += 1
+            return time.monotonic() - started
+    
+    def release(self):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+    
+    def snapshot(self):
+        with self._condition:
+            return {
+                'concurrency': self.concurrency,
+                'queue': self.queue,
+                'timeout': self.timeout,
+                'active': self.active,
+                'waiting': self.waiting,
+                'shed': self.shed,
+            }
+
+def parse_limits(overrides):
+    """Validate a limits file's {class: {setting: value}} overrides, raising ValueError on anything unknown"""
+    if not isinstance(overrides, dict):
+        raise ValueError("limits must be a JSON object")
+    for name, values in overrides.items():
+        if name not in DEFAULT_LIMITS:
+            raise ValueError(f"unknown endpoint class {name!r}")
+        if not isinstance(values, dict):
+            raise ValueError(f"limits for {name!r} must be a JSON object")
+        for setting, value in values.items():
+            if setting not in LIMIT_SETTINGS:
+                raise ValueError(f"unknown setting {setting!r} for {name!r}")
+            if isinstance(value, bool) or not isinstance(value, LIMIT_SETTINGS[setting]) or value < 0:
+                raise ValueError(f"{name}.{setting} must be a non-negative number")
+    return overrides
+
+def endpoint_class(endpoint, blueprint, method):
+    """The admission class of a request, or None when it is never limited"""
+    if blueprint not in ADMITTED_BLUEPRINTS:
+        return None
+    if endpoint in ENDPOINT_CLASSES:
+        return ENDPOINT_CLASSES[endpoint]
+    return 'read' if method in READ_METHODS else 'write'
+
+class AdmissionControl:
+    """
+    Load shedding for API requests, per endpoint class.
+    
+    Each class (auth, write, read, analytics) may run a limited number of
+    requests at once per worker; the next few wait in a bounded queue for at
+    most the class timeout, and the rest get an immediate 503 with Retry-After
+    instead of tying up a worker thread until the database recovers. Limits
+    come from ADMISSION_<CLASS>_CONCURRENCY, _QUEUE and _TIMEOUT, and can be
+    changed at runtime in the JSON file at ADMISSION_LIMITS_FILE, which every
+    worker rereads when it changes.
+    """
+    
+    def __init__(self):
+        self.limits = {name: ConcurrencyLimit(*limits) for name, limits in DEFAULT_LIMITS.items()}
+        self.limits_file = None
+        self.reload_seconds = 2.0
+        self._reload_lock = threading.Lock()
+        self._next_reload = 0.0
+        self._limits_file_mtime = None
+    
+    def init_app(self, app):
+        app.config.setdefault('ADMISSION_CONTROL_ENABLED', os.getenv('ADMISSION_CONTROL_ENABLED', 'false').lower() == 'true')
+        app.config.setdefault('ADMISSION_LIMITS_FILE', os.getenv('ADMISSION_LIMITS_FILE'))
+        app.config.setdefault('ADMISSION_RELOAD_SECONDS', float(os.getenv('ADMISSION_RELOAD_SECONDS', 2)))
+        for name, (concurrency, queue, timeout) in DEFAULT_LIMITS.items():
+            prefix = f'ADMISSION_{name.upper()}'
+            app.config.setdefault(f'{prefix}_CONCURRENCY', int(os.getenv(f'{prefix}_CONCURRENCY', concurrency)))
+            app.config.setdefault(f'{prefix}_QUEUE', int(os.getenv(f'{prefix}_QUEUE', queue)))
+            app.config.setdefault(f'{prefix}_TIMEOUT', float(os.getenv(f'{prefix}_TIMEOUT', timeout)))
+            self.limits[name].configure(
+                app.config[f'{prefix}_CONCURRENCY'], app.config[f'{prefix}_QUEUE'], app.config[f'{prefix}_TIMEOUT']
+            )
+            ADMISSION_QUEUE_TIME.labels(name)
+            for reason in ('queue_full', 'timeout'):
+                ADMISSION_SHED.labels(name, reason)
+        if not app.config['ADMISSION_CONTROL_ENABLED']:
+            return
+        
+        self.limits_file = app.config['ADMISSION_LIMITS_FILE']
+        self.reload_seconds = app.config['ADMISSION_RELOAD_SECONDS']
+        self._next_reload = 0.0
+        self._limits_file_mtime = None
+        app.before_request(self._admit)
+        app.teardown_request(self._release)
+    
+    def reload_limits(self):
+        """Apply ADMISSION_LIMITS_FILE if it changed, at most once per reload interval"""
+        now = time.monotonic()
+        if not self.limits_file or now < self._next_reload:
+            return
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_reload = now + self.reload_seconds
+            try:
+                mtime = os.stat(self.limits_file).st_mtime
+            except FileNotFoundError:
+                return
+            if mtime == self._limits_file_mtime:
+                return
+            # Read each version of the file once, even when it is rejected
+            self._limits_file_mtime = mtime
+            try:
+                with open(self.limits_file) as f:
+                    overrides = parse_limits(json.load(f))
+            except (OSError, ValueError) as error:
+                logger.error("Ignoring %s, keeping the current admission limits: %s", self.limits_file, error)
+                return
+            for name, values in overrides.items():
+                self.limits[name].configure(**values)
+        finally:
+            self._reload_lock.release()
+    
+    def admit(self, name):
+        """
+        Take a slot of endpoint class `name`, queueing if it is saturated.
+        
+        Returns the held ConcurrencyLimit, to release when the request ends,
+        or raises Shed. Blocks while queued, so ASGI callers run it on a thread.
+        """
+        self.reload_limits()
+        limit = self.limits[name]
+        try:
+            waited = limit.acquire()
+        except Shed as shed:
+            ADMISSION_SHED.labels(name, shed.reason).inc()
+            raise
+        ADMISSION_QUEUE_TIME.labels(name).observe(waited)
+        return limit
+    
+    def shed_response(self, name):
+        """Body and headers of the 503 for a request of class `name` that was shed"""
+        body = {
+            "error": "Service Unavailable",
+            "message": f"Too many {name} requests in progress, retry shortly"
+        }
+        return body, {'Retry-After': str(max(1, math.ceil(self.limits[name].timeout)))}
+    
+    def _admit(self):
+        name = endpoint_class(request.endpoint, request.blueprint, request.method)
+        if name is None:
+            return None
+        
+        try:
+            request.environ['admission.limit'] = self.admit(name)
+        except Shed:
+            body, headers = self.shed_response(name)
+            response = jsonify(body)
+            response.status_code = 503
+            response.headers.update(headers)
+            return response
+        return None
+    
+    @staticmethod
+    def _release(exception=None):
+        limit = request.environ.pop('admission.limit', None)
+        if limit is not None:
+            limit.release()
+    
+    def snapshot(self):
+        return {name: limit.snapshot() for name, limit in self.limits.items()}
+
+admission_control = AdmissionControl()
@@ -0,0 +1,123 @@
+"""
+Swagger UI and the OpenAPI spec, kept off the worker startup path.
+
+flasgger, and the YAML, markdown and jsonschema modules it pulls in, is only
+imported when the spec is first compiled or /apidocs is first opened. The
+spec is compiled from swagger.yaml and the route docstrings once per
+process, or read from the JSON artifact at OPENAPI_SPEC_FILE when the image
+was built with:
+
+    python -m src.app.api_docs --output openapi.json
+
+It is served with an ETag so clients revalidate instead of downloading it again.
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+from importlib.util import find_spec
+from flask import Blueprint, Response, current_app, request
+
+TEMPLATE_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'swagger.yaml'
+)
+SPEC_ENDPOINT = 'apispec_1'
+# flasgger's default configuration, spelled out so routes can be registered without importing it
+SWAGGER_CONFIG = {
+    'headers': [],
+    'specs': [
+        {
+            'endpoint': SPEC_ENDPOINT,
+            'route': '/apispec_1.json',
+            'rule_filter': lambda rule: True,
+            'model_filter': lambda tag: True,
+        }
+    ],
+    'static_url_path': '/flasgger_static',
+    'swagger_ui': True,
+    'specs_route': '/apidocs/',
+}
+
+def compile_spec(app):
+    """Build the OpenAPI spec from swagger.yaml and every route's docstring"""
+    from flasgger import Swagger
+    
+    # Without an app, Swagger registers no routes; it is only used to parse docstrings
+    swagger = Swagger(config=SWAGGER_CONFIG, merge=True)
+    swagger.app = app
+    swagger.template = swagger.load_swagger_file(TEMPLATE_FILE)
+    with app.test_request_context():
+        return swagger.get_apispecs(SPEC_ENDPOINT)
+
+def serialize_spec(spec):
+    return json.dumps(spec, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+class ApiDocs:
+    """Lazily compiled, cached OpenAPI spec plus the flasgger Swagger UI"""
+    
+    def init_app(self, app):
+        app.config.setdefault('API_DOCS_ENABLED', os.getenv('API_DOCS_ENABLED', 'true').lower() == 'true')
+        app.config.setdefault('OPENAPI_SPEC_FILE', os.getenv('OPENAPI_SPEC_FILE'))
+        if not app.config['API_DOCS_ENABLED']:
+            return
+        
+        # Locating the package does not import it
+        ui_dir = os.path.join(find_spec('flasgger').submodule_search_locations[0], 'ui3')
+        blueprint = Blueprint(
+            'flasgger', __name__,
+            template_folder=os.path.join(ui_dir, 'templates'),
+            static_folder=os.path.join(ui_dir, 'static'),
+            static_url_path=SWAGGER_CONFIG['static_url_path']
+        )
+        blueprint.add_url_rule(SWAGGER_CONFIG['specs_route'], 'apidocs', self._docs_page)
+        blueprint.add_url_rule(SWAGGER_CONFIG['specs'][0]['route'], SPEC_ENDPOINT, self._spec_view)
+        app.register_blueprint(blueprint)
+        app.extensions['api_docs'] = {'lock': threading.Lock(), 'spec': None}
+    
+    @staticmethod
+    def spec(app):
+        """The serialized spec and its ETag, loaded or compiled on first use"""
+        state = app.extensions['api_docs']
+        if state['spec'] is None:
+            with state['lock']:
+                if state['spec'] is None:
+                    path = app.config['OPENAPI_SPEC_FILE']
+                    if path and os.path.exists(path):
+                        with open(path, 'rb') as f:
+                            body = f.read()
+                    else:
+                        body = serialize_spec(compile_spec(app))
+                    state['spec'] = (body, hashlib.sha1(body).hexdigest())
+        return state['spec']
+    
+    def _spec_view(self):
+        body, etag = self.spec(current_app._get_current_object())
+        response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'public, no-cache'
+        return response.make_conditional(request)
+    
+    @staticmethod
+    def _docs_page():
+        from flasgger.base import APIDocsView
+        return APIDocsView.as_view('apidocs', view_args={'config': SWAGGER_CONFIG})()
+
+api_docs = ApiDocs()
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the OpenAPI spec to a JSON file")
+    parser.add_argument('--output', default='openapi.json')
+    args = parser.parse_args()
+    
+    # Compiling reads only the routes; no database is touched
+    os.environ.setdefault('DATABASE_URI', 'sqlite://')
+    from .main import create_app
+    
+    body = serialize_spec(compile_spec(create_app()))
+    with open(args.output, 'wb') as f:
+        f.write(body)
+    print(f"Wrote {len(body)} bytes to {args.output}")
+
+if __name__ == '__main__':
+    main()
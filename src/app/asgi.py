@@ -0,0 +1,58 @@
+"""
+ASGI entry point: one process serves many concurrent requests on an event loop.
+
+    uvicorn --factory src.app.asgi:create_asgi_app --host 0.0.0.0 --port 5000
+
+Auth, meal and allergy CRUD routes run natively on asyncio through the async
+services and the async engine. Every other route (bulk writes, import, export,
+search, leaderboards, Swagger, internal endpoints) falls through to the Flask
+app, which runs on a thread pool. Sharded deployments must use the WSGI mode.
+"""
+from contextlib import asynccontextmanager
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.routing import Mount
+from . import database
+from .main import create_app
+from ..routes.async_auth import auth_routes
+from ..routes.async_meal import meal_routes
+from ..routes.async_allergy import allergy_routes
+from ..utils.asgi import DefaultHeadersMiddleware, EXCEPTION_HANDLERS
+
+# What Talisman and CORS add to the Flask app's responses
+DEFAULT_HEADERS = (
+    ('Content-Security-Policy', "default-src \\self\\; script-src \\self\\; style-src \\self\\"),
+    ('Strict-Transport-Security', 'max-age=31556926; includeSubDomains'),
+    ('X-Frame-Options', 'SAMEORIGIN'),
+    ('X-Content-Type-Options', 'nosniff'),
+    ('Referrer-Policy', 'strict-origin-when-cross-origin'),
+    ('Access-Control-Allow-Origin', '*'),
+)
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await database.async_engine.dispose()
+
+def create_asgi_app():
+    flask_app = create_app()
+    if len(database.shard_engines) > 1:
+        # The async services run on one engine and would write every user's
+        # meals and allergies to shard 0
+        raise ValueError("ASGI mode does not support DATABASE_SHARD_URIS; use SERVER_MODE=wsgi")
+    database.init_async_db(flask_app)
+    
+    app = Starlette(
+        routes=[
+            *auth_routes,
+            *meal_routes,
+            *allergy_routes,
+            Mount('/', app=WSGIMiddleware(flask_app)),
+        ],
+        middleware=[Middleware(DefaultHeadersMiddleware, headers=DEFAULT_HEADERS)],
+        exception_handlers=EXCEPTION_HANDLERS,
+        lifespan=lifespan
+    )
+    app.state.flask_app = flask_app
+    return app
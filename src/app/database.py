@@ -1,14 +1,137 @@
+import os
+import random
+from asyncio import current_task
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, sessionmaker, scoped_session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.sql.util import find_tables
+from sqlalchemy.ext.asyncio import AsyncSession, async_scoped_session, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
+from .pool_stats import InstrumentedQueuePool, instrument_pool
 
 engine = None
-session = None
+# Read-only copies of the primary, from DATABASE_REPLICA_URIS; may be empty
+replica_engines = []
+# Databases holding users' meals and allergies: shard 0 is the primary, the
+# rest come from DATABASE_SHARD_URIS. Users themselves stay on the primary.
+shard_engines = []
+# Tables partitioned by user_id across the shards
+SHARDED_TABLES = frozenset({'meals', 'allergies', 'meal_ingredients', 'meal_allergy_stats'})
+
+def _is_sharded(mapper, clause):
+    if mapper is not None:
+        return mapper.local_table.name in SHARDED_TABLES
+    return clause is not None and any(table.name in SHARDED_TABLES for table in find_tables(clause))
+
+class RoutingSession(Session):
+    """
+    Session that picks a database per statement.
+    
+    Statements on sharded tables go to the shard in `info['shard']`. Once
+    `info['read_only']` is set, reads of the primary go to a replica; flushes
+    and DML statements always go to the primary, so a read-only request that
+    does write still writes to the right place. One replica is picked per
+    session so a request sees a single consistent copy.
+    """
+    
+    def get_bind(self, mapper=None, clause=None, **kw):
+        shard = self.info.get('shard')
+        if shard and _is_sharded(mapper, clause):
+            return shard_engines[shard]
+        if (replica_engines and self.info.get('read_only') and not self._flushing
+                and not getattr(clause, 'is_dml', False)):
+            if 'replica' not in self.info:
+                self.info['replica'] = random.choice(replica_engines)
+            return self.info['replica']
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+# One session per thread (per greenlet under gevent), bound by init_db and
+# removed when each request's app context is torn down
+session = scoped_session(sessionmaker(class_=RoutingSession))
 Base = declarative_base()
 
+# asyncio drivers used by the ASGI serving mode, by database backend
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+}
+# Sync-only engine options that do not carry over to the async engine
+_SYNC_ONLY_ENGINE_OPTIONS = ('poolclass', 'executemany_mode')
+
+async_engine = None
+# One AsyncSession per asyncio task, i.e. per ASGI request; bound by init_async_db
+async_session = async_scoped_session(
+    sessionmaker(class_=AsyncSession, expire_on_commit=False),
+    scopefunc=current_task
+)
+
+def engine_options_from_env(database_uri):
+    """Connection pool settings for create_engine, read from the environment"""
+    if not database_uri or database_uri.startswith('sqlite'):
+        # SQLite picks its own single-file pools; sizing options do not apply
+        return {}
+    
+    options = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true',
+    }
+    if database_uri.startswith('postgresql'):
+        # Page executemany UPDATEs (risk rescoring) instead of one round trip per row
+        options['executemany_mode'] = 'values_plus_batch'
+    return options
+
+def remove_session(exception=None):
+    """Close the current thread's session so nothing carries over to its next request"""
+    session.remove()
+
 def init_db(app):
-    global engine, session
-    engine = create_engine(app.config['SQLALCHEMY_DATABASE_URI'])
-    session = scoped_session(sessionmaker(bind=engine))
+    global engine
+    engine = create_engine(
+        app.config['SQLALCHEMY_DATABASE_URI'],
+        **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    )
+    instrument_pool(engine)
+    replica_engines[:] = [
+        create_engine(uri, **engine_options_from_env(uri))
+        for uri in app.config.get('DATABASE_REPLICA_URIS', ())
+    ]
+    shard_engines[:] = [engine] + [
+        create_engine(uri, **engine_options_from_env(uri))
+        for uri in app.config.get('DATABASE_SHARD_URIS', ())
+    ]
+    session.remove()
+    session.configure(bind=engine)
     Base.metadata.bind = engine
+    app.teardown_appcontext(remove_session)
     return session
+
+def async_database_uri(database_uri):
+    """Rewrite a database URI to use the asyncio driver for its backend"""
+    url = make_url(database_uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No asyncio driver configured for {backend}")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+def init_async_db(app):
+    global async_engine
+    options = {
+        key: value
+        for key, value in app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}).items()
+        if key not in _SYNC_ONLY_ENGINE_OPTIONS
+    }
+    url = async_database_uri(app.config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:'):
+        # aiosqlite runs each connection on its own thread; keep them instead
+        # of paying for a new connection and thread on every checkout
+        options.setdefault('poolclass', AsyncAdaptedQueuePool)
+    async_engine = create_async_engine(url, **options)
+    instrument_pool(async_engine.sync_engine)
+    # Configure the factory directly: scoped configure() needs a running task
+    async_session.session_factory.configure(bind=async_engine)
+    return async_session
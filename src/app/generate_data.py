@@ -0,0 +1,250 @@
+"""
+Synthetic users, meals and allergies for performance testing.
+
+Rows are generated with NumPy from a fixed seed and written in batches with
+COPY on PostgreSQL (psycopg2) or executemany INSERTs elsewhere, bypassing the
+ORM. Meals per user and allergies per meal follow power laws (Zipf exponents
+--meal-skew and --allergy-skew; 0 is uniform), so a few users own most meals
+and a few meals collect most allergies. The same seed and arguments always
+produce the same rows:
+
+    python -m src.app.generate_data --users 100000 --meals 8000000 --allergies 2000000
+    python -m src.app.generate_data --meal-skew 0 --allergy-skew 2 --seed 7
+
+New rows get ids after the current maximum, so an existing database is added
+to, not replaced. Risk scores are computed afterwards by
+RiskService.rescore_all_meals.
+"""
+import argparse
+import csv
+import io
+import time
+import numpy as np
+from sqlalchemy import func, select, text
+from . import database
+from .main import create_app
+from ..models.user import User
+from ..models.meal import Meal
+from ..models.allergy import Allergy
+from ..models.meal_stats import MealAllergyStats
+from ..models.meal_ingredient import MealIngredient
+from ..services.risk_service import RiskService
+from ..utils.ingredients import normalize_term
+from ..utils.password_hasher import password_hasher
+from ..utils.risk_model import MAX_RISK, SEVERITY_WEIGHTS
+
+ALLERGENS = (
+    'peanut', 'milk', 'egg', 'wheat', 'soy', 'sesame', 'shrimp', 'almond', 'walnut', 'cashew',
+    'hazelnut', 'salmon', 'tuna', 'crab', 'mustard', 'celery', 'lupin', 'oat',
+)
+INGREDIENTS = (
+    'rice', 'chicken', 'beef', 'pork', 'tofu', 'onion', 'garlic', 'tomato', 'potato', 'carrot',
+    'pepper', 'basil', 'ginger', 'lime', 'lemon', 'butter', 'cheese', 'yogurt', 'flour', 'noodle',
+    'bean', 'lentil', 'spinach', 'mushroom', 'corn', 'olive', 'vinegar', 'honey', 'sugar', 'salt',
+    'cumin', 'coriander', 'chili', 'coconut', 'apple', 'banana',
+)
+SEVERITIES = ('mild', 'moderate', 'severe')
+SEVERITY_SHARES = (0.6, 0.3, 0.1)
+# Independent random streams, so changing one count leaves the other tables' rows alone
+MEAL_STREAM, INGREDIENT_STREAM, ALLERGY_STREAM = range(3)
+
+def power_law(n, skew, rng):
+    """Zipf probabilities over `n` items, shuffled so the heavy items are spread out"""
+    weights = 1.0 / np.arange(1, n + 1, dtype=np.float64) ** skew
+    return rng.permutation(weights / weights.sum())
+
+def vocabulary(size):
+    """Ingredient words that are already normalized index terms, allergens first"""
+    words = ALLERGENS + INGREDIENTS
+    words += tuple(f'spice{n:05d}' for n in range(max(size - len(words), 0)))
+    assert all(normalize_term(word) == word for word in words)
+    return np.array(words)
+
+def copy_rows(connection, table, columns, rows):
+    """Bulk load rows: COPY on PostgreSQL with psycopg2, one executemany INSERT elsewhere"""
+    if not rows:
+        return
+    if connection.dialect.name == 'postgresql' and connection.dialect.driver == 'psycopg2':
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        cursor = connection.connection.cursor()
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+    else:
+        connection.execute(table.insert(), [dict(zip(columns, row)) for row in rows])
+
+def next_id(connection, column):
+    return (connection.execute(select(func.max(column))).scalar() or 0) + 1
+
+class SyntheticDataset:
+    """Deterministic synthetic data, generated as arrays and written a batch at a time"""
+    
+    def __init__(self, users, meals, allergies, meal_skew=1.1, allergy_skew=1.2,
+                 ingredient_skew=1.0, min_ingredients=3, max_ingredients=8,
+                 vocabulary_size=500, seed=42):
+        if users < 1 or meals < 0 or allergies < 0:
+            raise ValueError("Need at least one user and non-negative meal and allergy counts")
+        if not 1 <= min_ingredients <= max_ingredients:
+            raise ValueError("Ingredient counts must satisfy 1 <= min <= max")
+        if allergies and not meals:
+            raise ValueError("Allergies need meals to belong to")
+        
+        self.users = users
+        self.meals = meals
+        self.allergies = allergies
+        self.min_ingredients = min_ingredients
+        self.max_ingredients = max_ingredients
+        self.seed = seed
+        self.words = vocabulary(vocabulary_size)
+        
+        rng = self._rng(MEAL_STREAM)
+        meals_per_user = rng.multinomial(meals, power_law(users, meal_skew, rng))
+        # Meal position -> user position; each user's meals get consecutive ids
+        self.meal_user = np.repeat(np.arange(users, dtype=np.int64), meals_per_user)
+        self.term_p = power_law(len(self.words), ingredient_skew, rng)
+        
+        rng = self._rng(ALLERGY_STREAM)
+        if allergies:
+            self.allergy_meal = rng.choice(meals, size=allergies, p=power_law(meals, allergy_skew, rng))
+        else:
+            self.allergy_meal = np.zeros(0, dtype=np.int64)
+        self.allergy_name = rng.choice(len(ALLERGENS), size=allergies, p=power_law(len(ALLERGENS), 1.0, rng))
+        self.allergy_severity = rng.choice(len(SEVERITIES), size=allergies, p=SEVERITY_SHARES)
+        
+        # Denormalized per-meal columns, written with the meals themselves
+        weights = np.array([SEVERITY_WEIGHTS[severity] for severity in SEVERITIES])
+        self.allergy_count = np.bincount(self.allergy_meal, minlength=meals)
+        self.severity_score = np.bincount(
+            self.allergy_meal, weights=weights[self.allergy_severity], minlength=meals
+        )
+    
+    def _rng(self, stream):
+        return np.random.default_rng([self.seed, stream])
+    
+    def load(self, engine, batch_size=50000, password='synthetic-password', log=print):
+        """Write every row in batches of `batch_size`; returns row counts per table"""
+        with engine.begin() as connection:
+            first_user_id = next_id(connection, User.id)
+            first_meal_id = next_id(connection, Meal.id)
+            first_allergy_id = next_id(connection, Allergy.id)
+        password_hash = password_hasher.hash(password)
+        counts = dict.fromkeys(('users', 'meals', 'meal_ingredients', 'allergies'), 0)
+        
+        started = time.perf_counter()
+        for start in range(0, self.users, batch_size):
+            user_ids = range(first_user_id + start, first_user_id + min(start + batch_size, self.users))
+            with engine.begin() as connection:
+                copy_rows(connection, User.__table__, ('id', 'username', 'email', 'password_hash'), [
+                    (user_id, f'synthetic{user_id}', f'synthetic{user_id}@example.com', password_hash)
+                    for user_id in user_ids
+                ])
+            counts['users'] += len(user_ids)
+        log(f"users: {counts['users']} rows in {time.perf_counter() - started:.1f}s")
+        
+        started = time.perf_counter()
+        rng = self._rng(INGREDIENT_STREAM)
+        for start in range(0, self.meals, batch_size):
+            stop = min(start + batch_size, self.meals)
+            meal_count, index_count = self._load_meals(
+                engine, rng, start, stop, first_user_id, first_meal_id
+            )
+            counts['meals'] += meal_count
+            counts['meal_ingredients'] += index_count
+            log(f"meals: {counts['meals']}/{self.meals} ({time.perf_counter() - started:.1f}s)")
+        
+        started = time.perf_counter()
+        for start in range(0, self.allergies, batch_size):
+            stop = min(start + batch_size, self.allergies)
+            meal_positions = self.allergy_meal[start:stop]
+            with engine.begin() as connection:
+                copy_rows(connection, Allergy.__table__, ('id', 'user_id', 'meal_id', 'name', 'severity'), list(zip(
+                    range(first_allergy_id + start, first_allergy_id + stop),
+                    (self.meal_user[meal_positions] + first_user_id).tolist(),
+                    (meal_positions + first_meal_id).tolist(),
+                    [f'{ALLERGENS[name]} allergy' for name in self.allergy_name[start:stop].tolist()],
+                    [SEVERITIES[severity] for severity in self.allergy_severity[start:stop].tolist()],
+                )))
+            counts['allergies'] += stop - start
+        log(f"allergies: {counts['allergies']} rows in {time.perf_counter() - started:.1f}s")
+        
+        if engine.dialect.name == 'postgresql':
+            # Ids were given explicitly, so move the sequences past them
+            with engine.begin() as connection:
+                for table in (User.__table__, Meal.__table__, Allergy.__table__):
+                    connection.execute(text(
+                        f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                        f"(SELECT COALESCE(max(id), 1) FROM {table.name}))"
+                    ))
+        return counts
+    
+    def _load_meals(self, engine, rng, start, stop, first_user_id, first_meal_id):
+        """Write meals [start, stop) with their summary rows and ingredient index"""
+        n = stop - start
+        sizes = rng.integers(self.min_ingredients, self.max_ingredients + 1, size=n)
+        owners = np.repeat(np.arange(n, dtype=np.int64), sizes)
+        terms = rng.choice(len(self.words), size=len(owners), p=self.term_p)
+        # One index row per distinct term of a meal
+        owners, terms = np.divmod(np.unique(owners * len(self.words) + terms), len(self.words))
+        boundaries = np.flatnonzero(np.diff(owners)) + 1
+        ingredients = [', '.join(group) for group in np.split(self.words[terms], boundaries)]
+        
+        meal_ids = np.arange(first_meal_id + start, first_meal_id + stop)
+        user_ids = self.meal_user[start:stop] + first_user_id
+        severity = self.severity_score[start:stop]
+        with engine.begin() as connection:
+            copy_rows(connection, Meal.__table__, (
+                'id', 'user_id', 'name', 'description', 'ingredients',
+                'allergy_count', 'severity_score', 'ingredient_score', 'allergy_risk',
+            ), list(zip(
+                meal_ids.tolist(), user_ids.tolist(),
+                [f'Synthetic meal {meal_id}' for meal_id in meal_ids.tolist()],
+                [''] * n, ingredients,
+                self.allergy_count[start:stop].tolist(), severity.tolist(),
+                [0.0] * n, np.minimum(severity, MAX_RISK).tolist(),
+            )))
+            copy_rows(connection, MealAllergyStats.__table__, ('meal_id', 'allergy_count'), list(zip(
+                meal_ids.tolist(), self.allergy_count[start:stop].tolist()
+            )))
+            copy_rows(connection, MealIngredient.__table__, ('meal_id', 'user_id', 'term'), list(zip(
+                meal_ids[owners].tolist(), user_ids[owners].tolist(), self.words[terms].tolist()
+            )))
+        return n, len(terms)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--meals', type=int, default=1000000)
+    parser.add_argument('--allergies', type=int, default=200000)
+    parser.add_argument('--meal-skew', type=float, default=1.1, help='Zipf exponent of meals per user')
+    parser.add_argument('--allergy-skew', type=float, default=1.2, help='Zipf exponent of allergies per meal')
+    parser.add_argument('--ingredient-skew', type=float, default=1.0, help='Zipf exponent of ingredient popularity')
+    parser.add_argument('--min-ingredients', type=int, default=3)
+    parser.add_argument('--max-ingredients', type=int, default=8)
+    parser.add_argument('--vocabulary', type=int, default=500, help='distinct ingredient words')
+    parser.add_argument('--batch-size', type=int, default=50000, help='rows per COPY or INSERT batch')
+    parser.add_argument('--password', default='synthetic-password', help='password of every generated user')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    
+    app = create_app()
+    started = time.perf_counter()
+    dataset = SyntheticDataset(
+        args.users, args.meals, args.allergies,
+        meal_skew=args.meal_skew, allergy_skew=args.allergy_skew, ingredient_skew=args.ingredient_skew,
+        min_ingredients=args.min_ingredients, max_ingredients=args.max_ingredients,
+        vocabulary_size=args.vocabulary, seed=args.seed
+    )
+    print(f"Generated in {time.perf_counter() - started:.1f}s")
+    
+    with app.app_context():
+        database.Base.metadata.create_all(bind=database.engine)
+        counts = dataset.load(database.engine, args.batch_size, args.password)
+        started = time.perf_counter()
+        RiskService.rescore_all_meals()
+        print(f"Scored meals in {time.perf_counter() - started:.1f}s")
+    print(', '.join(f"{count} {table}" for table, count in counts.items()))
+
+if __name__ == '__main__':
+    main()
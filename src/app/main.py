@@ -2,15 +2,25 @@ import os
 from flask import Flask
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
-from flasgger import Swagger
 from flask_talisman import Talisman
 from dotenv import load_dotenv
-from .database import init_db, session
+from . import database
+from .database import init_db, session, engine_options_from_env
+from .sql_profiler import sql_profiler
+from .metrics import request_metrics
+from .read_replicas import read_routing
+from .sharding import shard_map
+from .api_docs import api_docs
+from .admission import admission_control
 from ..routes.auth import auth_bp
-from ..routes.user import user_bp
 from ..routes.meal import meal_bp
 from ..routes.allergy import allergy_bp
+from ..routes.internal import internal_bp
+from ..routes.metrics import metrics_bp
 from ..utils.error_handlers import register_error_handlers
+from ..utils.password_hasher import password_hasher
+from ..services.auth_service import user_cache
+from ..services.meal_service import analytics_cache
 
 load_dotenv()
 
@@ -20,7 +30,23 @@ def create_app():
     # Configuration
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URI')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options_from_env(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config['DATABASE_REPLICA_URIS'] = [uri.strip() for uri in os.getenv('DATABASE_REPLICA_URIS', '').split(',') if uri.strip()]
+    app.config['DATABASE_SHARD_URIS'] = [uri.strip() for uri in os.getenv('DATABASE_SHARD_URIS', '').split(',') if uri.strip()]
+    app.config['INTERNAL_ENDPOINTS_ENABLED'] = os.getenv('INTERNAL_ENDPOINTS_ENABLED', 'false').lower() == 'true'
+    app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', 'false').lower() == 'true'
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY')
+    app.config['FORCE_HTTPS'] = os.getenv('FORCE_HTTPS', 'true').lower() == 'true'
+    app.config['USER_CACHE_SIZE'] = int(os.getenv('USER_CACHE_SIZE', 1024))
+    app.config['USER_CACHE_TTL'] = float(os.getenv('USER_CACHE_TTL', 60))
+    app.config['USER_CACHE_MAX_ROWS'] = int(os.getenv('USER_CACHE_MAX_ROWS', 500))
+    app.config['ANALYTICS_CACHE_SIZE'] = int(os.getenv('ANALYTICS_CACHE_SIZE', 128))
+    app.config['ANALYTICS_CACHE_TTL'] = float(os.getenv('ANALYTICS_CACHE_TTL', 30))
+    app.config['ANALYTICS_CACHE_STALE_TTL'] = float(os.getenv('ANALYTICS_CACHE_STALE_TTL', 300))
+    app.config['MEAL_BULK_MAX_ITEMS'] = int(os.getenv('MEAL_BULK_MAX_ITEMS', 500))
+    app.config['ALLERGY_IMPORT_CHUNK_SIZE'] = int(os.getenv('ALLERGY_IMPORT_CHUNK_SIZE', 500))
+    app.config['ALLERGY_IMPORT_MAX_LINE_BYTES'] = int(os.getenv('ALLERGY_IMPORT_MAX_LINE_BYTES', 4096))
+    app.config['EXPORT_BATCH_SIZE'] = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
     
     # Security Configurations
     Talisman(app, 
@@ -29,29 +55,50 @@ def create_app():
                  'script-src': '\\self\\',
                  'style-src': '\\self\\',
              },
-             force_https=True,
+             force_https=app.config['FORCE_HTTPS'],
              strict_transport_security=True,
-             x_frame_options='SAMEORIGIN')
+             frame_options='SAMEORIGIN')
+    
+    # Shed load before any database work when a class of endpoints is saturated
+    admission_control.init_app(app)
     
     # Initialize database
     init_db(app)
+    read_routing.init_app(app)
+    shard_map.init_app(app)
+    sql_profiler.init_app(app, *database.shard_engines, *database.replica_engines)
+    user_cache.configure(app.config['USER_CACHE_SIZE'], app.config['USER_CACHE_TTL'], app.config['USER_CACHE_MAX_ROWS'])
+    analytics_cache.configure(
+        app.config['ANALYTICS_CACHE_SIZE'], app.config['ANALYTICS_CACHE_TTL'],
+        app.config['ANALYTICS_CACHE_STALE_TTL'], context=app.app_context
+    )
     
     # Extensions
     JWTManager(app)
+    password_hasher.init_app(app)
     CORS(app, resources={r"/*": {"origins": "*"}})
     
-    # Swagger Configuration
-    Swagger(app, template_file='swagger.yaml')
+    # API docs; the spec is compiled on first use, not at startup
+    api_docs.init_app(app)
     
     # Error Handlers
     register_error_handlers(app)
     
     # Blueprints
     app.register_blueprint(auth_bp, url_prefix='/auth')
-    app.register_blueprint(user_bp, url_prefix='/users')
     app.register_blueprint(meal_bp, url_prefix='/meals')
     app.register_blueprint(allergy_bp, url_prefix='/allergies')
     
+    # Operational endpoints, only exposed on internal deployments
+    if app.config['INTERNAL_ENDPOINTS_ENABLED']:
+        app.register_blueprint(internal_bp, url_prefix='/internal')
+    
+    # Prometheus metrics; instrument last so every endpoint is known up front,
+    # though request timing still starts before admission control
+    if app.config['METRICS_ENABLED']:
+        app.register_blueprint(metrics_bp, url_prefix='/metrics')
+        request_metrics.init_app(app, database.engine)
+    
     return app
 
 if __name__ == '__main__':
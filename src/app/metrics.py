@@ -0,0 +1,113 @@
+import os
+import time
+from flask import request
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, multiprocess
+from sqlalchemy.pool import QueuePool
+from .pool_stats import pool_stats
+
+# Fixed latency buckets in seconds; every endpoint's histogram is created up front
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Label for requests that matched no route
+UNMATCHED = 'unmatched'
+
+REQUESTS = Counter(
+    'http_requests_total', 'HTTP requests served',
+    ['blueprint', 'endpoint', 'method', 'status']
+)
+LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time to serve a request, including streamed bodies',
+    ['blueprint', 'endpoint', 'method'],
+    buckets=LATENCY_BUCKETS
+)
+# Gauges are summed over live worker processes in multiprocess mode
+IN_FLIGHT = Gauge(
+    'http_requests_in_flight', 'Requests being served',
+    ['blueprint'],
+    multiprocess_mode='livesum'
+)
+POOL_IN_USE = Gauge(
+    'db_pool_connections_in_use', 'Database connections checked out of the pool',
+    multiprocess_mode='livesum'
+)
+POOL_SIZE = Gauge(
+    'db_pool_size', 'Persistent connections the pool keeps',
+    multiprocess_mode='livesum'
+)
+POOL_OVERFLOW = Gauge(
+    'db_pool_overflow', 'Connections open beyond the pool size',
+    multiprocess_mode='livesum'
+)
+# Admission control, per endpoint class (auth, write, read, analytics)
+ADMISSION_SHED = Counter(
+    'admission_shed_total', 'Requests turned away with a 503 by admission control',
+    ['endpoint_class', 'reason']
+)
+ADMISSION_QUEUE_TIME = Histogram(
+    'admission_queue_seconds', 'Time admitted requests waited for a concurrency slot',
+    ['endpoint_class'],
+    buckets=(0.0, 0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+def metrics_registry():
+    """
+    Registry to export: this process's metrics, or every worker's when
+    PROMETHEUS_MULTIPROC_DIR is set (it must be set before the server starts)
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+def _labels():
+    endpoint = request.endpoint or UNMATCHED
+    return request.blueprint or '', endpoint
+
+class RequestMetrics:
+    """Request counts, latency histograms, in-flight and pool gauges for a Flask app"""
+    
+    def init_app(self, app, engine):
+        """Call after every blueprint is registered so all endpoints are preallocated"""
+        self.engine = engine
+        for rule in app.url_map.iter_rules():
+            blueprint = rule.endpoint.rpartition('.')[0]
+            for method in rule.methods - {'HEAD', 'OPTIONS'}:
+                LATENCY.labels(blueprint, rule.endpoint, method)
+            IN_FLIGHT.labels(blueprint)
+        
+        # Start ahead of every other before_request hook, admission control
+        # included, so requests it sheds are counted and timed too
+        app.before_request_funcs.setdefault(None, []).insert(0, self._start)
+        app.after_request(self._record_status)
+        app.teardown_request(self._finish)
+    
+    @staticmethod
+    def _start():
+        request.environ['metrics.started'] = time.perf_counter()
+        IN_FLIGHT.labels(request.blueprint or '').inc()
+    
+    @staticmethod
+    def _record_status(response):
+        request.environ['metrics.status'] = response.status_code
+        return response
+    
+    def _finish(self, exception=None):
+        started = request.environ.pop('metrics.started', None)
+        if started is None:
+            return
+        blueprint, endpoint = _labels()
+        status = request.environ.pop('metrics.status', 500)
+        
+        LATENCY.labels(blueprint, endpoint, request.method).observe(time.perf_counter() - started)
+        REQUESTS.labels(blueprint, endpoint, request.method, str(status)).inc()
+        IN_FLIGHT.labels(blueprint).dec()
+        self.update_pool_gauges()
+    
+    def update_pool_gauges(self):
+        pool = self.engine.pool
+        POOL_IN_USE.set(pool_stats.in_use)
+        if isinstance(pool, QueuePool):
+            POOL_SIZE.set(pool.size())
+            POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+request_metrics = RequestMetrics()
@@ -1,7 +1,9 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import scoped_session, sessionmaker
 from .main import create_app
+from . import database
 from .database import Base
+from .sharding import create_shard_schema
 
 app = create_app()
 
@@ -10,6 +12,8 @@ def init_migrations():
     with app.app_context():
         engine = create_engine(app.config['SQLALCHEMY_DATABASE_URI'])
         Base.metadata.create_all(bind=engine)
+        for shard, shard_engine in enumerate(database.shard_engines[1:], start=1):
+            create_shard_schema(shard_engine, shard)
 
 if __name__ == '__main__':
     init_migrations()
@@ -0,0 +1,114 @@
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+class PoolStats:
+    """Thread-safe counters describing connection pool usage in this process"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.checkins = 0
+            self.connects = 0
+            self.invalidations = 0
+            self.timeouts = 0
+            self.in_use = 0
+            self.peak_in_use = 0
+            self.waits = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+    
+    def record_checkout(self):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+    
+    def record_checkin(self):
+        with self._lock:
+            self.checkins += 1
+            self.in_use = max(self.in_use - 1, 0)
+    
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+    
+    def record_invalidation(self):
+        with self._lock:
+            self.invalidations += 1
+    
+    def record_wait(self, seconds, timed_out=False):
+        with self._lock:
+            self.waits += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            if timed_out:
+                self.timeouts += 1
+    
+    def snapshot(self, pool=None):
+        """Return the counters, plus the live pool state when a pool is given"""
+        with self._lock:
+            stats = {
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "wait_seconds_total": round(self.total_wait, 6),
+                "wait_seconds_max": round(self.max_wait, 6),
+                "wait_seconds_avg": round(self.total_wait / self.waits, 6) if self.waits else 0.0,
+            }
+        
+        if isinstance(pool, QueuePool):
+            stats.update({
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+            })
+        return stats
+
+pool_stats = PoolStats()
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection"""
+    
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_stats.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        pool_stats.record_wait(time.perf_counter() - start)
+        return connection
+
+def instrument_pool(engine, stats=pool_stats):
+    """Attach pool event hooks feeding `stats` to an engine"""
+    stats.reset()
+    
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        stats.record_connect()
+    
+    @event.listens_for(engine, 'checkout')
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.record_checkout()
+    
+    @event.listens_for(engine, 'checkin')
+    def on_checkin(dbapi_connection, connection_record):
+        stats.record_checkin()
+    
+    @event.listens_for(engine, 'invalidate')
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        stats.record_invalidation()
+    
+    return stats
@@ -0,0 +1,108 @@
+import os
+import random
+from flask import current_app, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt import PyJWTError
+from sqlalchemy import select
+from sqlalchemy.exc import DBAPIError
+from . import database
+from ..models.user import User
+from ..utils.cache import TTLCache
+
+# Blueprints whose GET handlers only read, and may be served from a replica
+READ_REPLICA_BLUEPRINTS = frozenset({'meals', 'allergies', 'auth'})
+READ_METHODS = frozenset({'GET', 'HEAD'})
+# Set on write responses so the client's next requests, on any worker, read from the primary
+STICKY_COOKIE = 'read_primary'
+
+class ReadReplicaRouting:
+    """
+    Serves read-only requests from the replicas in DATABASE_REPLICA_URIS.
+    
+    GET requests to the meal, allergy and auth blueprints read from a
+    replica; everything else uses the primary. Users read their own writes
+    despite replication lag: for READ_YOUR_WRITES_SECONDS after a write their
+    reads stay on the primary, remembered by JWT identity in this worker and
+    by a cookie for clients that keep it. Otherwise an authenticated read
+    compares the user's data version on the primary and on the replica,
+    two primary key lookups, and only uses a replica that has caught up.
+    """
+    
+    def __init__(self):
+        self.recent_writers = TTLCache()
+    
+    def init_app(self, app):
+        app.config.setdefault('READ_YOUR_WRITES_SECONDS', int(os.getenv('READ_YOUR_WRITES_SECONDS', 5)))
+        app.config.setdefault('READ_YOUR_WRITES_MAX_USERS', int(os.getenv('READ_YOUR_WRITES_MAX_USERS', 10000)))
+        if not database.replica_engines:
+            return
+        
+        self.recent_writers.configure(app.config['READ_YOUR_WRITES_MAX_USERS'], app.config['READ_YOUR_WRITES_SECONDS'])
+        app.before_request(self._route)
+        app.after_request(self._remember_write)
+    
+    def _route(self):
+        if (request.method in READ_METHODS and request.blueprint in READ_REPLICA_BLUEPRINTS
+                and not self._wrote_recently()):
+            database.session.info['read_only'] = True
+    
+    def _wrote_recently(self):
+        if STICKY_COOKIE in request.cookies:
+            return True
+        identity = request_identity(verify=True)
+        if identity is None:
+            return False
+        if self.recent_writers.get(identity) is not None:
+            return True
+        
+        # Another worker may have served the write; every write bumps the
+        # user's data version on the primary, so pick a replica that has it
+        statement = select(User.data_version).where(User.id == identity)
+        replica = random.choice(database.replica_engines)
+        try:
+            with database.engine.connect() as connection:
+                primary_version = connection.execute(statement).scalar()
+            with replica.connect() as connection:
+                replica_version = connection.execute(statement).scalar()
+        except DBAPIError:
+            # An unreachable or failing replica must not fail the read
+            return True
+        if primary_version is None or replica_version != primary_version:
+            return True
+        database.session.info['replica'] = replica
+        return False
+    
+    def _remember_write(self, response):
+        if request.method in READ_METHODS or response.status_code >= 400:
+            return response
+        
+        identity = request_identity()
+        if identity is not None:
+            self.recent_writers.set(identity, True)
+        response.set_cookie(
+            STICKY_COOKIE, '1',
+            max_age=current_app.config['READ_YOUR_WRITES_SECONDS'],
+            secure=True, httponly=True, samesite='Lax'
+        )
+        return response
+
+def request_identity(verify=False):
+    """
+    The request's user, or None; invalid tokens are left for @jwt_required to reject.
+    
+    With `verify`, a token not yet checked in this request is verified once
+    and the result is reused by later calls.
+    """
+    try:
+        return get_jwt_identity()
+    except RuntimeError:
+        if not verify:
+            return None
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
+    except (JWTExtendedException, PyJWTError):
+        return None
+
+read_routing = ReadReplicaRouting()
@@ -0,0 +1,153 @@
+"""
+Move users' meals and allergies between shards.
+
+Each user's rows are copied to the target shard, the shard map is pointed at
+it, and after a grace period, long enough for every worker's cached shard map
+entry to expire, the rows are deleted from the source shard. Rows created on
+the source during the grace period by workers with a stale entry are carried
+over before the delete; edits to existing rows made then are lost, so move
+users while traffic is low:
+
+    python -m src.app.rebalance --user 42 --user 43 --to 2
+    python -m src.app.rebalance --from-shard 0 --count 1000 --to 3
+
+Rows keep their ids. On PostgreSQL shards allocate ids from disjoint ranges
+(see create_shard_schema); elsewhere a move that would collide is refused.
+"""
+import argparse
+import time
+from sqlalchemy import delete, func, insert, select
+from . import database
+from .main import create_app
+from .sharding import shard_map
+from ..models.user import User
+from ..models.user_shard import UserShard
+from ..models.meal import Meal
+from ..models.allergy import Allergy
+from ..models.meal_stats import MealAllergyStats
+from ..models.meal_ingredient import MealIngredient
+from ..utils.ndjson import chunked
+
+# Sharded tables, parents first
+USER_TABLES = (
+    Meal.__table__, MealAllergyStats.__table__, MealIngredient.__table__, Allergy.__table__,
+)
+# Ids checked against the target shard per query
+COLLISION_CHECK_BATCH = 500
+
+def _user_filter(table, user_id):
+    if 'user_id' in table.c:
+        return table.c.user_id == user_id
+    return table.c.meal_id.in_(select(Meal.id).where(Meal.user_id == user_id))
+
+def _primary_key(table, row):
+    return tuple(row[column.name] for column in table.primary_key)
+
+def read_user_rows(connection, user_id):
+    """Every sharded row of one user, as {table: [row dicts]}"""
+    return {
+        table: [dict(row._mapping) for row in connection.execute(select(table).where(_user_filter(table, user_id)))]
+        for table in USER_TABLES
+    }
+
+def _check_collisions(connection, rows):
+    for table in (Meal.__table__, Allergy.__table__):
+        for ids in chunked([row['id'] for row in rows[table]], COLLISION_CHECK_BATCH):
+            taken = connection.execute(select(func.count()).where(table.c.id.in_(ids))).scalar()
+            if taken:
+                raise ValueError(f"{taken} {table.name} ids are already used on the target shard")
+
+def _copy_rows(connection, rows):
+    for table in USER_TABLES:
+        if rows[table]:
+            connection.execute(insert(table), rows[table])
+
+def _copy_and_switch(user_id, target):
+    """Copy a user's rows to `target` and point the shard map at it; returns (source, rows)"""
+    shard_map.cache.invalidate(user_id)
+    source = shard_map.shard_for(user_id)
+    if source == target:
+        return source, None
+    
+    with database.shard_engines[source].connect() as connection:
+        rows = read_user_rows(connection, user_id)
+    with database.shard_engines[target].begin() as connection:
+        _check_collisions(connection, rows)
+        _copy_rows(connection, rows)
+    
+    # Switch the shard map and invalidate every cached ETag of the user
+    with database.engine.begin() as connection:
+        connection.execute(delete(UserShard).where(UserShard.user_id == user_id))
+        connection.execute(insert(UserShard).values(user_id=user_id, shard=target))
+        connection.execute(User.bump_data_version(user_id))
+    shard_map.cache.invalidate(user_id)
+    return source, rows
+
+def _clear_source(user_id, source, target, rows):
+    """Carry over rows created on the source since the copy, then delete the user's rows there"""
+    with database.shard_engines[source].begin() as connection:
+        copied = {table: {_primary_key(table, row) for row in rows[table]} for table in USER_TABLES}
+        late_rows = {
+            table: [row for row in table_rows if _primary_key(table, row) not in copied[table]]
+            for table, table_rows in read_user_rows(connection, user_id).items()
+        }
+        with database.shard_engines[target].begin() as target_connection:
+            _check_collisions(target_connection, late_rows)
+            _copy_rows(target_connection, late_rows)
+        for table in reversed(USER_TABLES):
+            connection.execute(delete(table).where(_user_filter(table, user_id)))
+    return late_rows
+
+def move_users(user_ids, target, grace_seconds=0.0):
+    """Move users' rows to the `target` shard; returns the number of rows moved per user"""
+    if not 0 <= target < shard_map.shard_count:
+        raise ValueError(f"Shard {target} does not exist")
+    
+    switched = {user_id: _copy_and_switch(user_id, target) for user_id in user_ids}
+    if any(rows is not None for _, rows in switched.values()):
+        time.sleep(grace_seconds)
+    
+    moved = {}
+    for user_id, (source, rows) in switched.items():
+        if rows is None:
+            moved[user_id] = 0
+            continue
+        late_rows = _clear_source(user_id, source, target, rows)
+        moved[user_id] = sum(len(table_rows) for table_rows in (*rows.values(), *late_rows.values()))
+    return moved
+
+def users_on_shard(shard, limit):
+    """Up to `limit` ids of users whose rows live on `shard`"""
+    placement = func.coalesce(UserShard.shard, 0)
+    with database.engine.connect() as connection:
+        return connection.execute(
+            select(User.id)
+            .outerjoin(UserShard, UserShard.user_id == User.id)
+            .where(placement == shard)
+            .order_by(User.id)
+            .limit(limit)
+        ).scalars().all()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--to', type=int, required=True, help='target shard')
+    parser.add_argument('--user', type=int, action='append', default=[], help='user id to move; repeatable')
+    parser.add_argument('--from-shard', type=int, help='move users off this shard')
+    parser.add_argument('--count', type=int, default=100, help='users to move with --from-shard')
+    parser.add_argument('--grace', type=float, help='seconds between switching and deleting; defaults to SHARD_MAP_CACHE_TTL')
+    args = parser.parse_args()
+    
+    app = create_app()
+    with app.app_context():
+        user_ids = list(args.user)
+        if args.from_shard is not None:
+            user_ids += users_on_shard(args.from_shard, args.count)
+        grace = app.config['SHARD_MAP_CACHE_TTL'] if args.grace is None else args.grace
+        started = time.perf_counter()
+        moved = move_users(user_ids, args.to, grace)
+        for user_id, rows in moved.items():
+            print(f"User {user_id}: moved {rows} rows to shard {args.to}")
+        print(f"Moved {sum(1 for rows in moved.values() if rows)} users in {time.perf_counter() - started:.1f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+from .main import create_app
+from .sharding import each_shard
+from ..services.meal_service import MealService
+from ..services.risk_service import RiskService
+
+app = create_app()
+
+def reconcile_allergy_counts():
+    """Recompute denormalized allergy counts for all meals"""
+    with app.app_context():
+        updated = sum(MealService.reconcile_allergy_counts() for _ in each_shard())
+        print(f"Reconciled allergy counts for {updated} meals")
+
+def rebuild_ingredient_index():
+    """Rebuild the ingredient search index from every meal's ingredients"""
+    with app.app_context():
+        indexed = sum(MealService.rebuild_ingredient_index() for _ in each_shard())
+        print(f"Indexed ingredients for {indexed} meals")
+
+def rescore_meals():
+    """Recompute every meal's allergy risk with the current risk model"""
+    with app.app_context():
+        rescored = sum(RiskService.rescore_all_meals() for _ in each_shard())
+        print(f"Rescored allergy risk for {rescored} meals")
+
+if __name__ == '__main__':
+    reconcile_allergy_counts()
+    rebuild_ingredient_index()
+    rescore_meals()
@@ -0,0 +1,119 @@
+import heapq
+import os
+from itertools import islice
+from sqlalchemy import inspect, select, text
+from sqlalchemy.schema import CreateIndex, CreateTable
+from . import database
+from .read_replicas import request_identity
+from ..models.user_shard import UserShard
+from ..utils.cache import TTLCache
+
+# Shard k allocates meal and allergy ids from k * SHARD_ID_SPAN on PostgreSQL,
+# so a user's rows keep their ids when moved: 32 shards fit an INTEGER column
+SHARD_ID_SPAN = 2 ** 26
+
+class ShardMap:
+    """
+    Which shard holds each user's meals and allergies.
+    
+    New users are placed on shard `user_id % N` and the placement is recorded
+    in the user_shards table on the primary, so the rebalance tool can move
+    them later. Users without an entry, created before sharding, live on
+    shard 0. With DATABASE_SHARD_URIS unset there is one shard and nothing is
+    registered. Lookups are cached per worker for SHARD_MAP_CACHE_TTL seconds.
+    """
+    
+    def __init__(self):
+        self.cache = TTLCache()
+    
+    @property
+    def shard_count(self):
+        return len(database.shard_engines)
+    
+    def init_app(self, app):
+        app.config.setdefault('SHARD_MAP_CACHE_SIZE', int(os.getenv('SHARD_MAP_CACHE_SIZE', 10000)))
+        app.config.setdefault('SHARD_MAP_CACHE_TTL', float(os.getenv('SHARD_MAP_CACHE_TTL', 30)))
+        self.cache.configure(app.config['SHARD_MAP_CACHE_SIZE'], app.config['SHARD_MAP_CACHE_TTL'])
+        self.cache.clear()
+        if self.shard_count > 1:
+            app.before_request(self._route)
+    
+    def _route(self):
+        """Point the request's session at the shard of the user in its JWT"""
+        identity = request_identity(verify=True)
+        if identity is not None:
+            database.session.info['shard'] = self.shard_for(identity)
+    
+    def shard_for(self, user_id):
+        shard = self.cache.get(user_id)
+        if shard is None:
+            with database.engine.connect() as connection:
+                shard = connection.execute(
+                    select(UserShard.shard).where(UserShard.user_id == user_id)
+                ).scalar() or 0
+            self.cache.set(user_id, shard)
+        return shard
+    
+    def assign(self, user_id):
+        """Place a new user, in the session's transaction; returns the shard"""
+        if self.shard_count <= 1:
+            return 0
+        shard = user_id % self.shard_count
+        database.session.add(UserShard(user_id=user_id, shard=shard))
+        self.cache.set(user_id, shard)
+        return shard
+
+shard_map = ShardMap()
+
+def scatter(query):
+    """
+    Run `query(db_session)` against every shard and return the per-shard results.
+    
+    Each shard gets its own short-lived session, so ORM results come back
+    detached: load everything they will need up front.
+    """
+    if len(database.shard_engines) <= 1:
+        return [query(database.session)]
+    
+    results = []
+    for shard in range(len(database.shard_engines)):
+        with database.session.session_factory(info={'shard': shard}) as shard_session:
+            results.append(query(shard_session))
+    return results
+
+def merge_sorted(results, key, reverse=False, limit=None):
+    """Merge per-shard results that are each sorted by `key`, keeping the first `limit`"""
+    return list(islice(heapq.merge(*results, key=key, reverse=reverse), limit))
+
+def create_shard_schema(shard_engine, shard):
+    """
+    Create the sharded tables on a shard database.
+    
+    Foreign keys to users are left out since users stay on the primary. On
+    PostgreSQL, new tables start their ids at the shard's own range.
+    """
+    tables = [table for table in database.Base.metadata.sorted_tables if table.name in database.SHARDED_TABLES]
+    with shard_engine.begin() as connection:
+        existing = set(inspect(connection).get_table_names())
+        for table in tables:
+            if table.name in existing:
+                continue
+            connection.execute(CreateTable(table, include_foreign_key_constraints=[
+                constraint for constraint in table.foreign_key_constraints
+                if constraint.referred_table.name in database.SHARDED_TABLES
+            ]))
+            for index in table.indexes:
+                connection.execute(CreateIndex(index))
+            if connection.dialect.name == 'postgresql' and shard and 'id' in table.c:
+                connection.execute(
+                    text(f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), :start, false)"),
+                    {'start': shard * SHARD_ID_SPAN + 1}
+                )
+
+def each_shard():
+    """Point the scoped session at each shard in turn, for jobs that touch every user"""
+    for shard in range(len(database.shard_engines)):
+        database.session.remove()
+        database.session.info['shard'] = shard
+        yield shard
+    database.session.remove()
@@ -0,0 +1,111 @@
+import os
+import time
+from collections import Counter
+from contextvars import ContextVar
+from flask import current_app, request
+from sqlalchemy import event
+
+# Statements kept per request for the slow-request log; later ones are only counted
+MAX_RECORDED_STATEMENTS = 200
+# Statements shown in a slow-request log entry
+LOGGED_STATEMENTS = 3
+
+_current_profile = ContextVar('sql_profile', default=None)
+
+class RequestProfile:
+    """Queries run and time spent in the database while serving one request"""
+    
+    __slots__ = ('started', 'query_count', 'db_seconds', 'statements')
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.db_seconds = 0.0
+        self.statements = []
+    
+    def record(self, statement, seconds):
+        self.query_count += 1
+        self.db_seconds += seconds
+        if len(self.statements) < MAX_RECORDED_STATEMENTS:
+            self.statements.append((seconds, statement))
+    
+    def server_timing(self, total_seconds):
+        """Server-Timing header value: database time and query count, then the whole request"""
+        return (
+            f'db;desc="{self.query_count} queries";dur={self.db_seconds * 1000:.2f}, '
+            f'app;dur={total_seconds * 1000:.2f}'
+        )
+    
+    def offenders(self):
+        """The slowest statements and the most repeated one (a likely N+1)"""
+        slowest = sorted(self.statements, key=lambda item: item[0], reverse=True)[:LOGGED_STATEMENTS]
+        repeated = Counter(statement for _, statement in self.statements).most_common(1)
+        return slowest, repeated[0] if repeated else None
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile.get() is not None:
+        conn.info.setdefault('sql_profile_started', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile.get()
+    started = conn.info.get('sql_profile_started')
+    if profile is not None and started:
+        profile.record(statement, time.perf_counter() - started.pop())
+
+class SQLProfiler:
+    """
+    Opt-in per-request query counting and database timing.
+    
+    When SQL_PROFILING_ENABLED is off nothing is registered, so requests and
+    queries pay nothing. When on, every response carries a Server-Timing
+    header and requests over SQL_PROFILING_MAX_QUERIES queries or
+    SQL_PROFILING_SLOW_MS milliseconds are logged with their worst SQL.
+    Queries run while a streamed body is being sent are not counted.
+    """
+    
+    def init_app(self, app, *engines):
+        app.config.setdefault('SQL_PROFILING_ENABLED', os.getenv('SQL_PROFILING_ENABLED', 'false').lower() == 'true')
+        app.config.setdefault('SQL_PROFILING_MAX_QUERIES', int(os.getenv('SQL_PROFILING_MAX_QUERIES', 20)))
+        app.config.setdefault('SQL_PROFILING_SLOW_MS', float(os.getenv('SQL_PROFILING_SLOW_MS', 500)))
+        if not app.config['SQL_PROFILING_ENABLED']:
+            return
+        
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._discard)
+    
+    @staticmethod
+    def _start():
+        _current_profile.set(RequestProfile())
+    
+    @staticmethod
+    def _finish(response):
+        profile = _current_profile.get()
+        if profile is None:
+            return response
+        
+        total_seconds = time.perf_counter() - profile.started
+        response.headers.add('Server-Timing', profile.server_timing(total_seconds))
+        
+        config = current_app.config
+        if (profile.query_count > config['SQL_PROFILING_MAX_QUERIES']
+                or total_seconds * 1000 > config['SQL_PROFILING_SLOW_MS']):
+            slowest, repeated = profile.offenders()
+            lines = [
+                f"Slow request {request.method} {request.full_path}: {profile.query_count} queries, "
+                f"{profile.db_seconds * 1000:.1f} ms in database, {total_seconds * 1000:.1f} ms total"
+            ]
+            lines += [f"  {seconds * 1000:.1f} ms: {statement}" for seconds, statement in slowest]
+            if repeated and repeated[1] > 1:
+                lines.append(f"  repeated {repeated[1]}x: {repeated[0]}")
+            current_app.logger.warning('\n'.join(lines))
+        return response
+    
+    @staticmethod
+    def _discard(exception=None):
+        _current_profile.set(None)
+
+sql_profiler = SQLProfiler()
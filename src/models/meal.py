@@ -1,41 +1,97 @@
 from ..app.database import Base
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text, Index, case, update, bindparam
 from sqlalchemy.orm import relationship
-from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
-from marshmallow import fields, validates, ValidationError
 from datetime import datetime
+from ..utils.risk_model import MAX_RISK
 
 class Meal(Base):
     __tablename__ = 'meals'
+    __table_args__ = (
+        # Serves keyset pagination over a user's meals
+        Index('ix_meals_user_id_id', 'user_id', 'id'),
+    )
     
     id = Column(Integer, primary_key=True)
     name = Column(String(100), nullable=False)
     description = Column(Text)
     ingredients = Column(Text)
     allergy_risk = Column(Float, default=0.0)
+    # Denormalized number of allergies, maintained in SQL alongside every allergy write
+    allergy_count = Column(Integer, nullable=False, default=0, server_default='0')
+    # Risk components: severity-weighted allergies, maintained in SQL like the
+    # count, and known allergens found in the ingredients, set by RiskService
+    severity_score = Column(Float, nullable=False, default=0.0, server_default='0')
+    ingredient_score = Column(Float, nullable=False, default=0.0, server_default='0')
     
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     user = relationship('User', back_populates='meals')
     
     allergies = relationship('Allergy', back_populates='meal', cascade='all, delete-orphan')
     
-    def update_allergy_risk(self):
-        """Update allergy risk based on number of allergies"""
-        allergy_count = len(self.allergies)
-        self.allergy_risk = min(allergy_count * 0.1, 0.3)  # Max 30% risk
-
-class MealSchema(SQLAlchemyAutoSchema):
-    class Meta:
-        model = Meal
-        load_instance = True
-        include_relationships = True
-    
-    id = fields.Integer(dump_only=True)
-    user_id = fields.Integer(required=True)
-    allergies = fields.List(fields.Nested('AllergySchema', exclude=('meal',)), dump_only=True)
-    allergy_risk = fields.Float(dump_only=True)
-    
-    @validates('name')
-    def validate_name(self, value):
-        if len(value) < 2:
-            raise ValidationError('Meal name must be at least 2 characters long.')
+    @classmethod
+    def allergy_risk_for(cls, severity_score, ingredient_score):
+        """SQL expression combining the risk components, capped at MAX_RISK"""
+        risk = severity_score + ingredient_score
+        return case((risk > MAX_RISK, MAX_RISK), else_=risk)
+    
+    @classmethod
+    def adjust_allergy_count(cls, meal_id, delta, severity_delta):
+        """
+        Atomically adjust a meal's allergy count and severity score and refresh its risk.
+        
+        All columns are computed from the stored values inside one UPDATE, so
+        concurrent writers cannot lose each other's increments.
+        """
+        new_severity = cls.severity_score + severity_delta
+        return (
+            update(cls)
+            .where(cls.id == meal_id)
+            .values(
+                allergy_count=cls.allergy_count + delta,
+                severity_score=new_severity,
+                allergy_risk=cls.allergy_risk_for(new_severity, cls.ingredient_score)
+            )
+            .execution_options(synchronize_session=False)
+        )
+    
+    @classmethod
+    def set_ingredient_scores(cls):
+        """Executemany UPDATE setting `b_ingredient_score` on meal `b_meal_id` and refreshing its risk"""
+        meals = cls.__table__
+        new_score = bindparam('b_ingredient_score')
+        return (
+            update(meals)
+            .where(meals.c.id == bindparam('b_meal_id'))
+            .values(
+                ingredient_score=new_score,
+                allergy_risk=cls.allergy_risk_for(meals.c.severity_score, new_score)
+            )
+        )
+    
+    @classmethod
+    def adjust_ingredient_scores(cls):
+        """Executemany UPDATE adding `b_ingredient_delta` to meal `b_meal_id`'s ingredient score and refreshing its risk"""
+        meals = cls.__table__
+        new_score = meals.c.ingredient_score + bindparam('b_ingredient_delta')
+        return (
+            update(meals)
+            .where(meals.c.id == bindparam('b_meal_id'))
+            .values(
+                ingredient_score=new_score,
+                allergy_risk=cls.allergy_risk_for(meals.c.severity_score, new_score)
+            )
+        )
+    
+    @classmethod
+    def set_risk_scores(cls):
+        """Executemany UPDATE writing every risk column of meal `b_meal_id`"""
+        meals = cls.__table__
+        return (
+            update(meals)
+            .where(meals.c.id == bindparam('b_meal_id'))
+            .values(
+                severity_score=bindparam('b_severity_score'),
+                ingredient_score=bindparam('b_ingredient_score'),
+                allergy_risk=bindparam('b_allergy_risk')
+            )
+        )
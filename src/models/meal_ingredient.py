@@ -0,0 +1,15 @@
+from ..app.database import Base
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
+from ..utils.ingredients import MAX_TERM_LENGTH
+
+class MealIngredient(Base):
+    """Inverted index entry: one normalized ingredient term of a meal"""
+    __tablename__ = 'meal_ingredients'
+    __table_args__ = (
+        # Serves term lookups within one user's meals
+        Index('ix_meal_ingredients_user_term', 'user_id', 'term', 'meal_id'),
+    )
+    
+    meal_id = Column(Integer, ForeignKey('meals.id', ondelete='CASCADE'), primary_key=True)
+    term = Column(String(MAX_TERM_LENGTH), primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
@@ -0,0 +1,27 @@
+from ..app.database import Base
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Index, update, func
+from sqlalchemy.orm import relationship
+
+class MealAllergyStats(Base):
+    """Per-meal allergy summary, maintained incrementally by allergy writes"""
+    __tablename__ = 'meal_allergy_stats'
+    __table_args__ = (
+        # Serves the top-K leaderboards without scanning the allergies table
+        Index('ix_meal_allergy_stats_count', 'allergy_count', 'meal_id'),
+    )
+    
+    meal_id = Column(Integer, ForeignKey('meals.id', ondelete='CASCADE'), primary_key=True)
+    allergy_count = Column(Integer, nullable=False, default=0, server_default='0')
+    updated_at = Column(DateTime, nullable=False, default=func.now(), server_default=func.now())
+    
+    meal = relationship('Meal')
+    
+    @classmethod
+    def adjust(cls, meal_id, delta):
+        """Atomically add `delta` to a meal's summarized allergy count"""
+        return (
+            update(cls)
+            .where(cls.meal_id == meal_id)
+            .values(allergy_count=cls.allergy_count + delta, updated_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
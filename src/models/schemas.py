@@ -0,0 +1,58 @@
+from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
+from marshmallow import fields, validates, ValidationError
+from .user import User
+from .meal import Meal
+from .allergy import Allergy
+
+# Building an auto schema configures every mapper, so the schemas are
+# defined here, once all the models they refer to are imported
+
+class UserSchema(SQLAlchemyAutoSchema):
+    class Meta:
+        model = User
+        load_instance = True
+        include_relationships = True
+        exclude = ('password_hash', 'data_version')
+    
+    id = fields.Integer(dump_only=True)
+    meals = fields.List(fields.Nested('MealSchema', exclude=('user',)), dump_only=True)
+    allergies = fields.List(fields.Nested('AllergySchema', exclude=('user',)), dump_only=True)
+
+class MealSchema(SQLAlchemyAutoSchema):
+    class Meta:
+        model = Meal
+        load_instance = True
+        include_relationships = True
+        exclude = ('severity_score', 'ingredient_score')
+    
+    id = fields.Integer(dump_only=True)
+    user_id = fields.Integer(required=True)
+    allergies = fields.List(fields.Nested('AllergySchema', exclude=('meal',)), dump_only=True)
+    allergy_risk = fields.Float(dump_only=True)
+    allergy_count = fields.Integer(dump_only=True)
+    
+    @validates('name')
+    def validate_name(self, value):
+        if len(value) < 2:
+            raise ValidationError('Meal name must be at least 2 characters long.')
+
+class AllergySchema(SQLAlchemyAutoSchema):
+    class Meta:
+        model = Allergy
+        load_instance = True
+        include_relationships = True
+    
+    id = fields.Integer(dump_only=True)
+    user_id = fields.Integer(required=True)
+    meal_id = fields.Integer(required=True)
+    
+    @validates('name')
+    def validate_name(self, value):
+        if len(value) < 2:
+            raise ValidationError('Allergy name must be at least 2 characters long.')
+    
+    @validates('severity')
+    def validate_severity(self, value):
+        valid_severities = ['mild', 'moderate', 'severe']
+        if value.lower() not in valid_severities:
+            raise ValidationError(f'Severity must be one of: {", ".join(valid_severities)}')
@@ -1,10 +1,7 @@
 from ..app.database import Base
-from sqlalchemy import Column, Integer, String, relationship
-from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
-from marshmallow import fields
-from flask_bcrypt import Bcrypt
-
-bcrypt = Bcrypt()
+from sqlalchemy import Column, Integer, String, update
+from sqlalchemy.orm import relationship
+from ..utils.password_hasher import password_hasher
 
 class User(Base):
     __tablename__ = 'users'
@@ -13,23 +10,25 @@ class User(Base):
     username = Column(String(50), unique=True, nullable=False)
     email = Column(String(120), unique=True, nullable=False)
     password_hash = Column(String(255), nullable=False)
+    # Bumped by every write to the user's meals or allergies; drives ETags
+    data_version = Column(Integer, nullable=False, default=0, server_default='0')
     
     meals = relationship('Meal', back_populates='user')
     allergies = relationship('Allergy', back_populates='user')
     
     def set_password(self, password):
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        return bcrypt.check_password_hash(self.password_hash, password)
-
-class UserSchema(SQLAlchemyAutoSchema):
-    class Meta:
-        model = User
-        load_instance = True
-        include_relationships = True
-        exclude = ('password_hash',)
+        return password_hasher.verify(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        return password_hasher.needs_rehash(self.password_hash)
     
-    id = fields.Integer(dump_only=True)
-    meals = fields.List(fields.Nested('MealSchema', exclude=('user',)), dump_only=True)
-    allergies = fields.List(fields.Nested('AllergySchema', exclude=('user',)), dump_only=True)
+    @classmethod
+    def bump_data_version(cls, user_id=None):
+        """Atomically bump the data version of one user, or of every user"""
+        statement = update(cls).values(data_version=cls.data_version + 1)
+        if user_id is not None:
+            statement = statement.where(cls.id == user_id)
+        return statement.execution_options(synchronize_session=False)
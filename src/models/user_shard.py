@@ -0,0 +1,9 @@
+from ..app.database import Base
+from sqlalchemy import Column, Integer, ForeignKey
+
+class UserShard(Base):
+    """Shard map entry: which database holds a user's meals and allergies"""
+    __tablename__ = 'user_shards'
+    
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    shard = Column(Integer, nullable=False, index=True)
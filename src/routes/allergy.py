@@ -1,12 +1,20 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from marshmallow import ValidationError
+from ..services.auth_service import AuthService
 from ..services.allergy_service import AllergyService
-from ..models.allergy import AllergySchema
-from ..models.user import UserSchema
+from ..services.meal_service import analytics_cache
+from ..models.schemas import AllergySchema, MealSchema, UserSchema
+from ..utils.etag import conditional_on_user_version
+from ..utils.ndjson import iter_ndjson, chunked, dumps_line
+from ..utils.pagination import parse_page_args, page_response, parse_top_k
+from ..utils.serializers import allergy_dicts, json_response
 
 allergy_bp = Blueprint('allergies', __name__)
 allergy_schema = AllergySchema()
-allergies_schema = AllergySchema(many=True)
+meal_schema = MealSchema()
+# Loads imported lines into plain dicts of typed values, without ORM instances or a session
+import_allergy_schema = AllergySchema(load_instance=False)
 user_schema = UserSchema()
 
 @allergy_bp.route('', methods=['POST'])
@@ -50,24 +58,99 @@ def create_allergy():
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
 
+@allergy_bp.route('/import', methods=['POST'])
+@jwt_required()
+def import_allergies():
+    """
+    Import allergies from a newline-delimited JSON stream
+    ---
+    security:
+      - JWT: []
+    consumes:
+      - application/x-ndjson
+    produces:
+      - application/x-ndjson
+    parameters:
+      - name: body
+        in: body
+        required: true
+        description: One allergy object per line, with meal_id, name and optional severity
+        schema:
+          type: string
+    responses:
+      200:
+        description: One status line per input line, streamed as each chunk is stored
+    """
+    user_id = get_jwt_identity()
+    chunk_size = current_app.config['ALLERGY_IMPORT_CHUNK_SIZE']
+    max_line_bytes = current_app.config['ALLERGY_IMPORT_MAX_LINE_BYTES']
+    
+    def generate():
+        for chunk in chunked(iter_ndjson(request.stream, max_line_bytes), chunk_size):
+            statuses = {}
+            pending = []
+            for line_number, record, error in chunk:
+                if error is None and not isinstance(record, dict):
+                    error = "Each line must be a JSON object"
+                if error is not None:
+                    statuses[line_number] = {"status": "invalid", "errors": {"_line": [error]}}
+                    continue
+                
+                try:
+                    # Ownership is checked on the loaded values, e.g. "5" becomes meal 5
+                    allergy = import_allergy_schema.load({**record, 'user_id': user_id})
+                except ValidationError as e:
+                    statuses[line_number] = {"status": "invalid", "errors": e.messages}
+                    continue
+                pending.append((line_number, allergy))
+            
+            inserted = AllergyService.create_allergies_bulk(user_id, [record for _, record in pending])
+            for (line_number, record), created in zip(pending, inserted):
+                statuses[line_number] = (
+                    {"status": "created", "meal_id": record['meal_id']} if created else
+                    {"status": "invalid", "errors": {"meal_id": ["Meal not found or does not belong to the user"]}}
+                )
+            
+            for line_number in sorted(statuses):
+                yield dumps_line({"line": line_number, **statuses[line_number]})
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @allergy_bp.route('', methods=['GET'])
 @jwt_required()
+@conditional_on_user_version(AuthService.get_data_version)
 def get_user_allergies():
     """
-    Get all allergies for the current user
+    Get the current user's allergies, one page at a time
     ---
     security:
       - JWT: []
+    parameters:
+      - name: limit
+        in: query
+        type: integer
+        default: 50
+        maximum: 200
+      - name: cursor
+        in: query
+        type: string
+        description: Opaque cursor returned as next_cursor by the previous page
     responses:
       200:
-        description: List of user's allergies
+        description: A page of the user's allergies with a link to the next page
+      304:
+        description: Unchanged since the ETag sent in If-None-Match
+      400:
+        description: Invalid limit or cursor
     """
     user_id = get_jwt_identity()
-    allergies = AllergyService.get_user_allergies(user_id)
-    return jsonify(allergies_schema.dump(allergies)), 200
+    limit, after_id = parse_page_args(user_id)
+    allergies, next_after_id = AllergyService.get_user_allergies(user_id, limit, after_id)
+    return json_response(page_response(allergy_dicts(allergies), user_id, limit, next_after_id))
 
 @allergy_bp.route('/<int:allergy_id>', methods=['GET'])
 @jwt_required()
+@conditional_on_user_version(AuthService.get_data_version)
 def get_allergy(allergy_id):
     """
     Get a specific allergy
@@ -82,6 +165,8 @@ def get_allergy(allergy_id):
     responses:
       200:
         description: Allergy details
+      304:
+        description: Unchanged since the ETag sent in If-None-Match
       404:
         description: Allergy not found
     """
@@ -115,16 +200,23 @@ def update_allergy(allergy_id):
             severity:
               type: string
               enum: ['mild', 'moderate', 'severe']
+            meal_id:
+              type: integer
     responses:
       200:
         description: Allergy updated successfully
+      400:
+        description: Meal not found or does not belong to the user
       404:
         description: Allergy not found
     """
     user_id = get_jwt_identity()
     data = request.get_json()
     
-    allergy = AllergyService.update_allergy(allergy_id, user_id, **data)
+    try:
+        allergy = AllergyService.update_allergy(allergy_id, user_id, data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     if not allergy:
         return jsonify({"error": "Allergy not found"}), 404
     
@@ -161,40 +253,62 @@ def delete_allergy(allergy_id):
 @jwt_required()
 def get_users_with_allergies():
     """
-    Get all users with allergies
+    Get the users with the most allergies
     ---
     security:
       - JWT: []
+    parameters:
+      - name: limit
+        in: query
+        type: integer
+        default: 10
+        maximum: 100
     responses:
       200:
-        description: Users with their allergy counts
-    """
-    users_with_allergies = AllergyService.get_users_with_allergies()
-    result = [
-        {
-            "user": user_schema.dump(user), 
-            "allergy_count": count
-        } for user, count in users_with_allergies
-    ]
-    return jsonify(result), 200
+        description: Top users with their allergy counts
+      400:
+        description: Invalid limit
+    """
+    limit = parse_top_k()
+    
+    def users_with_counts():
+        return [
+            {
+                "user": user_schema.dump(user), 
+                "allergy_count": count
+            } for user, count in AllergyService.get_users_with_allergies(limit)
+        ]
+    
+    return jsonify(analytics_cache.get(('allergies.users_with_allergies', limit), users_with_counts)), 200
 
 @allergy_bp.route('/meals-causing-allergies', methods=['GET'])
 @jwt_required()
 def get_meals_causing_allergies():
     """
-    Get meals that have caused allergies
+    Get the meals that have caused the most allergies
     ---
     security:
       - JWT: []
+    parameters:
+      - name: limit
+        in: query
+        type: integer
+        default: 10
+        maximum: 100
     responses:
       200:
-        description: Meals with their allergy counts
-    """
-    meals_with_allergies = AllergyService.get_meals_causing_allergies()
-    result = [
-        {
-            "meal": meal_schema.dump(meal), 
-            "allergy_count": count
-        } for meal, count in meals_with_allergies
-    ]
-    return jsonify(result), 200
+        description: Top meals with their allergy counts
+      400:
+        description: Invalid limit
+    """
+    limit = parse_top_k()
+    
+    def top_meals():
+        return [
+            {
+                "meal": meal_schema.dump(meal), 
+                "allergy_count": count
+            } for meal, count in AllergyService.get_meals_causing_allergies(limit)
+        ]
+    
+    return jsonify(analytics_cache.get(('allergies.meals_causing_allergies', limit), top_meals)), 200
@@ -0,0 +1,80 @@
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+from ..services.async_auth_service import AsyncAuthService
+from ..services.async_allergy_service import AsyncAllergyService
+from ..models.schemas import AllergySchema
+from ..utils.asgi import asgi_view, conditional_on_user_version_async
+from ..utils.pagination import parse_page_args, page_response
+
+allergy_schema = AllergySchema()
+allergies_schema = AllergySchema(many=True)
+
+@asgi_view()
+async def create_allergy(request):
+    """Create a new allergy for a meal (ASGI counterpart of POST /allergies)"""
+    try:
+        data = await request.json()
+        allergy = await AsyncAllergyService.create_allergy(
+            request.state.user_id,
+            data['meal_id'],
+            data['name'],
+            data.get('severity', 'mild')
+        )
+        return JSONResponse(allergy_schema.dump(allergy), 201)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, 400)
+
+@asgi_view()
+@conditional_on_user_version_async(AsyncAuthService.get_data_version)
+async def get_user_allergies(request):
+    """Get one page of the user's allergies (ASGI counterpart of GET /allergies)"""
+    user_id = request.state.user_id
+    limit, after_id = parse_page_args(user_id, request.query_params)
+    allergies, next_after_id = await AsyncAllergyService.get_user_allergies(user_id, limit, after_id)
+    return JSONResponse(
+        page_response(allergies_schema.dump(allergies), user_id, limit, next_after_id, path=request.url.path),
+        200
+    )
+
+@asgi_view()
+@conditional_on_user_version_async(AsyncAuthService.get_data_version)
+async def get_allergy(request):
+    """Get a specific allergy (ASGI counterpart of GET /allergies/<id>)"""
+    allergy = await AsyncAllergyService.get_allergy_by_id(request.path_params['allergy_id'], request.state.user_id)
+    if not allergy:
+        return JSONResponse({"error": "Allergy not found"}, 404)
+    return JSONResponse(allergy_schema.dump(allergy), 200)
+
+@asgi_view()
+async def update_allergy(request):
+    """Update an allergy (ASGI counterpart of PUT /allergies/<id>)"""
+    data = await request.json()
+    
+    try:
+        allergy = await AsyncAllergyService.update_allergy(
+            request.path_params['allergy_id'], request.state.user_id, data
+        )
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, 400)
+    if not allergy:
+        return JSONResponse({"error": "Allergy not found"}, 404)
+    
+    return JSONResponse(allergy_schema.dump(allergy), 200)
+
+@asgi_view()
+async def delete_allergy(request):
+    """Delete an allergy (ASGI counterpart of DELETE /allergies/<id>)"""
+    success = await AsyncAllergyService.delete_allergy(request.path_params['allergy_id'], request.state.user_id)
+    
+    if not success:
+        return JSONResponse({"error": "Allergy not found"}, 404)
+    
+    return Response(status_code=204)
+
+allergy_routes = [
+    Route('/allergies', create_allergy, methods=['POST']),
+    Route('/allergies', get_user_allergies, methods=['GET']),
+    Route('/allergies/{allergy_id:int}', get_allergy, methods=['GET']),
+    Route('/allergies/{allergy_id:int}', update_allergy, methods=['PUT']),
+    Route('/allergies/{allergy_id:int}', delete_allergy, methods=['DELETE']),
+]
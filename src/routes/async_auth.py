@@ -0,0 +1,46 @@
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from ..services.async_auth_service import AsyncAuthService
+from ..models.schemas import UserSchema
+from ..utils.asgi import asgi_view
+
+user_schema = UserSchema()
+
+@asgi_view(authenticated=False)
+async def register(request):
+    """Register a new user (ASGI counterpart of POST /auth/register)"""
+    try:
+        data = await request.json()
+        user = await AsyncAuthService.register_user(
+            data['username'],
+            data['email'],
+            data['password']
+        )
+        return JSONResponse(user_schema.dump(user), 201)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, 400)
+
+@asgi_view(authenticated=False)
+async def login(request):
+    """User login (ASGI counterpart of POST /auth/login)"""
+    try:
+        data = await request.json()
+        token = await AsyncAuthService.authenticate_user(
+            data['username'],
+            data['password']
+        )
+        return JSONResponse({"access_token": token}, 200)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, 401)
+
+@asgi_view()
+async def get_profile(request):
+    """Get user profile (ASGI counterpart of GET /auth/profile)"""
+    user = await AsyncAuthService.get_user_by_id(request.state.user_id)
+    return JSONResponse(user_schema.dump(user), 200)
+
+auth_routes = [
+    Route('/auth/register', register, methods=['POST']),
+    Route('/auth/login', login, methods=['POST']),
+    Route('/auth/profile', get_profile, methods=['GET']),
+]
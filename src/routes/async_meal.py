@@ -0,0 +1,75 @@
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+from ..services.async_auth_service import AsyncAuthService
+from ..services.async_meal_service import AsyncMealService
+from ..models.schemas import MealSchema
+from ..utils.asgi import asgi_view, conditional_on_user_version_async
+from ..utils.pagination import parse_page_args, page_response
+
+meal_schema = MealSchema()
+meals_schema = MealSchema(many=True)
+
+@asgi_view()
+async def create_meal(request):
+    """Create a new meal (ASGI counterpart of POST /meals)"""
+    try:
+        data = await request.json()
+        meal = await AsyncMealService.create_meal(
+            request.state.user_id,
+            data['name'],
+            data.get('description', ''),
+            data.get('ingredients', '')
+        )
+        return JSONResponse(meal_schema.dump(meal), 201)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, 400)
+
+@asgi_view()
+@conditional_on_user_version_async(AsyncAuthService.get_data_version)
+async def get_user_meals(request):
+    """Get one page of the user's meals (ASGI counterpart of GET /meals)"""
+    user_id = request.state.user_id
+    limit, after_id = parse_page_args(user_id, request.query_params)
+    meals, next_after_id = await AsyncMealService.get_all_user_meals(user_id, limit, after_id)
+    return JSONResponse(
+        page_response(meals_schema.dump(meals), user_id, limit, next_after_id, path=request.url.path),
+        200
+    )
+
+@asgi_view()
+@conditional_on_user_version_async(AsyncAuthService.get_data_version)
+async def get_meal(request):
+    """Get a specific meal (ASGI counterpart of GET /meals/<id>)"""
+    meal = await AsyncMealService.get_meal_by_id(request.path_params['meal_id'], request.state.user_id)
+    if not meal:
+        return JSONResponse({"error": "Meal not found"}, 404)
+    return JSONResponse(meal_schema.dump(meal), 200)
+
+@asgi_view()
+async def update_meal(request):
+    """Update a meal (ASGI counterpart of PUT /meals/<id>)"""
+    data = await request.json()
+    
+    meal = await AsyncMealService.update_meal(request.path_params['meal_id'], request.state.user_id, **data)
+    if not meal:
+        return JSONResponse({"error": "Meal not found"}, 404)
+    
+    return JSONResponse(meal_schema.dump(meal), 200)
+
+@asgi_view()
+async def delete_meal(request):
+    """Delete a meal (ASGI counterpart of DELETE /meals/<id>)"""
+    success = await AsyncMealService.delete_meal(request.path_params['meal_id'], request.state.user_id)
+    
+    if not success:
+        return JSONResponse({"error": "Meal not found"}, 404)
+    
+    return Response(status_code=204)
+
+meal_routes = [
+    Route('/meals', create_meal, methods=['POST']),
+    Route('/meals', get_user_meals, methods=['GET']),
+    Route('/meals/{meal_id:int}', get_meal, methods=['GET']),
+    Route('/meals/{meal_id:int}', update_meal, methods=['PUT']),
+    Route('/meals/{meal_id:int}', delete_meal, methods=['DELETE']),
+]
@@ -1,7 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..services.auth_service import AuthService
-from ..models.user import UserSchema
+from ..models.schemas import UserSchema
 
 auth_bp = Blueprint('auth', __name__)
 user_schema = UserSchema()
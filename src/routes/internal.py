@@ -0,0 +1,47 @@
+from flask import Blueprint, jsonify
+from ..app import database
+from ..app.pool_stats import pool_stats
+from ..app.admission import admission_control
+from ..services.auth_service import user_cache
+from ..services.meal_service import analytics_cache
+
+internal_bp = Blueprint('internal', __name__)
+
+@internal_bp.route('/pool-stats', methods=['GET'])
+def get_pool_stats():
+    """
+    Get database connection pool usage for this worker process
+    ---
+    tags:
+      - Internal
+    responses:
+      200:
+        description: Pool checkouts, wait times and connections in use
+    """
+    return jsonify(pool_stats.snapshot(database.engine.pool)), 200
+
+@internal_bp.route('/cache-stats', methods=['GET'])
+def get_cache_stats():
+    """
+    Get in-process cache counters for this worker process
+    ---
+    tags:
+      - Internal
+    responses:
+      200:
+        description: Hit, miss and eviction counters per cache
+    """
+    return jsonify({"users": user_cache.stats(), "analytics": analytics_cache.stats()}), 200
+
+@internal_bp.route('/admission', methods=['GET'])
+def get_admission_stats():
+    """
+    Get admission control limits and usage for this worker process
+    ---
+    tags:
+      - Internal
+    responses:
+      200:
+        description: Concurrency, queue and timeout limits, active, queued and shed requests per endpoint class
+    """
+    return jsonify(admission_control.snapshot()), 200
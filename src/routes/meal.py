@@ -1,11 +1,18 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from ..services.meal_service import MealService
-from ..models.meal import MealSchema
+from ..services.auth_service import AuthService
+from ..services.meal_service import MealService, analytics_cache
+from ..models.schemas import MealSchema
+from ..utils.etag import conditional_on_user_version
+from ..utils.export import ndjson_export_lines, csv_export_lines, gzip_stream, encode_stream
+from ..utils.pagination import parse_page_args, page_response, parse_top_k
+from ..utils.ingredients import ingredient_terms
+from ..utils.serializers import meal_dicts, json_response
 
 meal_bp = Blueprint('meals', __name__)
 meal_schema = MealSchema()
-meals_schema = MealSchema(many=True)
+# Validates bulk input without building ORM instances or needing a session
+bulk_meal_schema = MealSchema(transient=True)
 
 @meal_bp.route('', methods=['POST'])
 @jwt_required()
@@ -47,24 +54,204 @@ def create_meal():
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+@meal_bp.route('/bulk', methods=['POST'])
+@jwt_required()
+def create_meals_bulk():
+    """
+    Create many meals in one request
+    ---
+    security:
+      - JWT: []
+    parameters:
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: array
+          items:
+            type: object
+            properties:
+              name:
+                type: string
+              description:
+                type: string
+              ingredients:
+                type: string
+    responses:
+      201:
+        description: All meals created; one result per item
+      207:
+        description: Some items were invalid; one result per item
+      400:
+        description: Body is not an array, is empty or exceeds the batch cap
+    """
+    user_id = get_jwt_identity()
+    items = request.get_json()
+    max_items = current_app.config['MEAL_BULK_MAX_ITEMS']
+    if not isinstance(items, list) or not items:
+        raise ValueError("Request body must be a non-empty array of meals")
+    if len(items) > max_items:
+        raise ValueError(f"A bulk request may contain at most {max_items} meals")
+    
+    results = []
+    valid_meals = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results.append({"index": index, "status": "invalid", "errors": {"_schema": ["Invalid input type."]}})
+            continue
+        errors = bulk_meal_schema.validate({**item, 'user_id': user_id})
+        if errors:
+            results.append({"index": index, "status": "invalid", "errors": errors})
+            continue
+        results.append({"index": index, "status": "created"})
+        valid_meals.append(item)
+    
+    meal_ids = iter(MealService.create_meals_bulk(user_id, valid_meals))
+    for result in results:
+        if result['status'] == 'created':
+            result['id'] = next(meal_ids)
+    
+    status = 201 if len(valid_meals) == len(items) else 207
+    return jsonify({"created": len(valid_meals), "results": results}), status
+
 @meal_bp.route('', methods=['GET'])
 @jwt_required()
+@conditional_on_user_version(AuthService.get_data_version)
 def get_user_meals():
     """
-    Get all meals for the current user
+    Get the current user's meals, one page at a time
+    ---
+    security:
+      - JWT: []
+    parameters:
+      - name: limit
+        in: query
+        type: integer
+        default: 50
+        maximum: 200
+      - name: cursor
+        in: query
+        type: string
+        description: Opaque cursor returned as next_cursor by the previous page
+    responses:
+      200:
+        description: A page of the user's meals with a link to the next page
+      304:
+        description: Unchanged since the ETag sent in If-None-Match
+      400:
+        description: Invalid limit or cursor
+    """
+    user_id = get_jwt_identity()
+    limit, after_id = parse_page_args(user_id)
+    meals, next_after_id = MealService.get_all_user_meals(user_id, limit, after_id)
+    return json_response(page_response(meal_dicts(meals), user_id, limit, next_after_id))
+
+MAX_SEARCH_TERMS = 10
+
+@meal_bp.route('/search', methods=['GET'])
+@jwt_required()
+@conditional_on_user_version(AuthService.get_data_version)
+def search_meals():
+    """
+    Search the current user's meals by ingredient
+    ---
+    security:
+      - JWT: []
+    parameters:
+      - name: q
+        in: query
+        type: string
+        required: true
+        description: Ingredient terms, e.g. "peanut, sesame"
+      - name: mode
+        in: query
+        type: string
+        enum: ['and', 'or']
+        default: and
+        description: Match meals containing all terms (and) or any term (or)
+      - name: limit
+        in: query
+        type: integer
+        default: 50
+        maximum: 200
+      - name: cursor
+        in: query
+        type: string
+    responses:
+      200:
+        description: A page of matching meals with a link to the next page
+      304:
+        description: Unchanged since the ETag sent in If-None-Match
+      400:
+        description: Missing or invalid query
+    """
+    user_id = get_jwt_identity()
+    terms = ingredient_terms(request.args.get('q', ''))
+    mode = request.args.get('mode', 'and').lower()
+    if not terms:
+        raise ValueError("q must contain at least one ingredient term")
+    if len(terms) > MAX_SEARCH_TERMS:
+        raise ValueError(f"q may contain at most {MAX_SEARCH_TERMS} terms")
+    if mode not in ('and', 'or'):
+        raise ValueError("mode must be 'and' or 'or'")
+    
+    limit, after_id = parse_page_args(user_id)
+    meals, next_after_id = MealService.search_user_meals(
+        user_id, terms, match_all=(mode == 'and'), limit=limit, after_id=after_id
+    )
+    return json_response(page_response(meal_dicts(meals), user_id, limit, next_after_id))
+
+EXPORT_FORMATS = {
+    'ndjson': (ndjson_export_lines, 'application/x-ndjson'),
+    'csv': (csv_export_lines, 'text/csv'),
+}
+
+@meal_bp.route('/export', methods=['GET'])
+@jwt_required()
+def export_meals():
+    """
+    Export all of the current user's meals with their allergies
     ---
     security:
       - JWT: []
+    parameters:
+      - name: format
+        in: query
+        type: string
+        enum: ['ndjson', 'csv']
+        default: ndjson
+    produces:
+      - application/x-ndjson
+      - text/csv
     responses:
       200:
-        description: List of user's meals
+        description: Streamed export, gzip-encoded when the client accepts gzip
+      400:
+        description: Unknown export format
     """
     user_id = get_jwt_identity()
-    meals = MealService.get_all_user_meals(user_id)
-    return jsonify(meals_schema.dump(meals)), 200
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    
+    write_lines, mimetype = EXPORT_FORMATS[export_format]
+    use_gzip = request.accept_encodings['gzip'] > 0
+    batch_size = current_app.config['EXPORT_BATCH_SIZE']
+    
+    def generate():
+        lines = write_lines(MealService.iter_user_export(user_id, batch_size))
+        yield from gzip_stream(lines) if use_gzip else encode_stream(lines)
+    
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=meals-export.{export_format}'
+    response.headers['Vary'] = 'Accept-Encoding'
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
 
 @meal_bp.route('/<int:meal_id>', methods=['GET'])
 @jwt_required()
+@conditional_on_user_version(AuthService.get_data_version)
 def get_meal(meal_id):
     """
     Get a specific meal
@@ -79,6 +266,8 @@ def get_meal(meal_id):
     responses:
       200:
         description: Meal details
+      304:
+        description: Unchanged since the ETag sent in If-None-Match
       404:
         description: Meal not found
     """
@@ -174,25 +363,36 @@ def get_high_risk_meals():
     """
     threshold = float(request.args.get('threshold', 0.2))
     meals = MealService.get_meals_with_high_allergy_risk(threshold)
-    return jsonify(meals_schema.dump(meals)), 200
+    return json_response(meal_dicts(meals))
 
 @meal_bp.route('/most-allergies', methods=['GET'])
 @jwt_required()
 def get_meals_with_most_allergies():
     """
-    Get meals sorted by number of allergies
+    Get the meals with the most allergies
     ---
     security:
       - JWT: []
+    parameters:
+      - name: limit
+        in: query
+        type: integer
+        default: 10
+        maximum: 100
     responses:
       200:
-        description: Meals with most allergies
-    """
-    meals_with_counts = MealService.get_meals_with_most_allergies()
-    result = [
-        {
-            "meal": meal_schema.dump(meal), 
-            "allergy_count": count
-        } for meal, count in meals_with_counts
-    ]
-    return jsonify(result), 200
+        description: Top meals by allergy count
+      400:
+        description: Invalid limit
+    """
+    limit = parse_top_k()
+    
+    def top_meals():
+        return [
+            {
+                "meal": meal_schema.dump(meal), 
+                "allergy_count": count
+            } for meal, count in MealService.get_meals_with_most_allergies(limit)
+        ]
+    
+    return jsonify(analytics_cache.get(('meals.most_allergies', limit), top_meals)), 200
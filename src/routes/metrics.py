@@ -0,0 +1,19 @@
+from flask import Blueprint, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from ..app.metrics import metrics_registry, request_metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('', methods=['GET'])
+def export_metrics():
+    """
+    Export operational metrics in the Prometheus text format
+    ---
+    tags:
+      - Internal
+    responses:
+      200:
+        description: Request counts, latency histograms, in-flight and connection pool gauges
+    """
+    request_metrics.update_pool_gauges()
+    return Response(generate_latest(metrics_registry()), content_type=CONTENT_TYPE_LATEST)
@@ -2,18 +2,44 @@ from ..app.database import session
 from ..models.allergy import Allergy
 from ..models.user import User
 from ..models.meal import Meal
-from sqlalchemy import func
+from ..models.meal_stats import MealAllergyStats
+from .meal_service import MEAL_SCHEMA_LOADS, ALLERGY_ROW_COLUMNS
+from .auth_service import user_cache, USER_SCHEMA_LOADS
+from .risk_service import RiskService
+from ..app.sharding import scatter, merge_sorted
+from ..utils.pagination import keyset_page, DEFAULT_PAGE_SIZE, DEFAULT_TOP_K
+from ..utils.risk_model import allergen_terms, severity_weight
+from collections import defaultdict
+from sqlalchemy import func, insert
+from sqlalchemy.orm import selectinload
+
+# Relationships touched by AllergySchema, loaded in bulk instead of once per allergy
+ALLERGY_SCHEMA_LOADS = (
+    selectinload(Allergy.user),
+    selectinload(Allergy.meal),
+)
+# Allergy fields a client may change; ids and ownership never come from the request
+ALLERGY_UPDATE_FIELDS = ('name', 'severity', 'meal_id')
+
+def _adjust_meal_allergy_count(meal_id, delta, severity_delta):
+    """Keep the meal's counter, severity score and the allergy summary table in step with an allergy write"""
+    session.execute(Meal.adjust_allergy_count(meal_id, delta, severity_delta))
+    if delta:
+        session.execute(MealAllergyStats.adjust(meal_id, delta))
 
 class AllergyService:
     @staticmethod
     def create_allergy(user_id, meal_id, name, severity='mild'):
         """Create a new allergy for a user's meal"""
         # Check if the meal belongs to the user
-        meal = session.query(Meal).filter_by(id=meal_id, user_id=user_id).first()
-        if not meal:
+        meal_exists = session.query(Meal.id).filter_by(id=meal_id, user_id=user_id).first()
+        if not meal_exists:
             raise ValueError("Meal not found or does not belong to the user")
         
-        # Create allergy
+        session.execute(User.bump_data_version(user_id))
+        weights = RiskService.allergen_weights(user_id, allergen_terms(name))
+        
+        # Create allergy and bump the meal's allergy count in the same transaction
         allergy = Allergy(
             name=name, 
             severity=severity, 
@@ -21,17 +47,65 @@ class AllergyService:
             meal_id=meal_id
         )
         session.add(allergy)
+        _adjust_meal_allergy_count(meal_id, 1, severity_weight(severity))
+        RiskService.rescore_allergen_terms(user_id, weights)
         session.commit()
-        
-        # Update meal's allergy risk
-        meal.update_allergy_risk()
+        user_cache.invalidate(user_id)
         
         return allergy
     
     @staticmethod
-    def get_user_allergies(user_id):
-        """Get all allergies for a user"""
-        return session.query(Allergy).filter_by(user_id=user_id).all()
+    def create_allergies_bulk(user_id, allergies):
+        """
+        Insert a chunk of validated allergies for a user in one transaction.
+        
+        Meal ownership is checked for the whole chunk in one query, rows go in
+        with a single executemany INSERT and each affected meal's counters are
+        adjusted once, then meals containing any of the new allergens are
+        rescored together. Returns, in input order, whether each allergy was inserted.
+        """
+        meal_ids = {allergy['meal_id'] for allergy in allergies}
+        owned_meal_ids = {
+            meal_id for meal_id, in session.query(Meal.id)
+            .filter(Meal.user_id == user_id, Meal.id.in_(meal_ids))
+        } if meal_ids else set()
+        
+        accepted = [allergy for allergy in allergies if allergy['meal_id'] in owned_meal_ids]
+        if accepted:
+            session.execute(User.bump_data_version(user_id))
+            weights = RiskService.allergen_weights(
+                user_id, {term for allergy in accepted for term in allergen_terms(allergy['name'])}
+            )
+            session.execute(
+                insert(Allergy),
+                [
+                    {
+                        'user_id': user_id,
+                        'meal_id': allergy['meal_id'],
+                        'name': allergy['name'],
+                        'severity': allergy.get('severity', 'mild'),
+                    }
+                    for allergy in accepted
+                ]
+            )
+            added = defaultdict(lambda: [0, 0.0])
+            for allergy in accepted:
+                totals = added[allergy['meal_id']]
+                totals[0] += 1
+                totals[1] += severity_weight(allergy.get('severity', 'mild'))
+            for meal_id, (count, severity) in added.items():
+                _adjust_meal_allergy_count(meal_id, count, severity)
+            RiskService.rescore_allergen_terms(user_id, weights)
+            session.commit()
+            user_cache.invalidate(user_id)
+        
+        return [allergy['meal_id'] in owned_meal_ids for allergy in allergies]
+    
+    @staticmethod
+    def get_user_allergies(user_id, limit=DEFAULT_PAGE_SIZE, after_id=None):
+        """Get one page of a user's allergies as plain rows, resuming after `after_id`"""
+        query = session.query(*ALLERGY_ROW_COLUMNS).filter(Allergy.user_id == user_id)
+        return keyset_page(query, Allergy.id, limit, after_id)
     
     @staticmethod
     def get_allergy_by_id(allergy_id, user_id):
@@ -39,60 +113,107 @@ class AllergyService:
         return session.query(Allergy).filter_by(id=allergy_id, user_id=user_id).first()
     
     @staticmethod
-    def update_allergy(allergy_id, user_id, **kwargs):
-        """Update an allergy"""
+    def update_allergy(allergy_id, user_id, data):
+        """Update an allergy's name, severity or meal; other fields are ignored"""
         allergy = session.query(Allergy).filter_by(id=allergy_id, user_id=user_id).first()
         if not allergy:
             return None
         
-        for key, value in kwargs.items():
-            setattr(allergy, key, value)
+        changes = {key: value for key, value in data.items() if key in ALLERGY_UPDATE_FIELDS}
+        if changes.get('meal_id', allergy.meal_id) != allergy.meal_id:
+            # Check if the new meal belongs to the user
+            meal_exists = session.query(Meal.id).filter_by(id=changes['meal_id'], user_id=user_id).first()
+            if not meal_exists:
+                raise ValueError("Meal not found or does not belong to the user")
         
-        session.commit()
+        previous_meal_id = allergy.meal_id
+        previous_weight = severity_weight(allergy.severity)
+        session.execute(User.bump_data_version(user_id))
+        weights = RiskService.allergen_weights(
+            user_id, set(allergen_terms(allergy.name)) | set(allergen_terms(changes.get('name', allergy.name)))
+        )
+        for key, value in changes.items():
+            setattr(allergy, key, value)
+        weight = severity_weight(allergy.severity)
         
-        # Update meal's allergy risk if severity changes
-        if allergy.meal:
-            allergy.meal.update_allergy_risk()
+        # Move the allergy count along if the allergy was attached to another meal
+        if allergy.meal_id != previous_meal_id:
+            _adjust_meal_allergy_count(previous_meal_id, -1, -previous_weight)
+            _adjust_meal_allergy_count(allergy.meal_id, 1, weight)
+        elif weight != previous_weight:
+            _adjust_meal_allergy_count(allergy.meal_id, 0, weight - previous_weight)
         
+        RiskService.rescore_allergen_terms(user_id, weights)
+        session.commit()
+        user_cache.invalidate(user_id)
         return allergy
     
     @staticmethod
     def delete_allergy(allergy_id, user_id):
         """Delete an allergy"""
-        allergy = Allergy.query.filter_by(id=allergy_id, user_id=user_id).first()
+        allergy = session.query(Allergy).filter_by(id=allergy_id, user_id=user_id).first()
         if not allergy:
             return False
         
-        # Store the meal to update its risk after deletion
-        meal = allergy.meal
-        
-        db.session.delete(allergy)
-        db.session.commit()
-        
-        # Update meal's allergy risk
-        if meal:
-            meal.update_allergy_risk()
+        session.execute(User.bump_data_version(user_id))
+        weights = RiskService.allergen_weights(user_id, allergen_terms(allergy.name))
+        session.delete(allergy)
+        _adjust_meal_allergy_count(allergy.meal_id, -1, -severity_weight(allergy.severity))
+        RiskService.rescore_allergen_terms(user_id, weights)
+        session.commit()
+        user_cache.invalidate(user_id)
         
         return True
     
     @staticmethod
-    def get_users_with_allergies():
-        """Get all users with their allergies"""
-        return (
-            db.session.query(User, func.count(Allergy.id).label('allergy_count'))
-            .outerjoin(Allergy)
-            .group_by(User)
-            .filter(func.count(Allergy.id) > 0)
-            .all()
-        )
+    def get_users_with_allergies(limit=DEFAULT_TOP_K):
+        """
+        Get the top `limit` users by allergy count, merged from each shard's top `limit`.
+        
+        Only the winners are then loaded, from the primary, with the meals and
+        allergies UserSchema dumps from the shard that counted them.
+        """
+        def top_counts(db_session):
+            allergy_count = func.count(Allergy.id)
+            return (
+                db_session.query(allergy_count, Allergy.user_id)
+                .group_by(Allergy.user_id)
+                .order_by(allergy_count.desc(), Allergy.user_id.desc())
+                .limit(limit)
+                .all()
+            )
+        
+        shard_counts = scatter(top_counts)
+        top = merge_sorted(shard_counts, key=lambda row: (row[0], row[1]), reverse=True, limit=limit)
+        winners = {user_id for count, user_id in top}
+        # scatter visits the shards in the same order, so each loads the winners it counted
+        shard_user_ids = iter([
+            [user_id for count, user_id in rows if user_id in winners] for rows in shard_counts
+        ])
+        
+        def load_users(db_session):
+            user_ids = next(shard_user_ids)
+            if not user_ids:
+                return []
+            return db_session.query(User).options(*USER_SCHEMA_LOADS).filter(User.id.in_(user_ids)).all()
+        
+        users = {user.id: user for shard_users in scatter(load_users) for user in shard_users}
+        return [(users[user_id], count) for count, user_id in top if user_id in users]
     
     @staticmethod
-    def get_meals_causing_allergies():
-        """Get meals that have caused allergies"""
-        return (
-            db.session.query(Meal, func.count(Allergy.id).label('allergy_count'))
-            .join(Allergy)
-            .group_by(Meal)
-            .order_by(func.count(Allergy.id).desc())
-            .all()
+    def get_meals_causing_allergies(limit=DEFAULT_TOP_K):
+        """Get the top `limit` meals that have caused allergies, merged from each shard's top `limit`"""
+        def top_meals(db_session):
+            return (
+                db_session.query(Meal, MealAllergyStats.allergy_count)
+                .join(MealAllergyStats, MealAllergyStats.meal_id == Meal.id)
+                .options(*MEAL_SCHEMA_LOADS)
+                .filter(MealAllergyStats.allergy_count > 0)
+                .order_by(MealAllergyStats.allergy_count.desc(), MealAllergyStats.meal_id.desc())
+                .limit(limit)
+                .all()
+            )
+        
+        return merge_sorted(
+            scatter(top_meals), key=lambda row: (row[1], row[0].id), reverse=True, limit=limit
         )
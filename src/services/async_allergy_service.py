@@ -0,0 +1,127 @@
+from ..app.database import async_session
+from ..models.allergy import Allergy
+from ..models.user import User
+from ..models.meal import Meal
+from ..models.meal_stats import MealAllergyStats
+from .allergy_service import ALLERGY_SCHEMA_LOADS, ALLERGY_UPDATE_FIELDS
+from .async_meal_service import _run_risk_service
+from .risk_service import RiskService
+from .auth_service import user_cache
+from ..utils.pagination import keyset_page_async, DEFAULT_PAGE_SIZE
+from ..utils.risk_model import allergen_terms, severity_weight
+from sqlalchemy import select
+
+async def _adjust_meal_allergy_count(meal_id, delta, severity_delta):
+    """Keep the meal's counter, severity score and the allergy summary table in step with an allergy write"""
+    await async_session.execute(Meal.adjust_allergy_count(meal_id, delta, severity_delta))
+    if delta:
+        await async_session.execute(MealAllergyStats.adjust(meal_id, delta))
+
+class AsyncAllergyService:
+    """AllergyService for the ASGI mode: same writes and queries, awaited on the async engine"""
+    
+    @staticmethod
+    async def create_allergy(user_id, meal_id, name, severity='mild'):
+        """Create a new allergy for a user's meal"""
+        # Check if the meal belongs to the user
+        meal_exists = (await async_session.execute(
+            select(Meal.id).filter_by(id=meal_id, user_id=user_id)
+        )).first()
+        if not meal_exists:
+            raise ValueError("Meal not found or does not belong to the user")
+        
+        await async_session.execute(User.bump_data_version(user_id))
+        weights = await _run_risk_service(RiskService.allergen_weights, user_id, allergen_terms(name))
+        
+        # Create allergy and bump the meal's allergy count in the same transaction
+        allergy = Allergy(
+            name=name,
+            severity=severity,
+            user_id=user_id,
+            meal_id=meal_id
+        )
+        async_session.add(allergy)
+        await _adjust_meal_allergy_count(meal_id, 1, severity_weight(severity))
+        await _run_risk_service(RiskService.rescore_allergen_terms, user_id, weights)
+        await async_session.commit()
+        user_cache.invalidate(user_id)
+        
+        return await AsyncAllergyService.get_allergy_by_id(allergy.id, user_id)
+    
+    @staticmethod
+    async def get_user_allergies(user_id, limit=DEFAULT_PAGE_SIZE, after_id=None):
+        """Get one page of allergies for a user, resuming after `after_id`"""
+        statement = select(Allergy).options(*ALLERGY_SCHEMA_LOADS).filter_by(user_id=user_id)
+        return await keyset_page_async(async_session, statement, Allergy.id, limit, after_id)
+    
+    @staticmethod
+    async def get_allergy_by_id(allergy_id, user_id):
+        """Get a specific allergy for a user"""
+        result = await async_session.execute(
+            select(Allergy)
+            .options(*ALLERGY_SCHEMA_LOADS)
+            .filter_by(id=allergy_id, user_id=user_id)
+            # Reload rows written in this session so every column and relationship is current
+            .execution_options(populate_existing=True)
+        )
+        return result.scalars().first()
+    
+    @staticmethod
+    async def update_allergy(allergy_id, user_id, data):
+        """Update an allergy's name, severity or meal; other fields are ignored"""
+        allergy = (await async_session.execute(
+            select(Allergy).filter_by(id=allergy_id, user_id=user_id)
+        )).scalars().first()
+        if not allergy:
+            return None
+        
+        changes = {key: value for key, value in data.items() if key in ALLERGY_UPDATE_FIELDS}
+        if changes.get('meal_id', allergy.meal_id) != allergy.meal_id:
+            # Check if the new meal belongs to the user
+            meal_exists = (await async_session.execute(
+                select(Meal.id).filter_by(id=changes['meal_id'], user_id=user_id)
+            )).first()
+            if not meal_exists:
+                raise ValueError("Meal not found or does not belong to the user")
+        
+        previous_meal_id = allergy.meal_id
+        previous_weight = severity_weight(allergy.severity)
+        await async_session.execute(User.bump_data_version(user_id))
+        weights = await _run_risk_service(
+            RiskService.allergen_weights,
+            user_id, set(allergen_terms(allergy.name)) | set(allergen_terms(changes.get('name', allergy.name)))
+        )
+        for key, value in changes.items():
+            setattr(allergy, key, value)
+        weight = severity_weight(allergy.severity)
+        
+        # Move the allergy count along if the allergy was attached to another meal
+        if allergy.meal_id != previous_meal_id:
+            await _adjust_meal_allergy_count(previous_meal_id, -1, -previous_weight)
+            await _adjust_meal_allergy_count(allergy.meal_id, 1, weight)
+        elif weight != previous_weight:
+            await _adjust_meal_allergy_count(allergy.meal_id, 0, weight - previous_weight)
+        
+        await _run_risk_service(RiskService.rescore_allergen_terms, user_id, weights)
+        await async_session.commit()
+        user_cache.invalidate(user_id)
+        return await AsyncAllergyService.get_allergy_by_id(allergy_id, user_id)
+    
+    @staticmethod
+    async def delete_allergy(allergy_id, user_id):
+        """Delete an allergy"""
+        allergy = (await async_session.execute(
+            select(Allergy).filter_by(id=allergy_id, user_id=user_id)
+        )).scalars().first()
+        if not allergy:
+            return False
+        
+        await async_session.execute(User.bump_data_version(user_id))
+        weights = await _run_risk_service(RiskService.allergen_weights, user_id, allergen_terms(allergy.name))
+        await async_session.delete(allergy)
+        await _adjust_meal_allergy_count(allergy.meal_id, -1, -severity_weight(allergy.severity))
+        await _run_risk_service(RiskService.rescore_allergen_terms, user_id, weights)
+        await async_session.commit()
+        user_cache.invalidate(user_id)
+        
+        return True
@@ -0,0 +1,83 @@
+from flask_jwt_extended import create_access_token
+from ..models.user import User
+from ..app.database import async_session
+from ..utils.password_hasher import password_hasher
+from .auth_service import USER_SCHEMA_LOADS, user_cache
+from sqlalchemy import select
+from datetime import timedelta
+
+class AsyncAuthService:
+    """AuthService for the ASGI mode: same behaviour, awaiting the database and bcrypt"""
+    
+    @staticmethod
+    async def register_user(username, email, password):
+        # Check if user already exists
+        if (await async_session.execute(select(User.id).filter_by(username=username))).first():
+            raise ValueError("Username already exists")
+        if (await async_session.execute(select(User.id).filter_by(email=email))).first():
+            raise ValueError("Email already exists")
+        
+        # Create new user
+        new_user = User(username=username, email=email)
+        new_user.password_hash = await password_hasher.hash_async(password)
+        
+        async_session.add(new_user)
+        await async_session.commit()
+        
+        # Reload with what UserSchema dumps: relationships cannot lazy load on an AsyncSession
+        result = await async_session.execute(
+            select(User)
+            .options(*USER_SCHEMA_LOADS)
+            .filter_by(id=new_user.id)
+            .execution_options(populate_existing=True)
+        )
+        return result.scalars().one()
+    
+    @staticmethod
+    async def authenticate_user(username, password):
+        """Check credentials and return an access token; needs a Flask app context"""
+        user = (await async_session.execute(select(User).filter_by(username=username))).scalars().first()
+        
+        if user and await password_hasher.verify_async(user.password_hash, password):
+            # Upgrade hashes made with an outdated cost factor while we know the password
+            if user.password_needs_rehash():
+                user.password_hash = await password_hasher.hash_async(password)
+                await async_session.commit()
+                user_cache.invalidate(user.id)
+            
+            # Create JWT token
+            access_token = create_access_token(
+                identity=user.id,
+                expires_delta=timedelta(hours=2)
+            )
+            return access_token
+        
+        raise ValueError("Invalid credentials")
+    
+    @staticmethod
+    async def get_data_version(user_id):
+        """Get the version stamp of a user's meals and allergies"""
+        return await async_session.scalar(select(User.data_version).filter_by(id=user_id))
+    
+    @staticmethod
+    async def get_user_by_id(user_id):
+        """Get a user with meals and allergies loaded, from the shared user cache when fresh"""
+        cached = user_cache.get(user_id)
+        if cached is None:
+            # Cached graphs are detached and fully loaded, so they can be
+            # serialized directly without touching the request session
+            token = user_cache.reserve(user_id)
+            try:
+                async with async_session.session_factory() as loader:
+                    cached = (await loader.execute(
+                        select(User).options(*USER_SCHEMA_LOADS).filter_by(id=user_id)
+                    )).scalars().first()
+                if cached is None:
+                    return None
+                if user_cache.cacheable(cached):
+                    # Skipped if a write invalidated the user while it loaded
+                    user_cache.set(user_id, cached, token=token)
+            finally:
+                user_cache.release(user_id, token)
+        
+        return cached
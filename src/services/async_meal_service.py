@@ -0,0 +1,108 @@
+from ..app.database import async_session
+from ..models.meal import Meal
+from ..models.meal_stats import MealAllergyStats
+from ..models.meal_ingredient import MealIngredient
+from ..models.user import User
+from .auth_service import user_cache
+from .meal_service import MEAL_SCHEMA_LOADS, _index_rows
+from .risk_service import RiskService
+from ..utils.pagination import keyset_page_async, DEFAULT_PAGE_SIZE
+from ..utils.risk_model import allergen_terms
+from sqlalchemy import select, delete, insert
+
+async def _index_ingredients(meal_id, user_id, ingredients, replace=False):
+    """Write a meal's rows of the ingredient search index"""
+    if replace:
+        await async_session.execute(delete(MealIngredient).where(MealIngredient.meal_id == meal_id))
+    rows = _index_rows(meal_id, user_id, ingredients)
+    if rows:
+        await async_session.execute(insert(MealIngredient), rows)
+
+async def _run_risk_service(method, *args):
+    """Run a RiskService method against this request's connection"""
+    # The scoped proxy does not forward run_sync; call it on the task's session
+    return await async_session().run_sync(lambda sync_session: method(*args, db_session=sync_session))
+
+class AsyncMealService:
+    """MealService for the ASGI mode: same writes and queries, awaited on the async engine"""
+    
+    @staticmethod
+    async def create_meal(user_id, name, description, ingredients):
+        """Create a new meal for a user"""
+        meal = Meal(
+            name=name,
+            description=description,
+            ingredients=ingredients,
+            user_id=user_id
+        )
+        async_session.add(meal)
+        await async_session.flush()
+        async_session.add(MealAllergyStats(meal_id=meal.id, allergy_count=0))
+        await _index_ingredients(meal.id, user_id, ingredients)
+        await async_session.execute(User.bump_data_version(user_id))
+        await _run_risk_service(RiskService.refresh_ingredient_scores, user_id, [meal.id])
+        await async_session.commit()
+        user_cache.invalidate(user_id)
+        return await AsyncMealService.get_meal_by_id(meal.id, user_id)
+    
+    @staticmethod
+    async def get_meal_by_id(meal_id, user_id):
+        """Get a specific meal for a user"""
+        result = await async_session.execute(
+            select(Meal)
+            .options(*MEAL_SCHEMA_LOADS)
+            .filter_by(id=meal_id, user_id=user_id)
+            # Reload rows written in this session so every column and relationship is current
+            .execution_options(populate_existing=True)
+        )
+        return result.scalars().first()
+    
+    @staticmethod
+    async def get_all_user_meals(user_id, limit=DEFAULT_PAGE_SIZE, after_id=None):
+        """Get one page of meals for a user, resuming after `after_id`"""
+        statement = select(Meal).options(*MEAL_SCHEMA_LOADS).filter_by(user_id=user_id)
+        return await keyset_page_async(async_session, statement, Meal.id, limit, after_id)
+    
+    @staticmethod
+    async def update_meal(meal_id, user_id, **kwargs):
+        """Update a meal"""
+        meal = (await async_session.execute(
+            select(Meal).filter_by(id=meal_id, user_id=user_id)
+        )).scalars().first()
+        if not meal:
+            return None
+        
+        for key, value in kwargs.items():
+            setattr(meal, key, value)
+        
+        await async_session.execute(User.bump_data_version(user_id))
+        if 'ingredients' in kwargs:
+            await _index_ingredients(meal.id, user_id, meal.ingredients, replace=True)
+            await _run_risk_service(RiskService.refresh_ingredient_scores, user_id, [meal.id])
+        await async_session.commit()
+        user_cache.invalidate(user_id)
+        return await AsyncMealService.get_meal_by_id(meal_id, user_id)
+    
+    @staticmethod
+    async def delete_meal(meal_id, user_id):
+        """Delete a meal"""
+        meal = (await async_session.execute(
+            select(Meal).options(*MEAL_SCHEMA_LOADS).filter_by(id=meal_id, user_id=user_id)
+        )).scalars().first()
+        if not meal:
+            return False
+        
+        await async_session.execute(User.bump_data_version(user_id))
+        # The meal's allergies go with it, which can lower the weight of their allergens
+        weights = await _run_risk_service(
+            RiskService.allergen_weights,
+            user_id, {term for allergy in meal.allergies for term in allergen_terms(allergy.name)}
+        )
+        await async_session.execute(delete(MealAllergyStats).where(MealAllergyStats.meal_id == meal_id))
+        await async_session.execute(delete(MealIngredient).where(MealIngredient.meal_id == meal_id))
+        # Allergies were loaded above, so the delete-orphan cascade needs no lazy load
+        await async_session.delete(meal)
+        await _run_risk_service(RiskService.rescore_allergen_terms, user_id, weights)
+        await async_session.commit()
+        user_cache.invalidate(user_id)
+        return True
@@ -1,8 +1,45 @@
 from flask_jwt_extended import create_access_token
 from ..models.user import User
+from ..models.meal import Meal
+from ..models.allergy import Allergy
 from ..app.database import session
+from ..app.sharding import shard_map
+from ..utils.cache import TTLCache
+from sqlalchemy.orm import selectinload
 from datetime import timedelta
 
+# Relationships touched by UserSchema, loaded in bulk instead of once per meal
+USER_SCHEMA_LOADS = (
+    # UserSchema dumps each allergy's user and meal, which cannot lazy load once detached
+    selectinload(User.meals).selectinload(Meal.allergies).selectinload(Allergy.user),
+    selectinload(User.allergies).selectinload(Allergy.meal),
+)
+
+class UserCache(TTLCache):
+    """
+    Detached, fully loaded user records keyed by id.
+    
+    Each entry holds a user's whole meal and allergy graph, so `maxsize` alone
+    does not bound memory: users with more than `max_rows` meals and allergies
+    are loaded per request instead, capping a worker at about
+    maxsize * max_rows cached rows.
+    """
+    
+    def __init__(self, maxsize=1024, ttl=60.0, max_rows=500):
+        self.max_rows = max_rows
+        super().__init__(maxsize, ttl)
+    
+    def configure(self, maxsize, ttl, max_rows=None):
+        if max_rows is not None:
+            self.max_rows = max_rows
+        super().configure(maxsize, ttl)
+    
+    def cacheable(self, user):
+        return len(user.meals) + len(user.allergies) <= self.max_rows
+
+# Configured in create_app
+user_cache = UserCache()
+
 class AuthService:
     @staticmethod
     def register_user(username, email, password):
@@ -17,6 +54,8 @@ class AuthService:
         new_user.set_password(password)
         
         session.add(new_user)
+        session.flush()
+        shard_map.assign(new_user.id)
         session.commit()
         
         return new_user
@@ -26,6 +65,12 @@ class AuthService:
         user = session.query(User).filter_by(username=username).first()
         
         if user and user.check_password(password):
+            # Upgrade hashes made with an outdated cost factor while we know the password
+            if user.password_needs_rehash():
+                user.set_password(password)
+                session.commit()
+                user_cache.invalidate(user.id)
+            
             # Create JWT token
             access_token = create_access_token(
                 identity=user.id, 
@@ -35,6 +80,34 @@ class AuthService:
         
         raise ValueError("Invalid credentials")
     
+    @staticmethod
+    def get_data_version(user_id):
+        """Get the version stamp of a user's meals and allergies"""
+        return session.query(User.data_version).filter_by(id=user_id).scalar()
+    
     @staticmethod
     def get_user_by_id(user_id):
-        return session.query(User).get(user_id)
+        cached = user_cache.get(user_id)
+        if cached is None:
+            # Load into a short-lived session so the cached graph is fully
+            # loaded and detached, never tied to a request's session; it
+            # reads from the same shard and replica as the request
+            token = user_cache.reserve(user_id)
+            try:
+                with session.session_factory(info=dict(session.info)) as loader:
+                    cached = (
+                        loader.query(User)
+                        .options(*USER_SCHEMA_LOADS)
+                        .filter_by(id=user_id)
+                        .first()
+                    )
+                if cached is None:
+                    return None
+                if user_cache.cacheable(cached):
+                    # Skipped if a write invalidated the user while it loaded
+                    user_cache.set(user_id, cached, token=token)
+            finally:
+                user_cache.release(user_id, token)
+        
+        # Hand the request its own copy without going back to the database
+        return session.merge(cached, load=False)
@@ -1,7 +1,63 @@
 from ..app.database import session
 from ..models.meal import Meal
 from ..models.allergy import Allergy
-from sqlalchemy import func
+from ..models.meal_stats import MealAllergyStats
+from ..models.meal_ingredient import MealIngredient
+from ..models.user import User
+from .auth_service import user_cache
+from .risk_service import RiskService
+from ..app.sharding import scatter, merge_sorted
+from ..utils.pagination import keyset_page, DEFAULT_PAGE_SIZE, DEFAULT_TOP_K
+from ..utils.ingredients import ingredient_terms
+from ..utils.risk_model import allergen_terms
+from ..utils.ndjson import chunked
+from ..utils.cache import SingleFlightCache
+from collections import defaultdict
+from sqlalchemy import func, select, update, delete, insert
+from sqlalchemy.orm import selectinload
+
+# Relationships touched by MealSchema, loaded in bulk instead of once per meal
+MEAL_SCHEMA_LOADS = (
+    selectinload(Meal.user),
+    selectinload(Meal.allergies).selectinload(Allergy.user),
+)
+# Columns MealSchema and its nested AllergySchema dump, read as plain rows by list endpoints
+MEAL_ROW_COLUMNS = (
+    Meal.id, Meal.user_id, Meal.name, Meal.description, Meal.ingredients,
+    Meal.allergy_risk, Meal.allergy_count,
+)
+ALLERGY_ROW_COLUMNS = (Allergy.id, Allergy.user_id, Allergy.meal_id, Allergy.name, Allergy.severity)
+# Meal ids per allergy lookup, the same batch size selectinload uses
+ALLERGY_LOOKUP_BATCH = 500
+
+# Serialized results of the global analytics endpoints, shared by every caller; configured in create_app
+analytics_cache = SingleFlightCache()
+
+def _with_allergies(meal_rows, db_session=session):
+    """Pair meal rows with their allergy rows, fetched in batched IN queries"""
+    allergies = defaultdict(list)
+    for meal_ids in chunked([meal.id for meal in meal_rows], ALLERGY_LOOKUP_BATCH):
+        for allergy in db_session.execute(
+            select(*ALLERGY_ROW_COLUMNS)
+            .where(Allergy.meal_id.in_(meal_ids))
+            .order_by(Allergy.meal_id, Allergy.id)
+        ):
+            allergies[allergy.meal_id].append(allergy)
+    return [(meal, allergies[meal.id]) for meal in meal_rows]
+
+def _index_rows(meal_id, user_id, ingredients):
+    return [
+        {'meal_id': meal_id, 'user_id': user_id, 'term': term}
+        for term in ingredient_terms(ingredients)
+    ]
+
+def _index_ingredients(meal_id, user_id, ingredients, replace=False):
+    """Write a meal's ingredient terms to the inverted index"""
+    if replace:
+        session.execute(delete(MealIngredient).where(MealIngredient.meal_id == meal_id))
+    rows = _index_rows(meal_id, user_id, ingredients)
+    if rows:
+        session.execute(insert(MealIngredient), rows)
 
 class MealService:
     @staticmethod
@@ -14,18 +70,146 @@ class MealService:
             user_id=user_id
         )
         session.add(meal)
+        session.flush()
+        session.add(MealAllergyStats(meal_id=meal.id, allergy_count=0))
+        _index_ingredients(meal.id, user_id, ingredients)
+        session.execute(User.bump_data_version(user_id))
+        RiskService.refresh_ingredient_scores(user_id, meal_ids=[meal.id])
         session.commit()
+        user_cache.invalidate(user_id)
         return meal
     
+    @staticmethod
+    def create_meals_bulk(user_id, meals):
+        """
+        Insert many validated meals for a user in one transaction.
+        
+        Meals are flushed together so the ORM reports each new id, however
+        the ids were allocated; summary and ingredient rows then go in with
+        one executemany INSERT each. Returns the new meal ids in input order.
+        """
+        if not meals:
+            return []
+        
+        session.execute(User.bump_data_version(user_id))
+        new_meals = [
+            Meal(
+                user_id=user_id,
+                name=meal['name'],
+                description=meal.get('description', ''),
+                ingredients=meal.get('ingredients', ''),
+                allergy_risk=0.0,
+                allergy_count=0,
+            )
+            for meal in meals
+        ]
+        session.add_all(new_meals)
+        session.flush()
+        meal_ids = [meal.id for meal in new_meals]
+        session.execute(
+            insert(MealAllergyStats),
+            [{'meal_id': meal_id, 'allergy_count': 0} for meal_id in meal_ids]
+        )
+        index_rows = [
+            row
+            for meal_id, meal in zip(meal_ids, meals)
+            for row in _index_rows(meal_id, user_id, meal.get('ingredients', ''))
+        ]
+        if index_rows:
+            session.execute(insert(MealIngredient), index_rows)
+            RiskService.refresh_ingredient_scores(
+                user_id, meal_ids=sorted({row['meal_id'] for row in index_rows})
+            )
+        session.commit()
+        user_cache.invalidate(user_id)
+        return meal_ids
+    
     @staticmethod
     def get_meal_by_id(meal_id, user_id):
         """Get a specific meal for a user"""
-        return session.query(Meal).filter_by(id=meal_id, user_id=user_id).first()
+        return (
+            session.query(Meal)
+            .options(*MEAL_SCHEMA_LOADS)
+            .filter_by(id=meal_id, user_id=user_id)
+            .first()
+        )
     
     @staticmethod
-    def get_all_user_meals(user_id):
-        """Get all meals for a user"""
-        return session.query(Meal).filter_by(user_id=user_id).all()
+    def get_all_user_meals(user_id, limit=DEFAULT_PAGE_SIZE, after_id=None):
+        """
+        Get one page of meals for a user, resuming after `after_id`.
+        
+        Returns (meal_row, allergy_rows) pairs of plain rows for
+        utils.serializers.meal_dicts, never ORM objects.
+        """
+        query = session.query(*MEAL_ROW_COLUMNS).filter(Meal.user_id == user_id)
+        meals, next_after_id = keyset_page(query, Meal.id, limit, after_id)
+        return _with_allergies(meals), next_after_id
+    
+    @staticmethod
+    def search_user_meals(user_id, terms, match_all=True, limit=DEFAULT_PAGE_SIZE, after_id=None):
+        """
+        Find a user's meals by ingredient terms through the inverted index.
+        
+        With `match_all` a meal must contain every term (AND), otherwise any
+        term (OR). Returns one keyset page like get_all_user_meals.
+        """
+        matches = (
+            select(MealIngredient.meal_id)
+            .where(MealIngredient.user_id == user_id, MealIngredient.term.in_(terms))
+            .group_by(MealIngredient.meal_id)
+        )
+        if match_all:
+            matches = matches.having(func.count(MealIngredient.term) == len(terms))
+        
+        query = (
+            session.query(*MEAL_ROW_COLUMNS)
+            .filter(Meal.user_id == user_id, Meal.id.in_(matches))
+        )
+        meals, next_after_id = keyset_page(query, Meal.id, limit, after_id)
+        return _with_allergies(meals), next_after_id
+    
+    @staticmethod
+    def iter_user_export(user_id, batch_size=1000):
+        """
+        Stream a user's meals with their allergies without materializing them.
+        
+        Meals (by id) and allergies (by meal_id, id) are read through two
+        server-side cursors in batches of `batch_size` and merge-joined, so
+        memory stays constant however many rows the user has. Yields
+        (meal_row, allergy_rows) tuples of plain rows, never ORM objects.
+        """
+        streaming = {'stream_results': True, 'max_row_buffer': batch_size}
+        meals = session.execute(
+            select(
+                Meal.id, Meal.name, Meal.description, Meal.ingredients,
+                Meal.allergy_risk, Meal.allergy_count
+            )
+            .where(Meal.user_id == user_id)
+            .order_by(Meal.id)
+            .execution_options(**streaming)
+        )
+        allergies = session.execute(
+            select(Allergy.id, Allergy.meal_id, Allergy.name, Allergy.severity)
+            .where(Allergy.user_id == user_id)
+            .order_by(Allergy.meal_id, Allergy.id)
+            .execution_options(**streaming)
+        )
+        
+        try:
+            pending_allergy = next(allergies, None)
+            for meal in meals:
+                meal_allergies = []
+                while pending_allergy is not None and pending_allergy.meal_id <= meal.id:
+                    if pending_allergy.meal_id == meal.id:
+                        meal_allergies.append(pending_allergy)
+                    pending_allergy = next(allergies, None)
+                yield meal, meal_allergies
+        finally:
+            # Release the server-side cursors and end the read transaction
+            meals.close()
+            allergies.close()
+            session.rollback()
     
     @staticmethod
     def update_meal(meal_id, user_id, **kwargs):
@@ -37,7 +221,12 @@ class MealService:
         for key, value in kwargs.items():
             setattr(meal, key, value)
         
+        session.execute(User.bump_data_version(user_id))
+        if 'ingredients' in kwargs:
+            _index_ingredients(meal.id, user_id, meal.ingredients, replace=True)
+            RiskService.refresh_ingredient_scores(user_id, meal_ids=[meal.id])
         session.commit()
+        user_cache.invalidate(user_id)
         return meal
     
     @staticmethod
@@ -47,22 +236,107 @@ class MealService:
         if not meal:
             return False
         
+        session.execute(User.bump_data_version(user_id))
+        # The meal's allergies go with it, which can lower the weight of their allergens
+        weights = RiskService.allergen_weights(
+            user_id, {term for allergy in meal.allergies for term in allergen_terms(allergy.name)}
+        )
+        session.execute(delete(MealAllergyStats).where(MealAllergyStats.meal_id == meal_id))
+        session.execute(delete(MealIngredient).where(MealIngredient.meal_id == meal_id))
         session.delete(meal)
+        RiskService.rescore_allergen_terms(user_id, weights)
         session.commit()
+        user_cache.invalidate(user_id)
         return True
     
     @staticmethod
     def get_meals_with_high_allergy_risk(threshold=0.2):
-        """Get meals with allergy risk above a certain threshold"""
-        return Meal.query.filter(Meal.allergy_risk >= threshold).all()
+        """Get every meal at or above a risk threshold as (meal_row, allergy_rows) pairs, from every shard"""
+        def high_risk(db_session):
+            meals = (
+                db_session.query(*MEAL_ROW_COLUMNS)
+                .filter(Meal.allergy_risk >= threshold)
+                .order_by(Meal.id)
+                .all()
+            )
+            return _with_allergies(meals, db_session)
+        
+        return merge_sorted(scatter(high_risk), key=lambda pair: pair[0].id)
     
     @staticmethod
-    def get_meals_with_most_allergies():
-        """Get meals sorted by number of allergies"""
-        return (
-            db.session.query(Meal, func.count(Allergy.id).label('allergy_count'))
-            .outerjoin(Allergy)
-            .group_by(Meal)
-            .order_by(func.count(Allergy.id).desc())
-            .all()
+    def get_meals_with_most_allergies(limit=DEFAULT_TOP_K):
+        """Get the top `limit` meals by number of allergies, merged from each shard's top `limit`"""
+        def top_meals(db_session):
+            return (
+                db_session.query(Meal, MealAllergyStats.allergy_count)
+                .join(MealAllergyStats, MealAllergyStats.meal_id == Meal.id)
+                .options(*MEAL_SCHEMA_LOADS)
+                .order_by(MealAllergyStats.allergy_count.desc(), MealAllergyStats.meal_id.desc())
+                .limit(limit)
+                .all()
+            )
+        
+        return merge_sorted(
+            scatter(top_meals), key=lambda row: (row[1], row[0].id), reverse=True, limit=limit
         )
+    
+    @staticmethod
+    def reconcile_allergy_counts():
+        """
+        Recompute allergy counts and the allergy summary table for every meal.
+        
+        Risk scores are recomputed separately by RiskService.rescore_all_meals.
+        """
+        actual_count = (
+            select(func.count(Allergy.id))
+            .where(Allergy.meal_id == Meal.id)
+            .scalar_subquery()
+        )
+        result = session.execute(
+            update(Meal)
+            .values(allergy_count=actual_count)
+            .execution_options(synchronize_session=False)
+        )
+        
+        # Rebuild the summary table from the freshly reconciled counters
+        session.execute(delete(MealAllergyStats).execution_options(synchronize_session=False))
+        session.execute(
+            insert(MealAllergyStats).from_select(
+                ['meal_id', 'allergy_count'],
+                select(Meal.id, Meal.allergy_count)
+            )
+        )
+        session.execute(User.bump_data_version())
+        session.commit()
+        user_cache.clear()
+        return result.rowcount
+    
+    @staticmethod
+    def rebuild_ingredient_index(batch_size=1000):
+        """Rebuild the ingredient index for every meal, one batch of meals at a time"""
+        session.execute(delete(MealIngredient).execution_options(synchronize_session=False))
+        
+        indexed = 0
+        last_id = 0
+        while True:
+            meals = session.execute(
+                select(Meal.id, Meal.user_id, Meal.ingredients)
+                .where(Meal.id > last_id)
+                .order_by(Meal.id)
+                .limit(batch_size)
+            ).all()
+            if not meals:
+                break
+            
+            rows = [
+                row
+                for meal in meals
+                for row in _index_rows(meal.id, meal.user_id, meal.ingredients)
+            ]
+            if rows:
+                session.execute(insert(MealIngredient), rows)
+            indexed += len(meals)
+            last_id = meals[-1].id
+        
+        session.commit()
+        return indexed
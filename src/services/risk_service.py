@@ -0,0 +1,199 @@
+import numpy as np
+from collections import defaultdict
+from sqlalchemy import func, or_, select
+from ..app.database import session
+from ..models.meal import Meal
+from ..models.allergy import Allergy
+from ..models.meal_ingredient import MealIngredient
+from ..models.user import User
+from .auth_service import user_cache
+from ..utils.risk_model import (
+    AllergenTable, INGREDIENT_MATCH_FACTOR, allergen_terms, severity_weight, severity_weights,
+    severity_scores, ingredient_scores, combine_risk
+)
+
+# Above this many terms, reading all of a user's allergies is cheaper than one LIKE per term
+MAX_FILTERED_TERMS = 64
+
+def _columns(rows, count):
+    """Transpose result rows into one tuple per column"""
+    return list(zip(*rows)) if rows else [()] * count
+
+def _load_allergens(db_session, user_filter):
+    rows = db_session.execute(
+        select(Allergy.user_id, Allergy.name, Allergy.severity).where(user_filter)
+    ).all()
+    return AllergenTable.from_allergies(*_columns(rows, 3))
+
+def _ingredient_scores(db_session, meal_ids, meal_filter, allergens):
+    """Ingredient component for `meal_ids` (a sorted int64 array)"""
+    rows = db_session.execute(
+        select(MealIngredient.meal_id, MealIngredient.user_id, MealIngredient.term).where(meal_filter)
+    ).all()
+    term_meal_ids, term_user_ids, terms = _columns(rows, 3)
+    matched, weights = allergens.match(term_user_ids, terms)
+    meal_index = np.searchsorted(meal_ids, np.asarray(term_meal_ids, dtype=np.int64)[matched])
+    return ingredient_scores(len(meal_ids), meal_index, weights)
+
+def _allergen_weights(db_session, user_id, terms):
+    """The highest severity weight among a user's allergies naming each term; 0.0 when none does"""
+    terms = set(terms)
+    weights = dict.fromkeys(terms, 0.0)
+    if not terms:
+        return weights
+    
+    statement = select(Allergy.name, Allergy.severity).where(Allergy.user_id == user_id)
+    if len(terms) <= MAX_FILTERED_TERMS:
+        # A term is always a substring of the lower-cased name it came from
+        name = func.lower(Allergy.name)
+        statement = statement.where(or_(*(name.contains(term) for term in terms)))
+    for name, severity in db_session.execute(statement):
+        weight = severity_weight(severity)
+        for term in terms.intersection(allergen_terms(name)):
+            weights[term] = max(weights[term], weight)
+    return weights
+
+class RiskService:
+    """
+    Keeps each meal's ingredient risk component current.
+    
+    Online writes only read the allergies naming the terms involved, never the
+    user's whole allergy list: meal writes score the written meals, and
+    allergy writes adjust the meals containing the allergen's terms by how
+    much each term's weight changed. Call these after bumping the user's data
+    version: the user row lock serializes writers, so the allergies read here
+    are current. `db_session` defaults to the request session; async callers
+    pass the sync session given to AsyncSession.run_sync.
+    """
+    
+    @staticmethod
+    def refresh_ingredient_scores(user_id, meal_ids, db_session=None):
+        """Recompute the ingredient component of a user's meals whose ingredients changed"""
+        db_session = session if db_session is None else db_session
+        if not meal_ids:
+            return
+        
+        rows = db_session.execute(
+            select(MealIngredient.meal_id, MealIngredient.term).where(MealIngredient.meal_id.in_(meal_ids))
+        ).all()
+        weights = _allergen_weights(db_session, user_id, {term for _, term in rows})
+        scores = dict.fromkeys(meal_ids, 0.0)
+        for meal_id, term in rows:
+            scores[meal_id] += weights[term] * INGREDIENT_MATCH_FACTOR
+        db_session.execute(
+            Meal.set_ingredient_scores(),
+            [{'b_meal_id': meal_id, 'b_ingredient_score': score} for meal_id, score in scores.items()]
+        )
+    
+    @staticmethod
+    def allergen_weights(user_id, terms, db_session=None):
+        """Snapshot the weight of each allergen term before allergies naming them are written"""
+        db_session = session if db_session is None else db_session
+        return _allergen_weights(db_session, user_id, terms)
+    
+    @staticmethod
+    def rescore_allergen_terms(user_id, before, db_session=None):
+        """
+        Adjust the meals containing the terms of an `allergen_weights` snapshot after the write.
+        
+        Each term's weight is read again; meals containing a term whose weight
+        changed get the difference added to their stored score in one
+        executemany UPDATE, like the allergy counters.
+        """
+        db_session = session if db_session is None else db_session
+        after = _allergen_weights(db_session, user_id, before)
+        changed = {term: after[term] - weight for term, weight in before.items() if after[term] != weight}
+        if not changed:
+            return
+        
+        deltas = defaultdict(float)
+        for meal_id, term in db_session.execute(
+            select(MealIngredient.meal_id, MealIngredient.term)
+            .where(MealIngredient.user_id == user_id, MealIngredient.term.in_(changed))
+        ):
+            deltas[meal_id] += changed[term] * INGREDIENT_MATCH_FACTOR
+        if deltas:
+            db_session.execute(
+                Meal.adjust_ingredient_scores(),
+                [{'b_meal_id': meal_id, 'b_ingredient_delta': delta} for meal_id, delta in deltas.items()]
+            )
+    
+    @staticmethod
+    def rescore_all_meals(users_per_batch=1000):
+        """
+        Recompute every risk column of every meal with the current model.
+        
+        Meals are scored with NumPy a range of users at a time, so only those
+        users' meals, ingredient terms and allergies are in memory at once,
+        and only changed rows are written back; every user's cached responses
+        are invalidated if anything changed. Meant to run after the risk model
+        changes; an allergy written for a meal while its batch is being scored
+        is picked up by the next run.
+        """
+        rescored = 0
+        changed_total = 0
+        last_user_id = 0
+        while True:
+            user_ids = session.execute(
+                select(Meal.user_id)
+                .where(Meal.user_id > last_user_id)
+                .distinct()
+                .order_by(Meal.user_id)
+                .limit(users_per_batch)
+            ).scalars().all()
+            if not user_ids:
+                break
+            
+            first_user_id, last_user_id = user_ids[0], user_ids[-1]
+            in_range = Meal.user_id.between(first_user_id, last_user_id)
+            meal_ids, old_severity, old_ingredient, old_risk = _columns(session.execute(
+                select(Meal.id, Meal.severity_score, Meal.ingredient_score, Meal.allergy_risk)
+                .where(in_range)
+                .order_by(Meal.id)
+            ).all(), 4)
+            meal_ids = np.asarray(meal_ids, dtype=np.int64)
+            
+            allergy_meal_ids, severities = _columns(session.execute(
+                select(Allergy.meal_id, Allergy.severity)
+                .join(Meal, Meal.id == Allergy.meal_id)
+                .where(in_range)
+            ).all(), 2)
+            allergy_index = np.searchsorted(meal_ids, np.asarray(allergy_meal_ids, dtype=np.int64))
+            severity = severity_scores(len(meal_ids), allergy_index, severity_weights(severities))
+            allergens = _load_allergens(session, Allergy.user_id.between(first_user_id, last_user_id))
+            ingredient = _ingredient_scores(
+                session, meal_ids, MealIngredient.user_id.between(first_user_id, last_user_id), allergens
+            )
+            risk = combine_risk(severity, ingredient)
+            
+            unchanged = (
+                np.isclose(severity, np.asarray(old_severity, dtype=np.float64))
+                & np.isclose(ingredient, np.asarray(old_ingredient, dtype=np.float64))
+                & np.isclose(risk, np.asarray(old_risk, dtype=np.float64))
+            )
+            changed = np.flatnonzero(~unchanged)
+            if len(changed):
+                session.execute(
+                    Meal.set_risk_scores(),
+                    [
+                        {
+                            'b_meal_id': meal_id,
+                            'b_severity_score': severity_score,
+                            'b_ingredient_score': ingredient_score,
+                            'b_allergy_risk': allergy_risk,
+                        }
+                        for meal_id, severity_score, ingredient_score, allergy_risk in zip(
+                            meal_ids[changed].tolist(), severity[changed].tolist(),
+                            ingredient[changed].tolist(), risk[changed].tolist()
+                        )
+                    ]
+                )
+            session.commit()
+            rescored += len(meal_ids)
+            changed_total += len(changed)
+        
+        if changed_total:
+            session.execute(User.bump_data_version())
+            session.commit()
+            user_cache.clear()
+        return rescored
@@ -0,0 +1,129 @@
+from functools import wraps
+from flask import current_app
+from flask_jwt_extended import decode_token
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt import PyJWTError
+from marshmallow import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response
+from werkzeug.http import parse_etags
+from ..app.admission import Shed, admission_control, endpoint_class
+from ..app.database import async_session
+from .etag import user_version_etag
+
+class Unauthorized(Exception):
+    """Missing or invalid access token on an ASGI route"""
+
+def current_user_id(request):
+    """Identity of a request's Bearer access token, validated like jwt_required()"""
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme != 'Bearer' or not token:
+        raise Unauthorized("Missing Authorization Header")
+    try:
+        decoded = decode_token(token)
+    except (PyJWTError, JWTExtendedException) as e:
+        raise Unauthorized(str(e))
+    if decoded.get('type') != 'access':
+        raise Unauthorized("Only non-refresh tokens are allowed")
+    return decoded[current_app.config['JWT_IDENTITY_CLAIM']]
+
+def asgi_view(authenticated=True):
+    """
+    Wrap an async route handler of the ASGI mode.
+    
+    The handler runs inside the Flask app context (config, JWT helpers) with
+    `request.state.user_id` set when `authenticated`, and its task's
+    AsyncSession is removed once it returns. With ADMISSION_CONTROL_ENABLED
+    it is admitted like its Flask view: handlers share their view's name and
+    live under their blueprint's url_prefix, and a queued request waits on a
+    worker thread, never on the event loop.
+    """
+    def decorator(handler):
+        @wraps(handler)
+        async def endpoint(request):
+            flask_app = request.app.state.flask_app
+            with flask_app.app_context():
+                limit = None
+                if flask_app.config['ADMISSION_CONTROL_ENABLED']:
+                    blueprint = request.url.path.split('/')[1]
+                    name = endpoint_class(f'{blueprint}.{handler.__name__}', blueprint, request.method)
+                    if name is not None:
+                        try:
+                            limit = await run_in_threadpool(admission_control.admit, name)
+                        except Shed:
+                            body, headers = admission_control.shed_response(name)
+                            return JSONResponse(body, 503, headers=headers)
+                try:
+                    if authenticated:
+                        request.state.user_id = current_user_id(request)
+                    return await handler(request)
+                finally:
+                    await async_session.remove()
+                    if limit is not None:
+                        limit.release()
+        return endpoint
+    return decorator
+
+def conditional_on_user_version_async(get_version):
+    """conditional_on_user_version for ASGI handlers; `get_version` is a coroutine"""
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(request):
+            user_id = request.state.user_id
+            full_path = f"{request.url.path}?{request.url.query}"
+            etag = user_version_etag(user_id, await get_version(user_id), full_path)
+            
+            if parse_etags(request.headers.get('If-None-Match')).contains(etag):
+                response = Response(status_code=304)
+            else:
+                response = await handler(request)
+                if response.status_code != 200:
+                    return response
+            
+            response.headers['ETag'] = f'"{etag}"'
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
+
+class DefaultHeadersMiddleware:
+    """Add headers to every response that does not already set them"""
+    
+    def __init__(self, app, headers):
+        self.app = app
+        self.headers = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        
+        async def send_with_headers(message):
+            if message['type'] == 'http.response.start':
+                present = {name.lower() for name, _ in message.get('headers', [])}
+                message['headers'] = list(message.get('headers', [])) + [
+                    (name, value) for name, value in self.headers if name not in present
+                ]
+            await send(message)
+        
+        await self.app(scope, receive, send_with_headers)
+
+# Same responses as register_error_handlers gives the Flask app
+async def _handle_unauthorized(request, error):
+    return JSONResponse({"msg": str(error)}, 401)
+
+async def _handle_validation_error(request, error):
+    return JSONResponse({"error": "Validation Error", "messages": error.messages}, 400)
+
+async def _handle_database_error(request, error):
+    return JSONResponse({"error": "Database Error", "message": str(error)}, 500)
+
+async def _handle_value_error(request, error):
+    return JSONResponse({"error": "Invalid Input", "message": str(error)}, 400)
+
+EXCEPTION_HANDLERS = {
+    Unauthorized: _handle_unauthorized,
+    ValidationError: _handle_validation_error,
+    SQLAlchemyError: _handle_database_error,
+    ValueError: _handle_value_error,
+}
@@ -0,0 +1,260 @@
+import contextlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+class TTLCache:
+    """
+    Size-bounded, thread-safe LRU cache whose entries expire after `ttl` seconds.
+    
+    The cache is per process: under gunicorn each worker keeps its own copy, so
+    `maxsize` bounds the entries per worker (not their size) and `ttl` bounds
+    how stale an entry can get when another worker changes the underlying record.
+    
+    Loaders that race with writers take a token from `reserve` before reading
+    the source and pass it to `set`; an `invalidate` in between withdraws the
+    token, so a value read before the write is not cached after it.
+    """
+    
+    def __init__(self, maxsize=1024, ttl=60.0, clock=time.monotonic):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # Key -> token of the load in progress, withdrawn by invalidate
+        self._pending = {}
+        self._clock = clock
+        self.configure(maxsize, ttl)
+        self.reset_stats()
+    
+    def configure(self, maxsize, ttl):
+        if maxsize < 0:
+            raise ValueError("Cache size must not be negative")
+        with self._lock:
+            self.maxsize = maxsize
+            self.ttl = ttl
+            self._evict_overflow()
+    
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.expirations = 0
+            self.invalidations = 0
+    
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            
+            value, expires_at = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def reserve(self, key):
+        """Start loading `key`; returns the token to pass to `set` and `release`"""
+        token = object()
+        with self._lock:
+            self._pending[key] = token
+        return token
+    
+    def release(self, key, token):
+        """End a load started with `reserve`, whether or not its value was set"""
+        with self._lock:
+            if self._pending.get(key) is token:
+                del self._pending[key]
+    
+    def set(self, key, value, token=None):
+        """Cache `value`; with a `token` from `reserve`, only if `key` was not invalidated since"""
+        with self._lock:
+            if token is not None:
+                if self._pending.get(key) is not token:
+                    return
+                del self._pending[key]
+            if self.maxsize == 0:
+                return
+            self._entries[key] = (value, self._clock() + self.ttl)
+            self._entries.move_to_end(key)
+            self._evict_overflow()
+    
+    def invalidate(self, key):
+        with self._lock:
+            self._pending.pop(key, None)
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+    
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._pending.clear()
+    
+    def _evict_overflow(self):
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+class _Flight:
+    """One computation in progress; callers for the same key wait on it"""
+    
+    __slots__ = ('done', 'value', 'error')
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+class SingleFlightCache:
+    """
+    Cache of computed results with request coalescing and stale-while-revalidate.
+    
+    Only one computation per key runs at a time; concurrent callers wait for
+    its result instead of running their own. Results are fresh for `ttl`
+    seconds, then served stale for up to `stale_ttl` more while a single
+    background thread recomputes them. Failed computations are not cached.
+    Like TTLCache, it is per process.
+    """
+    
+    def __init__(self, maxsize=128, ttl=30.0, stale_ttl=300.0, clock=time.monotonic):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._clock = clock
+        self.configure(maxsize, ttl, stale_ttl)
+    
+    def configure(self, maxsize, ttl, stale_ttl, context=contextlib.nullcontext):
+        """`context()` wraps background refreshes, e.g. an app context for database access"""
+        if maxsize < 0:
+            raise ValueError("Cache size must not be negative")
+        with self._lock:
+            self.maxsize = maxsize
+            self.ttl = ttl
+            self.stale_ttl = stale_ttl
+            self._context = context
+            self._entries.clear()
+            self.reset_stats()
+    
+    def reset_stats(self):
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+        self.errors = 0
+        self.evictions = 0
+    
+    def get(self, key, compute):
+        """The cached value of `key`, calling `compute()` at most once at a time to refresh it"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, fresh_until, stale_until = entry
+                now = self._clock()
+                if now < fresh_until:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                if now < stale_until:
+                    self.stale_hits += 1
+                    if key not in self._flights:
+                        self._flights[key] = flight = _Flight()
+                        self.refreshes += 1
+                        threading.Thread(target=self._refresh, args=(key, flight, compute), daemon=True).start()
+                    return value
+            
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                self._flights[key] = flight = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        
+        if leader:
+            self._run(key, flight, compute)
+        else:
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+    
+    def _run(self, key, flight, compute):
+        try:
+            flight.value = compute()
+        except Exception as error:
+            flight.error = error
+        except BaseException:
+            # A gevent Timeout or SystemExit unwinds the leader; its waiters
+            # get an ordinary error and the key is free for the next caller
+            flight.error = RuntimeError(f"Computation of {key!r} was interrupted")
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+                if flight.error is None:
+                    now = self._clock()
+                    self._entries[key] = (flight.value, now + self.ttl, now + self.ttl + self.stale_ttl)
+                    self._entries.move_to_end(key)
+                    self._evict_overflow()
+                else:
+                    self.errors += 1
+            flight.done.set()
+    
+    def _refresh(self, key, flight, compute):
+        with self._context():
+            self._run(key, flight, compute)
+        if flight.error is not None:
+            logger.error("Background refresh of %r failed", key, exc_info=flight.error)
+    
+    def _evict_overflow(self):
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses + self.coalesced
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "stale_ttl_seconds": self.stale_ttl,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_ratio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+                "in_flight": len(self._flights),
+                "refreshes": self.refreshes,
+                "errors": self.errors,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,37 @@
+import hashlib
+from functools import wraps
+from flask import request, make_response
+from flask_jwt_extended import get_jwt_identity
+
+def user_version_etag(user_id, version, full_path=None):
+    """Strong ETag for a user's data at `version`, specific to the requested URL"""
+    full_path = request.full_path if full_path is None else full_path
+    digest = hashlib.sha1(f"{user_id}:{full_path}".encode('utf-8')).hexdigest()[:16]
+    return f"{version}-{digest}"
+
+def conditional_on_user_version(get_version):
+    """
+    Answer conditional GETs from the current user's data version.
+    
+    `get_version(user_id)` must be cheap: on an If-None-Match hit the view
+    never runs, so no rows are loaded or serialized. Apply below
+    jwt_required so the identity is available.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            user_id = get_jwt_identity()
+            etag = user_version_etag(user_id, get_version(user_id))
+            
+            if etag in request.if_none_match:
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,70 @@
+import csv
+import io
+import zlib
+from .ndjson import dumps_line
+
+CSV_COLUMNS = (
+    'meal_id', 'meal_name', 'description', 'ingredients', 'allergy_risk', 'allergy_count',
+    'allergy_id', 'allergy_name', 'allergy_severity',
+)
+
+def ndjson_export_lines(rows):
+    """One JSON line per meal with its allergies nested"""
+    for meal, allergies in rows:
+        yield dumps_line({
+            "id": meal.id,
+            "name": meal.name,
+            "description": meal.description,
+            "ingredients": meal.ingredients,
+            "allergy_risk": meal.allergy_risk,
+            "allergy_count": meal.allergy_count,
+            "allergies": [
+                {"id": allergy.id, "name": allergy.name, "severity": allergy.severity}
+                for allergy in allergies
+            ],
+        })
+
+def csv_export_lines(rows):
+    """One CSV row per meal and allergy pair; meals without allergies get one row"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    
+    def flush():
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return line
+    
+    writer.writerow(CSV_COLUMNS)
+    yield flush()
+    for meal, allergies in rows:
+        meal_columns = (
+            meal.id, meal.name, meal.description, meal.ingredients,
+            meal.allergy_risk, meal.allergy_count,
+        )
+        for allergy in allergies or (None,):
+            if allergy is None:
+                writer.writerow(meal_columns + ('', '', ''))
+            else:
+                writer.writerow(meal_columns + (allergy.id, allergy.name, allergy.severity))
+        yield flush()
+
+def gzip_stream(lines, flush_bytes=64 * 1024):
+    """Gzip a stream of text lines on the fly, emitting roughly `flush_bytes` chunks"""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    pending = 0
+    for line in lines:
+        data = line.encode('utf-8')
+        pending += len(data)
+        chunk = compressor.compress(data)
+        if pending >= flush_bytes:
+            chunk += compressor.flush(zlib.Z_SYNC_FLUSH)
+            pending = 0
+        if chunk:
+            yield chunk
+    yield compressor.flush()
+
+def encode_stream(lines):
+    """Encode a stream of text lines as UTF-8 without compressing it"""
+    for line in lines:
+        yield line.encode('utf-8')
@@ -0,0 +1,21 @@
+import re
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOP_WORDS = frozenset(('a', 'an', 'and', 'of', 'or', 'the', 'to', 'with', 'in'))
+# Width of the indexed term column; longer words are truncated, in documents and queries alike
+MAX_TERM_LENGTH = 100
+
+def normalize_term(word):
+    """Lower-case a word and fold simple plurals (peanuts -> peanut)"""
+    word = word.lower()
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        word = word[:-1]
+    return word
+
+def ingredient_terms(text):
+    """Split free-text ingredients (or a search query) into normalized index terms"""
+    return sorted({
+        normalize_term(word)[:MAX_TERM_LENGTH]
+        for word in _WORD.findall((text or '').lower())
+        if len(word) > 1 and word not in _STOP_WORDS
+    })
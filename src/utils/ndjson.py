@@ -0,0 +1,44 @@
+import json
+from itertools import islice
+
+def iter_ndjson(stream, max_line_bytes):
+    """
+    Read newline-delimited JSON from a binary stream one line at a time.
+    
+    Yields (line_number, record, error) with either `record` or `error` set.
+    Lines longer than `max_line_bytes` are skipped without being buffered, so
+    memory use does not depend on the size of the upload.
+    """
+    line_number = 0
+    while True:
+        line = stream.readline(max_line_bytes + 1)
+        if not line:
+            return
+        line_number += 1
+        
+        if len(line) > max_line_bytes and not line.endswith(b'\n'):
+            # Drain the rest of the oversized line
+            while line and not line.endswith(b'\n'):
+                line = stream.readline(max_line_bytes + 1)
+            yield line_number, None, f"Line exceeds {max_line_bytes} bytes"
+            continue
+        
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line), None
+        except ValueError:
+            yield line_number, None, "Invalid JSON"
+
+def chunked(iterable, size):
+    """Yield lists of up to `size` items from an iterable"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def dumps_line(record):
+    """Serialize one record as an NDJSON line"""
+    return json.dumps(record, separators=(',', ':')) + '\n'
@@ -0,0 +1,115 @@
+import base64
+import json
+from urllib.parse import urlencode
+from flask import request, url_for
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+DEFAULT_TOP_K = 10
+MAX_TOP_K = 100
+
+
+def encode_cursor(user_id, last_id):
+    """Encode the position after `last_id` as an opaque cursor bound to a user"""
+    payload = json.dumps({'u': user_id, 'i': last_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, user_id):
+    """Decode a cursor and return the id to resume after"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        owner, last_id = payload['u'], int(payload['i'])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid pagination cursor")
+
+    if str(owner) != str(user_id):
+        raise ValueError("Invalid pagination cursor")
+
+    return last_id
+
+
+def parse_page_args(user_id, args=None):
+    """Read `limit` and `cursor` query parameters, clamping the page size"""
+    args = request.args if args is None else args
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer")
+    if limit < 1:
+        raise ValueError("limit must be a positive integer")
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    cursor = args.get('cursor')
+    after_id = decode_cursor(cursor, user_id) if cursor else None
+    return limit, after_id
+
+
+def parse_top_k(args=None):
+    """Read the `limit` query parameter of a leaderboard, clamped to MAX_TOP_K"""
+    args = request.args if args is None else args
+    try:
+        limit = int(args.get('limit', DEFAULT_TOP_K))
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer")
+    if limit < 1:
+        raise ValueError("limit must be a positive integer")
+    return min(limit, MAX_TOP_K)
+
+
+def keyset_page(query, id_column, limit, after_id=None):
+    """
+    Fetch one page of `query` ordered by `id_column`.
+
+    The query must already be filtered on the owning user so the
+    (user_id, id) index serves both the filter and the ordering, which keeps
+    the cost of a page independent of how deep it is.
+    Returns the rows and the id to resume after, or None on the last page.
+    """
+    if after_id is not None:
+        query = query.filter(id_column > after_id)
+    rows = query.order_by(id_column).limit(limit + 1).all()
+    return _split_page(rows, limit)
+
+
+async def keyset_page_async(db_session, statement, id_column, limit, after_id=None):
+    """keyset_page for a select() run on an AsyncSession"""
+    if after_id is not None:
+        statement = statement.where(id_column > after_id)
+    result = await db_session.execute(statement.order_by(id_column).limit(limit + 1))
+    return _split_page(result.scalars().all(), limit)
+
+
+def _split_page(rows, limit):
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1].id
+    return rows, None
+
+
+def page_response(items, user_id, limit, next_after_id, path=None):
+    """
+    Build the paginated response envelope with a link to the next page.
+
+    Outside a Flask request (the ASGI mode) pass the request `path` to link to.
+    """
+    next_cursor = None
+    next_url = None
+    if next_after_id is not None:
+        next_cursor = encode_cursor(user_id, next_after_id)
+        if path is None:
+            next_url = url_for(
+                request.endpoint,
+                limit=limit,
+                cursor=next_cursor,
+                **(request.view_args or {})
+            )
+        else:
+            next_url = f"{path}?{urlencode({'limit': limit, 'cursor': next_cursor})}"
+
+    return {
+        "items": items,
+        "next_cursor": next_cursor,
+        "next": next_url
+    }
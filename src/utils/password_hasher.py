@@ -0,0 +1,70 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from flask_bcrypt import Bcrypt
+
+DEFAULT_LOG_ROUNDS = 12
+DEFAULT_WORKERS = 2
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a bounded thread pool.
+    
+    bcrypt releases the GIL while hashing, so the pool caps how many CPU-heavy
+    hashes a worker process runs at once instead of letting a login burst
+    occupy every request thread.
+    """
+    
+    def __init__(self, log_rounds=DEFAULT_LOG_ROUNDS, max_workers=DEFAULT_WORKERS):
+        self._bcrypt = Bcrypt()
+        self._executor = None
+        self.configure(log_rounds, max_workers)
+    
+    def init_app(self, app):
+        app.config.setdefault('BCRYPT_LOG_ROUNDS', int(os.getenv('BCRYPT_LOG_ROUNDS', DEFAULT_LOG_ROUNDS)))
+        app.config.setdefault('PASSWORD_HASH_WORKERS', int(os.getenv('PASSWORD_HASH_WORKERS', DEFAULT_WORKERS)))
+        self.configure(app.config['BCRYPT_LOG_ROUNDS'], app.config['PASSWORD_HASH_WORKERS'])
+    
+    def configure(self, log_rounds, max_workers):
+        """Set the bcrypt cost factor and the hashing concurrency cap"""
+        if max_workers < 1:
+            raise ValueError("PASSWORD_HASH_WORKERS must be at least 1")
+        self.log_rounds = log_rounds
+        self.max_workers = max_workers
+        
+        previous, self._executor = self._executor, ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='bcrypt'
+        )
+        if previous is not None:
+            previous.shutdown(wait=False)
+    
+    def hash(self, password):
+        """Hash a password with the configured cost factor"""
+        future = self._executor.submit(self._bcrypt.generate_password_hash, password, self.log_rounds)
+        return future.result().decode('utf-8')
+    
+    def verify(self, password_hash, password):
+        """Check a password against a stored hash"""
+        future = self._executor.submit(self._bcrypt.check_password_hash, password_hash, password)
+        return future.result()
+    
+    async def hash_async(self, password):
+        """hash() for the event loop: awaits the pool instead of blocking on it"""
+        future = self._executor.submit(self._bcrypt.generate_password_hash, password, self.log_rounds)
+        return (await asyncio.wrap_future(future)).decode('utf-8')
+    
+    async def verify_async(self, password_hash, password):
+        """verify() for the event loop: awaits the pool instead of blocking on it"""
+        future = self._executor.submit(self._bcrypt.check_password_hash, password_hash, password)
+        return await asyncio.wrap_future(future)
+    
+    def needs_rehash(self, password_hash):
+        """Whether a stored hash was made with a different cost factor"""
+        try:
+            # bcrypt hashes look like $2b$<cost>$<salt+digest>
+            return int(password_hash.split('$')[2]) != self.log_rounds
+        except (IndexError, ValueError):
+            return True
+
+password_hasher = PasswordHasher()
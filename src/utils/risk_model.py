@@ -0,0 +1,98 @@
+import numpy as np
+from .ingredients import ingredient_terms
+
+# Contribution of one recorded allergy to its meal's risk, by severity
+SEVERITY_WEIGHTS = {'mild': 0.05, 'moderate': 0.1, 'severe': 0.2}
+DEFAULT_SEVERITY_WEIGHT = SEVERITY_WEIGHTS['mild']
+# A known allergen found in a meal's ingredients counts this many times its severity weight
+INGREDIENT_MATCH_FACTOR = 1.5
+MAX_RISK = 1.0
+
+# Words that describe the reaction rather than the allergen ("Peanut Allergy")
+_NON_ALLERGEN_TERMS = frozenset(('allergy', 'allergie', 'intolerance', 'sensitivity', 'reaction'))
+
+def allergen_terms(name):
+    """Ingredient terms named by an allergy, e.g. "Peanut Allergy" -> ['peanut']"""
+    return [term for term in ingredient_terms(name) if term not in _NON_ALLERGEN_TERMS]
+
+def severity_weight(severity):
+    """Weight of a single severity label"""
+    return SEVERITY_WEIGHTS.get((severity or '').lower(), DEFAULT_SEVERITY_WEIGHT)
+
+def severity_weights(severities):
+    """Map an array of severity labels to their weights"""
+    severities = np.char.lower(np.asarray(severities, dtype=str))
+    weights = np.full(severities.shape, DEFAULT_SEVERITY_WEIGHT, dtype=np.float64)
+    for severity, weight in SEVERITY_WEIGHTS.items():
+        weights[severities == severity] = weight
+    return weights
+
+def severity_scores(n_meals, allergy_meal_index, allergy_weights):
+    """Sum allergy weights per meal; meal positions index into the scored batch"""
+    return np.bincount(allergy_meal_index, weights=allergy_weights, minlength=n_meals)
+
+def ingredient_scores(n_meals, match_meal_index, match_weights):
+    """Sum matched allergen weights per meal"""
+    return np.bincount(match_meal_index, weights=match_weights, minlength=n_meals) * INGREDIENT_MATCH_FACTOR
+
+def combine_risk(severity, ingredient):
+    return np.minimum(severity + ingredient, MAX_RISK)
+
+class AllergenTable:
+    """
+    Each user's known allergen terms with the highest severity weight recorded.
+    
+    Terms are encoded against a sorted vocabulary and keyed as
+    user_id * vocabulary_size + term_code, so matching a batch of meal terms
+    is a couple of searchsorted calls rather than a Python loop.
+    """
+    
+    def __init__(self, keys, weights, vocabulary):
+        self.keys = keys
+        self.weights = weights
+        self.vocabulary = vocabulary
+    
+    @classmethod
+    def from_allergies(cls, user_ids, names, severities):
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        weights = severity_weights(severities)
+        
+        # Tokenize each distinct allergy name once
+        unique_names, name_index = np.unique(np.asarray(names, dtype=str), return_inverse=True)
+        name_terms = [allergen_terms(name) for name in unique_names]
+        terms_per_name = np.array([len(terms) for terms in name_terms], dtype=np.int64)
+        flat_terms = np.array([term for terms in name_terms for term in terms], dtype=str)
+        
+        # One row per (allergy, term)
+        repeats = terms_per_name[name_index]
+        name_starts = np.concatenate(([0], np.cumsum(terms_per_name)[:-1]))
+        row_allergy = np.repeat(np.arange(len(user_ids)), repeats)
+        term_offsets = np.arange(repeats.sum()) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+        row_terms = flat_terms[name_starts[name_index][row_allergy] + term_offsets] if len(row_allergy) else flat_terms[:0]
+        
+        vocabulary = np.unique(row_terms)
+        keys = user_ids[row_allergy] * max(len(vocabulary), 1) + np.searchsorted(vocabulary, row_terms)
+        row_weights = weights[row_allergy]
+        
+        # Keep the highest weight per (user, term)
+        order = np.lexsort((row_weights, keys))
+        keys, row_weights = keys[order], row_weights[order]
+        last_of_key = np.append(keys[1:] != keys[:-1], True) if len(keys) else np.zeros(0, dtype=bool)
+        return cls(keys[last_of_key], row_weights[last_of_key], vocabulary)
+    
+    def match(self, user_ids, terms):
+        """Return a mask of (user, term) pairs that are known allergens and their weights"""
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        terms = np.asarray(terms, dtype=str)
+        if not len(self.keys) or not len(terms):
+            return np.zeros(len(terms), dtype=bool), np.zeros(0, dtype=np.float64)
+        
+        codes = np.searchsorted(self.vocabulary, terms)
+        known_term = self.vocabulary[np.minimum(codes, len(self.vocabulary) - 1)] == terms
+        keys = user_ids * len(self.vocabulary) + codes
+        
+        positions = np.searchsorted(self.keys, keys)
+        in_range = positions < len(self.keys)
+        matched = known_term & in_range
+        matched[matched] = self.keys[positions[matched]] == keys[matched]
+        return matched, self.weights[positions[matched]]
@@ -0,0 +1,50 @@
+import orjson
+from flask import Response
+
+def allergy_dict(allergy, include_meal=True):
+    """AllergySchema's output for one allergy row"""
+    data = {
+        "id": allergy.id,
+        "meal_id": allergy.meal_id,
+        "name": allergy.name,
+        "severity": allergy.severity,
+        "user": allergy.user_id,
+        "user_id": allergy.user_id,
+    }
+    if include_meal:
+        data["meal"] = allergy.meal_id
+    return data
+
+def allergy_dicts(allergies):
+    """AllergySchema(many=True) output for allergy rows"""
+    return [allergy_dict(allergy) for allergy in allergies]
+
+def meal_dicts(rows):
+    """
+    MealSchema(many=True) output for (meal_row, allergy_rows) pairs.
+    
+    Builds the same dicts the schema dumps from ORM objects, straight from
+    plain rows; tests/test_serializers.py holds the two to the same output.
+    """
+    return [
+        {
+            "allergies": [allergy_dict(allergy, include_meal=False) for allergy in allergies],
+            "allergy_count": meal.allergy_count,
+            "allergy_risk": meal.allergy_risk,
+            "description": meal.description,
+            "id": meal.id,
+            "ingredients": meal.ingredients,
+            "name": meal.name,
+            "user": meal.user_id,
+            "user_id": meal.user_id,
+        }
+        for meal, allergies in rows
+    ]
+
+def json_response(payload, status=200):
+    """Encode a response body with orjson, keys sorted like jsonify"""
+    return Response(
+        orjson.dumps(payload, option=orjson.OPT_SORT_KEYS),
+        status=status,
+        mimetype='application/json'
+    )
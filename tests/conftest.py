@@ -0,0 +1,33 @@
+import os
+import pytest
+
+# Settings the application reads at create_app(); tests override them per app
+os.environ.setdefault('DATABASE_URI', 'sqlite://')
+os.environ.setdefault('JWT_SECRET_KEY', 'test-secret-key-that-is-long-enough')
+os.environ.setdefault('FORCE_HTTPS', 'false')
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch):
+    """
+    Build the application on a SQLite file in tmp_path, with its tables created.
+    
+    Keyword arguments are set as environment variables before create_app(),
+    e.g. make_app(SQL_PROFILING_ENABLED='true'); DATABASE_URI may be
+    overridden too. Every engine the app opened is disposed afterwards.
+    """
+    from src.app import database
+    from src.app.main import create_app
+    
+    def make(**env):
+        monkeypatch.setenv('DATABASE_URI', f"sqlite:///{tmp_path / 'app.db'}")
+        monkeypatch.setenv('BCRYPT_LOG_ROUNDS', '4')
+        for key, value in env.items():
+            monkeypatch.setenv(key, value)
+        app = create_app()
+        app.config['TESTING'] = True
+        database.Base.metadata.create_all(bind=database.engine)
+        return app
+    
+    yield make
+    for engine in {*database.shard_engines, *database.replica_engines}:
+        engine.dispose()
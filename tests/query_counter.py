@@ -0,0 +1,34 @@
+from contextlib import contextmanager
+from sqlalchemy import event
+from src.app import database
+
+@contextmanager
+def count_queries():
+    """Count the SQL statements executed on the application engine"""
+    counter = {'count': 0}
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter['count'] += 1
+    
+    event.listen(database.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(database.engine, 'before_cursor_execute', before_cursor_execute)
+
+def assert_queries_do_not_grow(call, grow, rounds=2):
+    """
+    Fail if the number of queries run by `call` grows with the data set.
+    
+    `grow` adds rows between measurements; the session is cleared before each
+    measurement so lazy loads cannot be served from the identity map.
+    """
+    counts = []
+    for _ in range(rounds + 1):
+        database.session.remove()
+        with count_queries() as counter:
+            call()
+        counts.append(counter['count'])
+        grow()
+    
+    assert len(set(counts)) == 1, f"Query count grows with the number of rows: {counts}"
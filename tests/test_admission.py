@@ -0,0 +1,66 @@
+import json
+import os
+import threading
+import pytest
+from src.app.admission import ConcurrencyLimit, Shed, admission_control
+from src.app.metrics import ADMISSION_SHED, REQUESTS
+
+def test_concurrency_limit_queues_then_sheds():
+    """Test the bounded queue, its deadline and handing slots to waiters"""
+    limit = ConcurrencyLimit(concurrency=1, queue=1, timeout=0.05)
+    assert limit.acquire() == 0.0
+    
+    with pytest.raises(Shed) as shed:
+        limit.acquire()
+    assert shed.value.reason == 'timeout'
+    
+    waited = []
+    waiter = threading.Thread(target=lambda: waited.append(limit.acquire()))
+    limit.configure(timeout=5)
+    waiter.start()
+    while not limit.waiting:
+        pass
+    with pytest.raises(Shed) as shed:
+        limit.acquire()
+    assert shed.value.reason == 'queue_full'
+    
+    limit.release()
+    waiter.join()
+    assert waited[0] > 0
+    assert limit.snapshot()['active'] == 1
+
+def test_saturated_class_is_shed_and_limits_reload(make_app, tmp_path):
+    """Test 503 + Retry-After for a saturated class and runtime limit changes"""
+    limits_file = tmp_path / 'limits.json'
+    app = make_app(
+        ADMISSION_CONTROL_ENABLED='true',
+        METRICS_ENABLED='true',
+        ADMISSION_LIMITS_FILE=str(limits_file),
+        ADMISSION_RELOAD_SECONDS='0',
+        ADMISSION_AUTH_CONCURRENCY='0',
+        ADMISSION_AUTH_QUEUE='0'
+    )
+    client = app.test_client()
+    shed_before = ADMISSION_SHED.labels('auth', 'queue_full')._value.get()
+    requests_before = REQUESTS.labels('auth', 'auth.login', 'POST', '503')._value.get()
+    
+    response = client.post('/auth/login', json={'username': 'nobody', 'password': 'wrong'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '2'
+    assert ADMISSION_SHED.labels('auth', 'queue_full')._value.get() == shed_before + 1
+    assert REQUESTS.labels('auth', 'auth.login', 'POST', '503')._value.get() == requests_before + 1
+    assert client.get('/metrics').status_code == 200
+    
+    limits_file.write_text(json.dumps({'auth': {'concurrency': 2}}))
+    response = client.post('/auth/login', json={'username': 'nobody', 'password': 'wrong'})
+    assert response.status_code == 401
+    assert admission_control.limits['auth'].snapshot()['active'] == 0
+    
+    # A broken or unknown override is logged and skipped, and the limits stay as they were
+    for version, contents in enumerate(['{"auth": ', json.dumps({'auth': {'max': 0}, 'read': {'queue': 0}})], start=1):
+        limits_file.write_text(contents)
+        os.utime(limits_file, (version, version))
+        response = client.post('/auth/login', json={'username': 'nobody', 'password': 'wrong'})
+        assert response.status_code == 401
+        assert admission_control.limits['auth'].snapshot()['concurrency'] == 2
+        assert admission_control.limits['read'].snapshot()['queue'] == 32
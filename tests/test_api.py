@@ -1,21 +1,22 @@
 import pytest
 import json
 from src.app.main import create_app
-from src.app.database import db
+from src.app import database
+from src.utils.ingredients import ingredient_terms, MAX_TERM_LENGTH
+from query_counter import assert_queries_do_not_grow
 
 @pytest.fixture
 def client():
     """Create a test client for the application"""
     app = create_app()
     app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
     
     with app.test_client() as client:
         with app.app_context():
-            db.create_all()
+            database.Base.metadata.create_all(bind=database.engine)
             yield client
-            db.session.remove()
-            db.drop_all()
+            database.session.remove()
+            database.Base.metadata.drop_all(bind=database.engine)
 
 def test_user_registration(client):
     """Test user registration endpoint"""
@@ -111,3 +112,493 @@ def test_create_allergy(client):
                                      headers={'Authorization': f'Bearer {token}'})
     meal_check_data = json.loads(meal_check_response.data)
     assert meal_check_data['allergy_risk'] == 0.1  # 10% for one allergy
+
+def test_paginate_meals(client):
+    """Test keyset pagination over a user's meals"""
+    client.post('/auth/register', json={
+        'username': 'pageuser',
+        'email': 'page@example.com',
+        'password': 'pagepassword'
+    })
+    login_response = client.post('/auth/login', json={
+        'username': 'pageuser',
+        'password': 'pagepassword'
+    })
+    token = json.loads(login_response.data)['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    
+    for i in range(5):
+        client.post('/meals', json={'name': f'Meal {i}'}, headers=headers)
+    
+    # Walk every page following next_cursor
+    names = []
+    cursor = None
+    while True:
+        params = {'limit': 2}
+        if cursor:
+            params['cursor'] = cursor
+        response = client.get('/meals', query_string=params, headers=headers)
+        assert response.status_code == 200
+        page = json.loads(response.data)
+        assert len(page['items']) <= 2
+        names.extend(item['name'] for item in page['items'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            assert page['next'] is None
+            break
+    
+    assert names == [f'Meal {i}' for i in range(5)]
+    
+    # Tampered cursors are rejected
+    response = client.get('/meals', query_string={'cursor': 'not-a-cursor'}, headers=headers)
+    assert response.status_code == 400
+
+def test_list_endpoints_have_no_n_plus_one(client):
+    """Test that list and profile queries do not grow with the number of rows"""
+    client.post('/auth/register', json={
+        'username': 'nplusone',
+        'email': 'nplusone@example.com',
+        'password': 'nplusonepassword'
+    })
+    login_response = client.post('/auth/login', json={
+        'username': 'nplusone',
+        'password': 'nplusonepassword'
+    })
+    token = json.loads(login_response.data)['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    
+    def add_meal_with_allergy():
+        meal_response = client.post('/meals', json={'name': 'Growing Meal'}, headers=headers)
+        assert meal_response.status_code == 201
+        allergy_response = client.post('/allergies', json={
+            'meal_id': json.loads(meal_response.data)['id'],
+            'name': 'Shellfish',
+            'severity': 'severe'
+        }, headers=headers)
+        assert allergy_response.status_code == 201
+    
+    def get(path):
+        # A constant error response would keep the count flat too
+        assert client.get(path, headers=headers).status_code == 200
+    
+    add_meal_with_allergy()
+    for path in ('/meals', '/allergies', '/auth/profile'):
+        assert_queries_do_not_grow(lambda: get(path), add_meal_with_allergy)
+
+def test_allergy_count_maintained(client):
+    """Test that allergy writes keep the meal's allergy count and risk in step"""
+    client.post('/auth/register', json={
+        'username': 'countuser',
+        'email': 'count@example.com',
+        'password': 'countpassword'
+    })
+    login_response = client.post('/auth/login', json={
+        'username': 'countuser',
+        'password': 'countpassword'
+    })
+    token = json.loads(login_response.data)['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    
+    meal_id = json.loads(client.post('/meals', json={'name': 'Counted Meal'}, headers=headers).data)['id']
+    allergy_ids = [
+        json.loads(client.post('/allergies', json={
+            'meal_id': meal_id,
+            'name': f'Allergy {i}'
+        }, headers=headers).data)['id']
+        for i in range(4)
+    ]
+    
+    meal = json.loads(client.get(f'/meals/{meal_id}', headers=headers).data)
+    assert meal['allergy_count'] == 4
+    assert meal['allergy_risk'] == pytest.approx(0.2)  # 4 mild allergies
+    
+    client.delete(f'/allergies/{allergy_ids[0]}', headers=headers)
+    client.delete(f'/allergies/{allergy_ids[1]}', headers=headers)
+    meal = json.loads(client.get(f'/meals/{meal_id}', headers=headers).data)
+    assert meal['allergy_count'] == 2
+    assert meal['allergy_risk'] == pytest.approx(0.1)
+    
+    # Reconciliation and rescoring repair drifted denormalized columns
+    from src.app.database import session
+    from src.models.meal import Meal
+    from src.services.meal_service import MealService
+    from src.services.risk_service import RiskService
+    session.query(Meal).filter_by(id=meal_id).update({'allergy_count': 42, 'allergy_risk': 0.0})
+    session.commit()
+    MealService.reconcile_allergy_counts()
+    RiskService.rescore_all_meals()
+    meal = json.loads(client.get(f'/meals/{meal_id}', headers=headers).data)
+    assert meal['allergy_count'] == 2
+    assert meal['allergy_risk'] == pytest.approx(0.1)
+
+def test_update_allergy_only_moves_to_own_meals(client):
+    """Test that an allergy cannot be attached to another user's meal or handed to another user"""
+    def sign_up(name):
+        client.post('/auth/register', json={
+            'username': name,
+            'email': f'{name}@example.com',
+            'password': f'{name}password'
+        })
+        login_response = client.post('/auth/login', json={
+            'username': name,
+            'password': f'{name}password'
+        })
+        return {'Authorization': f"Bearer {json.loads(login_response.data)['access_token']}"}
+    
+    owner, other = sign_up('owner'), sign_up('other')
+    meal_id = json.loads(client.post('/meals', json={'name': 'Own Meal'}, headers=owner).data)['id']
+    other_meal_id = json.loads(client.post('/meals', json={'name': 'Other Meal'}, headers=other).data)['id']
+    allergy_id = json.loads(client.post('/allergies', json={
+        'meal_id': meal_id, 'name': 'Gluten'
+    }, headers=owner).data)['id']
+    
+    for missing_meal_id in (other_meal_id, 9999):
+        response = client.put(f'/allergies/{allergy_id}', json={'meal_id': missing_meal_id}, headers=owner)
+        assert response.status_code == 400
+    other_meal = json.loads(client.get(f'/meals/{other_meal_id}', headers=other).data)
+    assert other_meal['allergy_count'] == 0
+    
+    response = client.put(f'/allergies/{allergy_id}', json={
+        'name': 'Wheat', 'severity': 'severe', 'user_id': 2
+    }, headers=owner)
+    assert response.status_code == 200
+    allergy = json.loads(response.data)
+    assert (allergy['name'], allergy['severity'], allergy['user_id']) == ('Wheat', 'severe', 1)
+
+def test_allergy_leaderboards(client):
+    """Test top-K leaderboards served from the allergy summary table"""
+    client.post('/auth/register', json={
+        'username': 'leaderuser',
+        'email': 'leader@example.com',
+        'password': 'leaderpassword'
+    })
+    login_response = client.post('/auth/login', json={
+        'username': 'leaderuser',
+        'password': 'leaderpassword'
+    })
+    token = json.loads(login_response.data)['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    
+    meal_ids = []
+    for allergy_count in range(4):
+        meal_id = json.loads(client.post('/meals', json={'name': f'Meal {allergy_count}'}, headers=headers).data)['id']
+        meal_ids.append(meal_id)
+        for i in range(allergy_count):
+            client.post('/allergies', json={'meal_id': meal_id, 'name': f'Allergy {i}'}, headers=headers)
+    
+    response = client.get('/meals/most-allergies', query_string={'limit': 2}, headers=headers)
+    assert response.status_code == 200
+    top = json.loads(response.data)
+    assert [row['allergy_count'] for row in top] == [3, 2]
+    assert [row['meal']['id'] for row in top] == [meal_ids[3], meal_ids[2]]
+    
+    response = client.get('/allergies/meals-causing-allergies', headers=headers)
+    causing = json.loads(response.data)
+    assert [row['allergy_count'] for row in causing] == [3, 2, 1]
+    
+    response = client.get('/allergies/users-with-allergies', headers=headers)
+    assert response.status_code == 200
+    assert [row['allergy_count'] for row in json.loads(response.data)] == [6]
+
+def test_login_rehashes_outdated_password(client):
+    """Test that logging in upgrades a hash made with an old cost factor"""
+    from src.app.database import session
+    from src.models.user import User
+    from src.utils.password_hasher import password_hasher
+    
+    current_rounds = password_hasher.log_rounds
+    password_hasher.configure(4, password_hasher.max_workers)
+    try:
+        client.post('/auth/register', json={
+            'username': 'rehashuser',
+            'email': 'rehash@example.com',
+            'password': 'rehashpassword'
+        })
+    finally:
+        password_hasher.configure(current_rounds, password_hasher.max_workers)
+    
+    user = session.query(User).filter_by(username='rehashuser').first()
+    assert user.password_needs_rehash()
+    
+    response = client.post('/auth/login', json={
+        'username': 'rehashuser',
+        'password': 'rehashpassword'
+    })
+    assert response.status_code == 200
+    
+    session.expire_all()
+    user = session.query(User).filter_by(username='rehashuser').first()
+    assert not user.password_needs_rehash()
+    assert user.check_password('rehashpassword')
+
+def test_profile_served_from_user_cache(client):
+    """Test that the profile is cached per user and refreshed after writes"""
+    from src.services.auth_service import user_cache
+    client.post('/auth/register', json={
+        'username': 'cacheuser',
+        'email': 'cache@example.com',
+        'password': 'cachepassword'
+    })
+    login_response = client.post('/auth/login', json={
+        'username': 'cacheuser',
+        'password': 'cachepassword'
+    })
+    token = json.loads(login_response.data)['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    user_cache.reset_stats()
+    
+    client.get('/auth/profile', headers=headers)
+    profile = json.loads(client.get('/auth/profile', headers=headers).data)
+    assert profile['meals'] == []
+    assert user_cache.stats()['hits'] == 1
+    
+    # A write by the user invalidates the cached record
+    client.post('/meals', json={'name': 'Cached Meal'}, headers=headers)
+    profile = json.loads(client.get('/auth/profile', headers=headers).data)
+    assert [meal['name'] for meal in profile['meals']] == ['Cached Meal']
+
+def test_conditional_get_with_etag(client):
+    """Test that unchanged collections answer If-None-Match with 304"""
+    client.post('/auth/register', json={
+        'username': 'etaguser',
+        'email': 'etag@example.com',
+        'password': 'etagpassword'
+    })
+    login_response = client.post('/auth/login', json={
+        'username': 'etaguser',
+        'password': 'etagpassword'
+    })
+    token = json.loads(login_response.data)['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    client.post('/meals', json={'name': 'Tagged Meal'}, headers=headers)
+    
+    response = client.get('/meals', headers=headers)
+    etag = response.headers['ETag']
+    assert response.status_code == 200
+    
+    response = client.get('/meals', headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    
+    # Any write by the user changes the version stamp
+    client.post('/meals', json={'name': 'Another Meal'}, headers=headers)
+    response = client.get('/meals', headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+def test_bulk_create_meals(client):
+    """Test creating many meals in one request with per-item results"""
+    client.post('/auth/register', json={
+        'username': 'bulkuser',
+        'email': 'bulk@example.com',
+        'password': 'bulkpassword'
+    })
+    login_response = client.post('/auth/login', json={
+        'username': 'bulkuser',
+        'password': 'bulkpassword'
+    })
+    token = json.loads(login_response.data)['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    
+    response = client.post('/meals/bulk', json=[
+        {'name': 'Bulk One', 'ingredients': 'rice'},
+        {'name': 'X'},
+        {'name': 'Bulk Two', 'description': 'second'}
+    ], headers=headers)
+    assert response.status_code == 207
+    data = json.loads(response.data)
+    assert data['created'] == 2
+    assert [result['status'] for result in data['results']] == ['created', 'invalid', 'created']
+    assert 'name' in data['results'][1]['errors']
+    
+    meal = json.loads(client.get(f"/meals/{data['results'][2]['id']}", headers=headers).data)
+    assert meal['name'] == 'Bulk Two'
+    assert meal['allergy_count'] == 0
+    
+    response = client.post('/meals/bulk', json=[{'name': 'Meal'}] * 501, headers=headers)
+    assert response.status_code == 400
+
+def test_import_allergies_ndjson(client):
+    """Test the streaming NDJSON allergy import"""
+    client.post('/auth/register', json={
+        'username': 'importuser',
+        'email': 'import@example.com',
+        'password': 'importpassword'
+    })
+    login_response = client.post('/auth/login', json={
+        'username': 'importuser',
+        'password': 'importpassword'
+    })
+    token = json.loads(login_response.data)['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    meal_id = json.loads(client.post('/meals', json={'name': 'Imported Meal'}, headers=headers).data)['id']
+    
+    lines = [
+        json.dumps({'meal_id': meal_id, 'name': 'Peanuts', 'severity': 'severe'}),
+        'not json',
+        json.dumps({'meal_id': meal_id + 1000, 'name': 'Soy'}),
+        '',
+        json.dumps({'meal_id': str(meal_id), 'name': 'Gluten'}),
+    ]
+    response = client.post(
+        '/allergies/import',
+        data='\n'.join(lines) + '\n',
+        content_type='application/x-ndjson',
+        headers=headers
+    )
+    assert response.status_code == 200
+    statuses = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [(status['line'], status['status']) for status in statuses] == [
+        (1, 'created'), (2, 'invalid'), (3, 'invalid'), (5, 'created')
+    ]
+    assert statuses[3]['meal_id'] == meal_id
+    
+    meal = json.loads(client.get(f'/meals/{meal_id}', headers=headers).data)
+    assert meal['allergy_count'] == 2
+    assert meal['allergy_risk'] == pytest.approx(0.25)  # severe + mild
+
+def test_export_meals(client):
+    """Test streaming exports in NDJSON, CSV and gzip"""
+    import csv
+    import gzip
+    import io
+    client.post('/auth/register', json={
+        'username': 'exportuser',
+        'email': 'export@example.com',
+        'password': 'exportpassword'
+    })
+    login_response = client.post('/auth/login', json={
+        'username': 'exportuser',
+        'password': 'exportpassword'
+    })
+    token = json.loads(login_response.data)['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    meal_ids = [
+        json.loads(client.post('/meals', json={'name': name}, headers=headers).data)['id']
+        for name in ('First', 'Second', 'Third')
+    ]
+    for name in ('Nuts', 'Dairy'):
+        client.post('/allergies', json={'meal_id': meal_ids[1], 'name': name}, headers=headers)
+    
+    response = client.get('/meals/export', headers=headers)
+    assert response.status_code == 200
+    meals = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [meal['id'] for meal in meals] == meal_ids
+    assert [allergy['name'] for allergy in meals[1]['allergies']] == ['Nuts', 'Dairy']
+    assert meals[0]['allergies'] == []
+    
+    response = client.get('/meals/export', query_string={'format': 'csv'},
+                          headers={**headers, 'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(response.data).decode())))
+    assert [(row['meal_name'], row['allergy_name']) for row in rows] == [
+        ('First', ''), ('Second', 'Nuts'), ('Second', 'Dairy'), ('Third', '')
+    ]
+
+def test_search_meals_by_ingredient(client):
+    """Test AND/OR ingredient search backed by the inverted index"""
+    client.post('/auth/register', json={
+        'username': 'searchuser',
+        'email': 'search@example.com',
+        'password': 'searchpassword'
+    })
+    login_response = client.post('/auth/login', json={
+        'username': 'searchuser',
+        'password': 'searchpassword'
+    })
+    token = json.loads(login_response.data)['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    
+    satay = json.loads(client.post('/meals', json={
+        'name': 'Satay', 'ingredients': 'Chicken, roasted peanuts, soy sauce'
+    }, headers=headers).data)['id']
+    noodles = json.loads(client.post('/meals', json={
+        'name': 'Noodles', 'ingredients': 'wheat noodles; sesame oil; soy sauce'
+    }, headers=headers).data)['id']
+    cookies = json.loads(client.post('/meals', json={
+        'name': 'Cookies', 'ingredients': 'flour, butter'
+    }, headers=headers).data)['id']
+    
+    def search(**params):
+        response = client.get('/meals/search', query_string=params, headers=headers)
+        assert response.status_code == 200
+        return [meal['id'] for meal in json.loads(response.data)['items']]
+    
+    assert search(q='peanut') == [satay]
+    assert search(q='soy sauce') == [satay, noodles]
+    assert search(q='soy peanuts') == [satay]
+    assert search(q='peanut sesame', mode='or') == [satay, noodles]
+    
+    # Updating ingredients re-indexes the meal
+    client.put(f'/meals/{cookies}', json={'ingredients': 'flour, peanut butter'}, headers=headers)
+    assert search(q='peanut') == [satay, cookies]
+    
+    assert client.get('/meals/search', headers=headers).status_code == 400
+    
+    # Words wider than the term column are indexed and searched truncated
+    long_word = 'x' * 150
+    assert ingredient_terms(f'{long_word} flour') == ['flour', 'x' * MAX_TERM_LENGTH]
+    dumplings = json.loads(client.post('/meals', json={
+        'name': 'Dumplings', 'ingredients': f'{long_word}, cabbage'
+    }, headers=headers).data)['id']
+    assert search(q=long_word) == [dumplings]
+
+def test_ingredient_aware_allergy_risk(client):
+    """Test that a known allergen in a meal's ingredients raises its risk"""
+    client.post('/auth/register', json={
+        'username': 'riskuser',
+        'email': 'risk@example.com',
+        'password': 'riskpassword'
+    })
+    login_response = client.post('/auth/login', json={
+        'username': 'riskuser',
+        'password': 'riskpassword'
+    })
+    token = json.loads(login_response.data)['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    
+    def risk(meal_id):
+        return json.loads(client.get(f'/meals/{meal_id}', headers=headers).data)['allergy_risk']
+    
+    salad = json.loads(client.post('/meals', json={
+        'name': 'Salad', 'ingredients': 'lettuce, tomato'
+    }, headers=headers).data)['id']
+    satay = json.loads(client.post('/meals', json={
+        'name': 'Satay', 'ingredients': 'chicken, roasted peanuts'
+    }, headers=headers).data)['id']
+    allergy_id = json.loads(client.post('/allergies', json={
+        'meal_id': salad, 'name': 'Peanut Allergy', 'severity': 'severe'
+    }, headers=headers).data)['id']
+    
+    assert risk(salad) == pytest.approx(0.2)
+    assert risk(satay) == pytest.approx(0.3)  # severe allergen among the ingredients
+    
+    # New meals are scored against the user's known allergens
+    cookies = json.loads(client.post('/meals', json={
+        'name': 'Cookies', 'ingredients': 'flour, peanut butter'
+    }, headers=headers).data)['id']
+    assert risk(cookies) == pytest.approx(0.3)
+    
+    client.put(f'/allergies/{allergy_id}', json={'severity': 'mild'}, headers=headers)
+    assert risk(salad) == pytest.approx(0.05)
+    assert risk(satay) == pytest.approx(0.075)
+    
+    client.delete(f'/allergies/{allergy_id}', headers=headers)
+    assert risk(salad) == pytest.approx(0.0)
+    assert risk(satay) == pytest.approx(0.0)
+    
+    # Deleting a meal takes its allergies, and their allergens, with it
+    client.post('/allergies', json={
+        'meal_id': cookies, 'name': 'Peanuts', 'severity': 'moderate'
+    }, headers=headers)
+    client.post('/allergies', json={'meal_id': salad, 'name': 'Tomato'}, headers=headers)
+    assert risk(satay) == pytest.approx(0.15)
+    client.delete(f'/meals/{cookies}', headers=headers)
+    assert risk(satay) == pytest.approx(0.0)
+    
+    # The incremental scores match a full rescore
+    from src.services.risk_service import RiskService
+    scores = {meal_id: risk(meal_id) for meal_id in (salad, satay)}
+    RiskService.rescore_all_meals(users_per_batch=1)
+    assert {meal_id: risk(meal_id) for meal_id in (salad, satay)} == pytest.approx(scores)
+    assert scores[salad] == pytest.approx(0.05 + 0.075)
@@ -0,0 +1,38 @@
+import json
+import subprocess
+import sys
+
+# flasgger must stay out of worker startup
+STARTUP_SCRIPT = """
+import sys
+from src.app.main import create_app
+create_app()
+assert 'flasgger' not in sys.modules, 'flasgger imported at startup'
+"""
+
+HTTPS = {'X-Forwarded-Proto': 'https'}
+
+def test_spec_is_compiled_lazily_and_revalidated(make_app):
+    """Test the compiled spec, its ETag and that flasgger is not imported at startup"""
+    subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], check=True)
+    client = make_app().test_client()
+    
+    response = client.get('/apispec_1.json', headers=HTTPS)
+    assert response.status_code == 200
+    spec = response.get_json()
+    assert spec['info']['title'] == 'Meal Tracker API'
+    assert '/meals' in spec['paths']
+    
+    etag = response.headers['ETag']
+    revalidated = client.get('/apispec_1.json', headers={**HTTPS, 'If-None-Match': etag})
+    assert revalidated.status_code == 304
+    assert client.get('/apidocs/', headers=HTTPS).status_code == 200
+
+def test_prebuilt_spec_is_served(make_app, tmp_path):
+    """Test that the OPENAPI_SPEC_FILE artifact is served as is"""
+    spec_file = tmp_path / 'openapi.json'
+    spec_file.write_text(json.dumps({'swagger': '2.0', 'paths': {}}))
+    client = make_app(OPENAPI_SPEC_FILE=str(spec_file)).test_client()
+    
+    response = client.get('/apispec_1.json', headers=HTTPS)
+    assert response.get_data() == spec_file.read_bytes()
@@ -0,0 +1,138 @@
+import asyncio
+import pytest
+import httpx
+from starlette.testclient import TestClient
+from src.app import database
+from src.app.admission import admission_control
+from src.app.asgi import create_asgi_app
+
+@pytest.fixture
+def asgi_app(tmp_path, monkeypatch):
+    """Create the ASGI application on a SQLite file shared by the sync and async engines"""
+    monkeypatch.setenv('DATABASE_URI', f"sqlite:///{tmp_path / 'asgi.db'}")
+    monkeypatch.setenv('BCRYPT_LOG_ROUNDS', '4')
+    app = create_asgi_app()
+    app.state.flask_app.config['TESTING'] = True
+    database.Base.metadata.create_all(bind=database.engine)
+    yield app
+    database.engine.dispose()
+
+def login(client):
+    response = client.post('/auth/register', json={
+        'username': 'asyncuser',
+        'email': 'async@example.com',
+        'password': 'asyncpassword'
+    })
+    assert response.status_code == 201
+    assert response.json()['meals'] == []
+    response = client.post('/auth/login', json={
+        'username': 'asyncuser',
+        'password': 'asyncpassword'
+    })
+    assert response.status_code == 200
+    return {'Authorization': f"Bearer {response.json()['access_token']}"}
+
+def test_asgi_crud_matches_sync_api(asgi_app):
+    """Test meal and allergy CRUD, ETags and risk scoring on the async routes"""
+    with TestClient(asgi_app, base_url='https://testserver') as client:
+        assert client.get('/meals').status_code == 401
+        headers = login(client)
+        
+        response = client.post('/meals', json={'name': 'Satay', 'ingredients': 'chicken, peanuts'}, headers=headers)
+        assert response.status_code == 201
+        satay = response.json()['id']
+        other = client.post('/meals', json={'name': 'Salad'}, headers=headers).json()['id']
+        
+        response = client.post('/allergies', json={
+            'meal_id': other, 'name': 'Peanut Allergy', 'severity': 'severe'
+        }, headers=headers)
+        assert response.status_code == 201
+        allergy_id = response.json()['id']
+        
+        meal = client.get(f'/meals/{satay}', headers=headers).json()
+        assert meal['allergy_risk'] == pytest.approx(0.3)
+        
+        response = client.get('/meals', params={'limit': 1}, headers=headers)
+        assert response.status_code == 200
+        assert response.headers['X-Frame-Options'] == 'SAMEORIGIN'
+        page = response.json()
+        assert [item['id'] for item in page['items']] == [satay]
+        assert page['next'].startswith('/meals?limit=1&cursor=')
+        
+        etag = response.headers['ETag']
+        assert client.get('/meals', params={'limit': 1}, headers={**headers, 'If-None-Match': etag}).status_code == 304
+        
+        assert client.put(f'/allergies/{allergy_id}', json={'severity': 'mild'}, headers=headers).status_code == 200
+        assert client.get('/meals', params={'limit': 1}, headers={**headers, 'If-None-Match': etag}).status_code == 200
+        assert client.delete(f'/allergies/{allergy_id}', headers=headers).status_code == 204
+        assert client.get(f'/meals/{satay}', headers=headers).json()['allergy_risk'] == pytest.approx(0.0)
+        assert client.delete(f'/meals/{other}', headers=headers).status_code == 204
+        assert client.get(f'/meals/{other}', headers=headers).status_code == 404
+        
+        # Routes without an async counterpart are served by the Flask app
+        response = client.get('/meals/search', params={'q': 'peanut'}, headers=headers)
+        assert response.status_code == 200
+        assert [item['id'] for item in response.json()['items']] == [satay]
+        
+        assert client.get('/auth/profile', headers=headers).json()['username'] == 'asyncuser'
+
+def test_asgi_serves_concurrent_requests(asgi_app):
+    """Test that many in-flight requests on one event loop each get their own session"""
+    async def run():
+        transport = httpx.ASGITransport(app=asgi_app)
+        async with httpx.AsyncClient(transport=transport, base_url='https://testserver') as client:
+            response = await client.post('/auth/register', json={
+                'username': 'asyncuser',
+                'email': 'async@example.com',
+                'password': 'asyncpassword'
+            })
+            assert response.status_code == 201
+            response = await client.post('/auth/login', json={
+                'username': 'asyncuser',
+                'password': 'asyncpassword'
+            })
+            headers = {'Authorization': f"Bearer {response.json()['access_token']}"}
+            
+            created = await asyncio.gather(*(
+                client.post('/meals', json={'name': f'Meal {i}'}, headers=headers)
+                for i in range(20)
+            ))
+            meal_ids = [response.json()['id'] for response in created]
+            fetched = await asyncio.gather(*(
+                client.get(f'/meals/{meal_id}', headers=headers)
+                for meal_id in meal_ids * 5
+            ))
+            await database.async_engine.dispose()
+            return meal_ids, fetched
+    
+    meal_ids, responses = asyncio.run(run())
+    assert len(set(meal_ids)) == 20
+    assert all(response.status_code == 200 for response in responses)
+    assert [response.json()['id'] for response in responses] == meal_ids * 5
+
+def test_asgi_rejects_sharded_databases(tmp_path, monkeypatch):
+    """Test that the async services refuse to run when users are spread over shards"""
+    monkeypatch.setenv('DATABASE_URI', f"sqlite:///{tmp_path / 'asgi.db'}")
+    monkeypatch.setenv('DATABASE_SHARD_URIS', f"sqlite:///{tmp_path / 'shard1.db'}")
+    with pytest.raises(ValueError, match='DATABASE_SHARD_URIS'):
+        create_asgi_app()
+    for engine in database.shard_engines:
+        engine.dispose()
+
+def test_asgi_routes_pass_admission_control(tmp_path, monkeypatch):
+    """Test that the native ASGI routes are shed like their Flask views"""
+    monkeypatch.setenv('DATABASE_URI', f"sqlite:///{tmp_path / 'asgi.db'}")
+    monkeypatch.setenv('ADMISSION_CONTROL_ENABLED', 'true')
+    monkeypatch.setenv('ADMISSION_AUTH_CONCURRENCY', '0')
+    monkeypatch.setenv('ADMISSION_AUTH_QUEUE', '0')
+    app = create_asgi_app()
+    database.Base.metadata.create_all(bind=database.engine)
+    try:
+        with TestClient(app, base_url='https://testserver') as client:
+            response = client.post('/auth/login', json={'username': 'nobody', 'password': 'wrong'})
+            assert response.status_code == 503
+            assert response.headers['Retry-After'] == '2'
+            assert client.get('/meals').status_code == 401
+        assert admission_control.limits['read'].snapshot()['active'] == 0
+    finally:
+        database.engine.dispose()
@@ -0,0 +1,150 @@
+import threading
+import pytest
+from src.utils.cache import TTLCache, SingleFlightCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+def test_ttl_cache_evicts_least_recently_used():
+    """Test that the cache stays within its size bound, evicting the LRU entry"""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set(1, 'one')
+    cache.set(2, 'two')
+    assert cache.get(1) == 'one'  # 2 is now least recently used
+    cache.set(3, 'three')
+    
+    assert cache.get(2) is None
+    assert cache.get(1) == 'one'
+    assert cache.get(3) == 'three'
+    stats = cache.stats()
+    assert stats['size'] == 2
+    assert stats['evictions'] == 1
+    assert stats['hits'] == 3
+    assert stats['misses'] == 1
+
+def test_ttl_cache_expires_and_invalidates():
+    """Test expiry after the TTL and explicit invalidation"""
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=5, clock=clock)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    
+    clock.now = 4.9
+    assert cache.get('a') == 1
+    clock.now = 5.0
+    assert cache.get('a') is None
+    
+    cache.invalidate('b')
+    assert cache.get('b') is None
+    stats = cache.stats()
+    assert stats['expirations'] == 1
+    assert stats['invalidations'] == 1
+
+def test_ttl_cache_skips_loads_raced_by_invalidation():
+    """Test that a value loaded before a concurrent invalidate is not cached"""
+    cache = TTLCache(maxsize=10, ttl=60)
+    token = cache.reserve('user')
+    cache.invalidate('user')  # a writer commits while the loader reads
+    cache.set('user', 'stale', token=token)
+    cache.release('user', token)
+    assert cache.get('user') is None
+    
+    token = cache.reserve('user')
+    cache.set('user', 'fresh', token=token)
+    cache.release('user', token)
+    assert cache.get('user') == 'fresh'
+
+def test_single_flight_cache_coalesces_concurrent_misses():
+    """Test that concurrent callers share one computation of a missing key"""
+    cache = SingleFlightCache(maxsize=10, ttl=60, stale_ttl=60)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+    
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'leaderboard'
+    
+    results = []
+    callers = [threading.Thread(target=lambda: results.append(cache.get('top', compute))) for _ in range(4)]
+    callers[0].start()
+    started.wait(5)
+    for caller in callers[1:]:
+        caller.start()
+    while cache.stats()['coalesced'] < 3:
+        pass
+    release.set()
+    for caller in callers:
+        caller.join()
+    
+    assert results == ['leaderboard'] * 4
+    assert len(calls) == 1
+    assert cache.get('top', compute) == 'leaderboard'
+    assert cache.stats()['hits'] == 1
+
+def test_single_flight_cache_survives_interrupted_computation():
+    """Test that a BaseException in the leader releases its waiters and the key"""
+    class Interrupted(BaseException):
+        pass
+    
+    cache = SingleFlightCache(maxsize=10, ttl=60, stale_ttl=60)
+    started, release = threading.Event(), threading.Event()
+    
+    def interrupted():
+        started.set()
+        release.wait(5)
+        raise Interrupted()
+    
+    errors = []
+    
+    def wait_for_leader():
+        try:
+            cache.get('top', interrupted)
+        except RuntimeError as error:
+            errors.append(error)
+    
+    leader = threading.Thread(target=lambda: pytest.raises(Interrupted, cache.get, 'top', interrupted), daemon=True)
+    leader.start()
+    started.wait(5)
+    waiter = threading.Thread(target=wait_for_leader, daemon=True)
+    waiter.start()
+    while cache.stats()['coalesced'] < 1:
+        pass
+    release.set()
+    leader.join(5)
+    waiter.join(5)
+    
+    assert not waiter.is_alive() and len(errors) == 1
+    assert cache.get('top', lambda: 'leaderboard') == 'leaderboard'
+    assert cache.stats()['in_flight'] == 0
+
+def test_single_flight_cache_serves_stale_while_revalidating():
+    """Test stale results while one background refresh runs, and expiry after the stale window"""
+    clock = FakeClock()
+    cache = SingleFlightCache(maxsize=10, ttl=5, stale_ttl=10, clock=clock)
+    versions = iter(['v1', 'v2', 'v3'])
+    refreshed = threading.Event()
+    
+    def compute():
+        value = next(versions)
+        if value == 'v2':
+            refreshed.set()
+        return value
+    
+    assert cache.get('key', compute) == 'v1'
+    clock.now = 6
+    assert cache.get('key', compute) == 'v1'
+    assert refreshed.wait(5)
+    while cache.stats()['in_flight']:
+        pass
+    assert cache.get('key', compute) == 'v2'
+    
+    clock.now = 30
+    assert cache.get('key', compute) == 'v3'
+    stats = cache.stats()
+    assert (stats['stale_hits'], stats['refreshes'], stats['misses']) == (1, 1, 2)
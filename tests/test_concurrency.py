@@ -0,0 +1,70 @@
+import gc
+import json
+import tracemalloc
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from src.app.main import create_app
+from src.app import database
+
+THREADS = 16
+
+@pytest.fixture
+def threaded_app(tmp_path, monkeypatch):
+    """Create an application on a SQLite file that many threads can share"""
+    monkeypatch.setenv('BCRYPT_LOG_ROUNDS', '4')
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'threads.db'}"
+    # SQLite serializes writers; let them queue instead of failing fast
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 60}}
+    database.init_db(app)
+    database.Base.metadata.create_all(bind=database.engine)
+    yield app
+    database.engine.dispose()
+
+def login(client, n):
+    client.post('/auth/register', json={
+        'username': f'thread{n}',
+        'email': f'thread{n}@example.com',
+        'password': 'threadpassword'
+    })
+    response = client.post('/auth/login', json={
+        'username': f'thread{n}',
+        'password': 'threadpassword'
+    })
+    return {'Authorization': f"Bearer {json.loads(response.data)['access_token']}"}
+
+def exercise(client, headers, n, rounds):
+    """Write and read one user's meals, checking nothing leaks between requests"""
+    for i in range(rounds):
+        response = client.post('/meals', json={'name': f'thread{n} meal {i}'}, headers=headers)
+        assert response.status_code == 201
+        assert not database.session.registry.has()
+        
+        response = client.get('/meals', query_string={'limit': 200}, headers=headers)
+        names = [meal['name'] for meal in json.loads(response.data)['items']]
+        assert names and all(name.startswith(f'thread{n} ') for name in names)
+        assert not database.session.registry.has()
+
+def test_threads_get_isolated_sessions_and_flat_memory(threaded_app):
+    """Test many threads hammering the API with per-request sessions"""
+    clients = [threaded_app.test_client() for _ in range(THREADS)]
+    
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        headers = list(pool.map(login, clients, range(THREADS)))
+        
+        def run(rounds):
+            list(pool.map(exercise, clients, headers, range(THREADS), [rounds] * THREADS))
+            gc.collect()
+            return tracemalloc.get_traced_memory()[0]
+        
+        tracemalloc.start()
+        try:
+            # Warm up compiled statement and schema caches first
+            run(5)
+            baseline = run(5)
+            after = run(20)
+        finally:
+            tracemalloc.stop()
+    
+    assert after - baseline < 1024 * 1024, f"memory grew by {after - baseline} bytes"
@@ -0,0 +1,44 @@
+import numpy as np
+from sqlalchemy import func, select
+from src.app import database
+from src.app.generate_data import SyntheticDataset
+from src.models.meal import Meal
+from src.models.allergy import Allergy
+from src.models.meal_ingredient import MealIngredient
+from src.models.meal_stats import MealAllergyStats
+from src.services.risk_service import RiskService
+from src.utils.ingredients import ingredient_terms
+
+def test_synthetic_dataset_is_deterministic_and_consistent(make_app):
+    """Test that generated rows repeat for a seed and keep the denormalized columns right"""
+    app = make_app()
+    
+    dataset = SyntheticDataset(50, 2000, 800, seed=7)
+    again = SyntheticDataset(50, 2000, 800, seed=7)
+    assert np.array_equal(dataset.meal_user, again.meal_user)
+    assert np.array_equal(dataset.allergy_meal, again.allergy_meal)
+    # Power law: the busiest tenth of users own far more than a tenth of the meals
+    meals_per_user = np.sort(np.bincount(dataset.meal_user, minlength=50))[::-1]
+    assert meals_per_user[:5].sum() > 2000 * 0.3
+    
+    counts = dataset.load(database.engine, batch_size=300, log=lambda message: None)
+    assert counts['users'] == 50 and counts['meals'] == 2000 and counts['allergies'] == 800
+    
+    with app.app_context():
+        session = database.session
+        assert session.query(func.count(MealIngredient.meal_id)).scalar() == counts['meal_ingredients']
+        actual = dict(session.execute(
+            select(Allergy.meal_id, func.count(Allergy.id)).group_by(Allergy.meal_id)
+        ).all())
+        for meal_id, allergy_count, stats_count in session.execute(
+            select(Meal.id, Meal.allergy_count, MealAllergyStats.allergy_count)
+            .join(MealAllergyStats, MealAllergyStats.meal_id == Meal.id)
+        ):
+            assert allergy_count == stats_count == actual.get(meal_id, 0)
+        
+        meal = session.query(Meal).filter(Meal.id == 1).one()
+        indexed = session.query(MealIngredient.term).filter(MealIngredient.meal_id == 1).all()
+        assert sorted(term for term, in indexed) == ingredient_terms(meal.ingredients)
+        assert session.query(Allergy).filter(Allergy.user_id != Meal.user_id).join(Meal).count() == 0
+        
+        assert RiskService.rescore_all_meals() == 2000
@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+from prometheus_client import generate_latest
+from src.app.metrics import REQUESTS, metrics_registry
+
+# Each child process serves one request with its own metric files
+WORKER_SCRIPT = """
+from src.app.main import create_app
+from src.app import database
+app = create_app()
+database.Base.metadata.create_all(bind=database.engine)
+app.test_client().post('/auth/login', json={'username': 'nobody', 'password': 'wrong'})
+"""
+
+def login_count(status):
+    return REQUESTS.labels('auth', 'auth.login', 'POST', status)._value.get()
+
+def test_requests_are_counted_and_exported(make_app):
+    """Test per-endpoint counters and the /metrics exposition"""
+    app = make_app(METRICS_ENABLED='true')
+    client = app.test_client()
+    before = login_count('401')
+    
+    for _ in range(2):
+        client.post('/auth/login', json={'username': 'nobody', 'password': 'wrong'})
+    assert login_count('401') == before + 2
+    
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain')
+    body = response.get_data(as_text=True)
+    assert 'http_requests_total{blueprint="auth",endpoint="auth.login",method="POST",status="401"}' in body
+    assert 'http_request_duration_seconds_bucket{blueprint="meals",endpoint="meals.get_user_meals",le="0.005",method="GET"}' in body
+    assert 'db_pool_connections_in_use' in body
+
+def test_multiprocess_metrics_are_aggregated(tmp_path, monkeypatch):
+    """Test that metrics from several worker processes are summed"""
+    metrics_dir = tmp_path / 'prometheus'
+    metrics_dir.mkdir()
+    env = dict(
+        os.environ,
+        PROMETHEUS_MULTIPROC_DIR=str(metrics_dir),
+        METRICS_ENABLED='true',
+        DATABASE_URI=f"sqlite:///{tmp_path / 'workers.db'}",
+        BCRYPT_LOG_ROUNDS='4'
+    )
+    for _ in range(3):
+        subprocess.run([sys.executable, '-c', WORKER_SCRIPT], env=env, check=True)
+    
+    monkeypatch.setenv('PROMETHEUS_MULTIPROC_DIR', str(metrics_dir))
+    body = generate_latest(metrics_registry()).decode()
+    assert 'http_requests_total{blueprint="auth",endpoint="auth.login",method="POST",status="401"} 3.0' in body
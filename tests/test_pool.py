@@ -0,0 +1,53 @@
+import pytest
+import json
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from src.app.main import create_app
+from src.app import database
+from src.app.pool_stats import InstrumentedQueuePool, pool_stats
+
+@pytest.fixture
+def pooled_app(tmp_path, monkeypatch):
+    """Create an application backed by a one-connection pool on a SQLite file"""
+    monkeypatch.setenv('INTERNAL_ENDPOINTS_ENABLED', 'true')
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'pool.db'}"
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': 1,
+        'max_overflow': 0,
+        'pool_timeout': 0.2,
+    }
+    database.init_db(app)
+    yield app
+    database.engine.dispose()
+
+def test_pool_exhaustion_is_reported(pooled_app):
+    """Test that waiting on an exhausted pool times out and shows up in the stats"""
+    held = database.engine.connect()
+    try:
+        with pytest.raises(PoolTimeoutError):
+            database.engine.connect()
+        
+        stats = pool_stats.snapshot(database.engine.pool)
+        assert stats['in_use'] == 1
+        assert stats['checked_out'] == 1
+        assert stats['timeouts'] == 1
+        assert stats['wait_seconds_max'] >= 0.2
+    finally:
+        held.close()
+    
+    stats = pool_stats.snapshot(database.engine.pool)
+    assert stats['in_use'] == 0
+    assert stats['checkouts'] == stats['checkins'] == 1
+
+def test_pool_stats_endpoint(pooled_app):
+    """Test the internal pool stats endpoint"""
+    with database.engine.connect():
+        pass
+    
+    response = pooled_app.test_client().get('/internal/pool-stats')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data['checkouts'] == 1
+    assert data['pool_size'] == 1
@@ -0,0 +1,55 @@
+import shutil
+from sqlalchemy import insert
+from src.app import database
+from src.app.read_replicas import read_routing, STICKY_COOKIE
+from src.models.meal import Meal
+
+HTTPS = 'https://localhost'
+
+def test_reads_go_to_replica_except_after_a_write(make_app, tmp_path):
+    """Test replica routing for GET requests and read-your-writes stickiness"""
+    primary, replica = tmp_path / 'primary.db', tmp_path / 'replica.db'
+    app = make_app(
+        DATABASE_URI=f"sqlite:///{primary}",
+        DATABASE_REPLICA_URIS=f"sqlite:///{replica}",
+        READ_YOUR_WRITES_SECONDS='60'
+    )
+    
+    client = app.test_client()
+    client.post('/auth/register', base_url=HTTPS, json={
+        'username': 'replicated', 'email': 'replicated@example.com', 'password': 'replicapassword'
+    })
+    token = client.post('/auth/login', base_url=HTTPS, json={
+        'username': 'replicated', 'password': 'replicapassword'
+    }).get_json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    # "Replicate" the user, but none of the meals created below
+    shutil.copyfile(primary, replica)
+    
+    response = client.post('/meals', base_url=HTTPS, headers=headers, json={'name': 'Unreplicated'})
+    assert response.status_code == 201
+    assert STICKY_COOKIE in response.headers['Set-Cookie']
+    
+    # The writer reads from the primary: by identity, by cookie, and on other
+    # workers because the replica is behind on the user's data version
+    fresh_client = app.test_client()
+    assert len(fresh_client.get('/meals', base_url=HTTPS, headers=headers).get_json()['items']) == 1
+    read_routing.recent_writers.clear()
+    assert len(client.get('/meals', base_url=HTTPS, headers=headers).get_json()['items']) == 1
+    assert len(fresh_client.get('/meals', base_url=HTTPS, headers=headers).get_json()['items']) == 1
+    
+    # Once the replica has caught up, reads are served by it: a row written
+    # to the primary alone, without a version bump, is not seen
+    shutil.copyfile(primary, replica)
+    with database.engine.begin() as connection:
+        connection.execute(insert(Meal).values(user_id=1, name='Primary only'))
+    items = fresh_client.get('/meals', base_url=HTTPS, headers=headers).get_json()['items']
+    assert [meal['name'] for meal in items] == ['Unreplicated']
+    assert fresh_client.get('/auth/profile', base_url=HTTPS, headers=headers).status_code == 200
+    
+    # A replica that cannot be reached leaves reads on the primary
+    database.replica_engines[0].dispose()
+    replica.unlink()
+    replica.mkdir()
+    items = fresh_client.get('/meals', base_url=HTTPS, headers=headers).get_json()['items']
+    assert [meal['name'] for meal in items] == ['Unreplicated', 'Primary only']
@@ -0,0 +1,52 @@
+import json
+from flask import jsonify
+from src.app import database
+from src.models.meal import Meal
+from src.models.schemas import MealSchema, AllergySchema
+from src.models.allergy import Allergy
+from src.services.meal_service import MealService, MEAL_SCHEMA_LOADS
+from src.services.allergy_service import AllergyService
+from src.services.auth_service import AuthService
+from src.utils.serializers import allergy_dicts, meal_dicts, json_response
+
+def ordered(body):
+    """Parsed JSON that also remembers key order"""
+    return json.loads(body, object_pairs_hook=list)
+
+def test_fast_serializers_match_schemas(make_app):
+    """Contract: the row serializers produce exactly the schemas' JSON"""
+    app = make_app()
+    
+    with app.test_request_context():
+        user_id = AuthService.register_user('contract', 'contract@example.com', 'contractpassword').id
+        meal_ids = MealService.create_meals_bulk(user_id, [
+            {'name': 'Peanut noodles', 'description': 'Spicy', 'ingredients': 'noodles, peanuts, soy sauce'},
+            {'name': 'Plain rice', 'ingredients': ''},
+            {'name': 'Shrimp salad', 'description': 'Fresh "summer" salad', 'ingredients': 'shrimp, lettuce'},
+        ])
+        database.session.query(Meal).filter(Meal.id == meal_ids[1]).update({'description': None})
+        database.session.commit()
+        AllergyService.create_allergies_bulk(user_id, [
+            {'meal_id': meal_ids[0], 'name': 'Peanut allergy', 'severity': 'severe'},
+            {'meal_id': meal_ids[2], 'name': 'Shellfish', 'severity': 'moderate'},
+            {'meal_id': meal_ids[0], 'name': 'Soy intolerance'},
+        ])
+        database.session.remove()
+        
+        orm_meals = (
+            database.session.query(Meal).options(*MEAL_SCHEMA_LOADS)
+            .filter(Meal.user_id == user_id).order_by(Meal.id).all()
+        )
+        rows, _ = MealService.get_all_user_meals(user_id)
+        assert ordered(json_response(meal_dicts(rows)).data) == \
+            ordered(jsonify(MealSchema(many=True).dump(orm_meals)).data)
+        
+        high_risk = MealService.get_meals_with_high_allergy_risk(0.1)
+        assert [meal.id for meal, _ in high_risk] == [meal.id for meal in orm_meals if meal.allergy_risk >= 0.1]
+        
+        orm_allergies = (
+            database.session.query(Allergy).filter(Allergy.user_id == user_id).order_by(Allergy.id).all()
+        )
+        allergy_rows, _ = AllergyService.get_user_allergies(user_id)
+        assert ordered(json_response(allergy_dicts(allergy_rows)).data) == \
+            ordered(jsonify(AllergySchema(many=True).dump(orm_allergies)).data)
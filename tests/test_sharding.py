@@ -0,0 +1,53 @@
+from sqlalchemy import func, select
+from src.app import database
+from src.app.sharding import create_shard_schema
+from src.app.rebalance import move_users
+from src.models.meal import Meal
+
+HTTPS = 'https://localhost'
+
+def meal_count(shard, user_id):
+    with database.shard_engines[shard].connect() as connection:
+        return connection.execute(select(func.count()).where(Meal.user_id == user_id)).scalar()
+
+def test_meals_are_sharded_by_user(make_app, tmp_path):
+    """Test shard routing, scatter-gather leaderboards and moving a user between shards"""
+    app = make_app(DATABASE_SHARD_URIS=f"sqlite:///{tmp_path / 'shard1.db'}")
+    create_shard_schema(database.shard_engines[1], 1)
+    client = app.test_client()
+    
+    def sign_up(name):
+        client.post('/auth/register', base_url=HTTPS, json={
+            'username': name, 'email': f'{name}@example.com', 'password': 'shardpassword'
+        })
+        token = client.post('/auth/login', base_url=HTTPS, json={
+            'username': name, 'password': 'shardpassword'
+        }).get_json()['access_token']
+        return {'Authorization': f'Bearer {token}'}
+    
+    def add_meal(headers, name, allergies):
+        meal_id = client.post('/meals', base_url=HTTPS, headers=headers, json={'name': name}).get_json()['id']
+        for index in range(allergies):
+            client.post('/allergies', base_url=HTTPS, headers=headers, json={
+                'meal_id': meal_id, 'name': f'Allergy {index}'
+            })
+    
+    # Users 1 and 3 land on shard 1, user 2 on shard 0
+    alice, bob, carol = sign_up('alice'), sign_up('bob'), sign_up('carol')
+    add_meal(alice, 'Alice meal', 2)
+    assert (meal_count(0, 1), meal_count(1, 1)) == (0, 1)
+    
+    assert move_users([1], 0) == {1: 4}
+    assert (meal_count(0, 1), meal_count(1, 1)) == (1, 0)
+    assert [meal['name'] for meal in client.get('/meals', base_url=HTTPS, headers=alice).get_json()['items']] == ['Alice meal']
+    
+    add_meal(bob, 'Bob meal', 1)
+    add_meal(carol, 'Carol meal', 3)
+    top = client.get('/meals/most-allergies?limit=2', base_url=HTTPS, headers=bob).get_json()
+    assert [(entry['meal']['name'], entry['allergy_count']) for entry in top] == [('Carol meal', 3), ('Alice meal', 2)]
+    
+    users = client.get('/allergies/users-with-allergies', base_url=HTTPS, headers=bob).get_json()
+    assert [(entry['user']['username'], entry['allergy_count']) for entry in users] == [('carol', 3), ('alice', 2), ('bob', 1)]
+    assert [entry['user']['meals'][0]['name'] for entry in users] == ['Carol meal', 'Alice meal', 'Bob meal']
+    users = client.get('/allergies/users-with-allergies?limit=1', base_url=HTTPS, headers=bob).get_json()
+    assert [entry['user']['username'] for entry in users] == ['carol']
@@ -0,0 +1,45 @@
+import json
+import logging
+import pytest
+from sqlalchemy import event
+from src.app import database
+from src.app.sql_profiler import _before_cursor_execute
+
+def login(client):
+    client.post('/auth/register', json={
+        'username': 'profileuser',
+        'email': 'profile@example.com',
+        'password': 'profilepassword'
+    })
+    response = client.post('/auth/login', json={
+        'username': 'profileuser',
+        'password': 'profilepassword'
+    })
+    return {'Authorization': f"Bearer {json.loads(response.data)['access_token']}"}
+
+def test_profiling_reports_queries_and_logs_slow_requests(make_app, caplog):
+    """Test Server-Timing headers and the slow-request log"""
+    app = make_app(SQL_PROFILING_ENABLED='true', SQL_PROFILING_MAX_QUERIES='2')
+    client = app.test_client()
+    headers = login(client)
+    for i in range(3):
+        client.post('/meals', json={'name': f'Profiled {i}'}, headers=headers)
+    
+    with caplog.at_level(logging.WARNING):
+        response = client.get('/meals', headers=headers)
+    
+    timing = response.headers['Server-Timing']
+    assert timing.startswith('db;desc="')
+    assert 'app;dur=' in timing
+    queries = int(timing.split('"')[1].split()[0])
+    assert queries >= 3
+    assert f"Slow request GET /meals?: {queries} queries" in caplog.text
+    assert 'SELECT' in caplog.text
+
+def test_profiling_disabled_registers_nothing(make_app):
+    """Test that profiling is off by default and adds no hooks"""
+    app = make_app()
+    assert not event.contains(database.engine, 'before_cursor_execute', _before_cursor_execute)
+    
+    response = app.test_client().post('/auth/login', json={'username': 'nobody', 'password': 'x'})
+    assert 'Server-Timing' not in response.headers